@@ -0,0 +1,154 @@
+"""
+Recall@k versus memory for the compressed index types, with and without
+re-ranking, to choose a point on that trade-off before editing
+index_config.json.
+
+The corpus is the published FAQ set: its full-precision vectors file when
+there is one, otherwise the questions re-encoded. Queries are the FAQ answers,
+or one query per line from --queries. Ground truth is the exact top-k of a
+flat index. Vectors from elsewhere (for example the 1024-d embeddings the
+S3Vector pipeline uploads) can be evaluated with --vectors file.npy; a
+random --holdout of them is then used as queries.
+
+    python compression_report.py --top-k 5
+    python compression_report.py --vectors embeddings.npy --pq-m 64,128,256
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from faq_encoder import load_encoder, encode
+from faq_index_builder import build_index, index_nbytes, rerank_factor
+from faq_store import read_manifest, version_exists, open_metadata, open_vectors
+from faq_vector_store import VectorFile
+
+
+def load_published(queries=None):
+    """Corpus vectors and query vectors for the published FAQ set."""
+    manifest = read_manifest()
+    if not version_exists(manifest):
+        raise SystemExit("No published FAQ index found. Please run faq_ingest.py first.")
+    metadata = open_metadata(manifest)
+    try:
+        faqs = list(metadata.rows(manifest["version"]))
+    finally:
+        metadata.close()
+    model = load_encoder()
+    vector_file = open_vectors(manifest)
+    if vector_file is not None:
+        corpus = vector_file.read([faq["vector_index"] for faq in faqs])
+        vector_file.close()
+    else:
+        corpus = encode(model, [faq["question"] for faq in faqs])
+    query_vectors = encode(model, queries or [faq["answer"] for faq in faqs])
+    return corpus, query_vectors
+
+
+def load_npy(path, holdout, seed=42):
+    vectors = np.ascontiguousarray(np.load(path), dtype='float32')
+    order = np.random.default_rng(seed).permutation(len(vectors))
+    holdout = min(holdout, len(vectors) // 2)
+    return vectors[order[holdout:]], vectors[order[:holdout]]
+
+
+def candidate_configs(dim, pq_ms, include_ivf=False):
+    configs = [{"type": "flat"}, {"type": "sq", "sq_type": "fp16"}, {"type": "sq", "sq_type": "sq8"}]
+    for m in pq_ms:
+        if dim % m == 0:
+            configs.append({"type": "pq", "pq_m": m})
+            if include_ivf:
+                configs.append({"type": "ivf_pq", "pq_m": m, "nprobe": 16})
+    return configs
+
+
+def recall(expected, found):
+    k = expected.shape[1]
+    return float(np.mean([len(set(e) & set(f)) / k for e, f in zip(expected, found)]))
+
+
+def evaluate(corpus, query_vectors, configs, rerank_factors=(1, 2, 4, 8), k=10):
+    n, dim = corpus.shape
+    k = min(k, n)
+    ids = np.arange(n)
+    exact, _ = build_index({"type": "flat"}, corpus, ids)
+    expected = exact.search(query_vectors, k)[1]
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # Re-ranking reads from a file on disk, as the server does
+        path = os.path.join(tmp, "vectors.f32")
+        writer = VectorFile(path, dim, writable=True)
+        writer.write(ids, corpus)
+        writer.close()
+        vector_file = VectorFile(path, dim)
+
+        for config in configs:
+            index, report = build_index(config, corpus, ids)
+            factors = [1] if config["type"] == "flat" else rerank_factors
+            for factor in factors:
+                factor = rerank_factor({"rerank": factor})
+                start = time.perf_counter()
+                _, I = index.search(query_vectors, min(n, k * factor) if factor else k)
+                if factor:
+                    _, I = vector_file.rerank(query_vectors, I, k)
+                elapsed = time.perf_counter() - start
+                index_bytes = index_nbytes(index)
+                results.append({
+                    "config": dict(config, rerank=factor) if factor else config,
+                    "recall": round(recall(expected, I), 4),
+                    "index_bytes": index_bytes,
+                    "bytes_per_vector": round(index_bytes / n, 1),
+                    "vectors_file_bytes": n * dim * 4 if factor else 0,
+                    "ms_per_query": round(elapsed * 1000 / len(query_vectors), 3),
+                    "build_seconds": round(report["build_seconds"], 2),
+                })
+        vector_file.close()
+    return {"corpus": n, "dim": dim, "queries": len(query_vectors), "k": k, "results": results}
+
+
+def print_report(report):
+    k = report["k"]
+    print(f"{report['corpus']} vectors of {report['dim']} dims, {report['queries']} queries; "
+          f"recall against exact top-{k}")
+    print(f"{'config':<32} {'rerank':>6} {f'recall@{k}':>9} {'index MiB':>10} {'B/vector':>9} "
+          f"{'disk MiB':>9} {'ms/query':>9}")
+    for row in report["results"]:
+        config = {key: v for key, v in row["config"].items() if key != "rerank"}
+        name = config["type"] + "".join(f" {key}={v}" for key, v in config.items() if key != "type")
+        print(f"{name:<32} {row['config'].get('rerank', 0) or '-':>6} {row['recall']:>9.4f} "
+              f"{row['index_bytes'] / 1024 / 1024:>10.2f} {row['bytes_per_vector']:>9.1f} "
+              f"{row['vectors_file_bytes'] / 1024 / 1024:>9.2f} {row['ms_per_query']:>9.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall@k versus memory of compressed FAISS indexes")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", help="File with one query per line (default: the FAQ answers)")
+    parser.add_argument("--vectors", help=".npy file of vectors to evaluate instead of the published FAQs")
+    parser.add_argument("--holdout", type=int, default=1000, help="Vectors from --vectors used as queries")
+    parser.add_argument("--pq-m", default="96,48,24", help="Comma-separated PQ sub-quantizer counts")
+    parser.add_argument("--rerank", default="1,2,4,8", help="Comma-separated re-rank factors (1 = off)")
+    parser.add_argument("--ivf", action="store_true", help="Also evaluate ivf_pq with each --pq-m")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    if args.vectors:
+        corpus, query_vectors = load_npy(args.vectors, args.holdout)
+    else:
+        queries = None
+        if args.queries:
+            with open(args.queries, "r", encoding="utf-8") as f:
+                queries = [line.strip() for line in f if line.strip()]
+        corpus, query_vectors = load_published(queries)
+
+    configs = candidate_configs(corpus.shape[1], [int(m) for m in args.pq_m.split(",")], args.ivf)
+    report = evaluate(corpus, query_vectors, configs, [int(f) for f in args.rerank.split(",")], args.top_k)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
@@ -0,0 +1,125 @@
+"""
+Compare an encoder backend against the fp32 model on the published FAQ set.
+
+Both encoders embed the FAQ questions (the corpus) and a set of queries: by
+default the FAQ questions and answers, or one query per line from --queries.
+The script reports
+
+- cosine similarity between the fp32 and candidate embeddings of each text,
+- how many of the fp32 top-k results the candidate finds when it searches an
+  index it built itself (as ingest and serving would), and top-1 agreement,
+- single-query latency and batch throughput of both encoders.
+
+    python encoder_eval.py --backend int8 --top-k 3
+"""
+
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from faq_encoder import load_encoder, encoder_model, encode
+from faq_store import read_manifest, version_exists, open_metadata
+
+
+def load_faqs():
+    manifest = read_manifest()
+    if not version_exists(manifest):
+        raise SystemExit("No published FAQ index found. Please run faq_ingest.py first.")
+    metadata = open_metadata(manifest)
+    try:
+        return list(metadata.rows(manifest["version"]))
+    finally:
+        metadata.close()
+
+
+def cosine(a, b):
+    a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    return np.sum(a * b, axis=1)
+
+
+def top_k(corpus, queries, k):
+    index = faiss.IndexFlatL2(corpus.shape[1])
+    index.add(corpus)
+    return index.search(queries, k)[1]
+
+
+def time_encoder(model, texts, batch_size):
+    """Median single-query latency (ms) and batch throughput (texts/s)."""
+    encode(model, texts[:1])  # warm-up
+    single = []
+    for text in texts[:100]:
+        start = time.perf_counter()
+        encode(model, [text])
+        single.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        encode(model, texts[i:i + batch_size])
+    elapsed = time.perf_counter() - start
+    return float(np.median(single)), len(texts) / elapsed if elapsed > 0 else 0.0
+
+
+def evaluate(backend, queries=None, k=3, batch_size=32):
+    faqs = load_faqs()
+    corpus_texts = [faq["question"] for faq in faqs]
+    query_texts = queries or corpus_texts + [faq["answer"] for faq in faqs]
+    k = min(k, len(corpus_texts))
+
+    results = {"model": encoder_model, "backend": backend, "corpus": len(corpus_texts),
+               "queries": len(query_texts), "k": k}
+    embeddings = {}
+    for name in ("fp32", backend):
+        if name in embeddings:
+            continue
+        model = load_encoder(encoder_model, name)
+        embeddings[name] = (encode(model, corpus_texts), encode(model, query_texts))
+        latency_ms, throughput = time_encoder(model, query_texts, batch_size)
+        results[name] = {"p50_latency_ms": round(latency_ms, 2), "texts_per_second": round(throughput, 1)}
+
+    base_corpus, base_queries = embeddings["fp32"]
+    corpus, query_vectors = embeddings[backend]
+    similarity = cosine(np.vstack([base_corpus, base_queries]), np.vstack([corpus, query_vectors]))
+    expected = top_k(base_corpus, base_queries, k)
+    found = top_k(corpus, query_vectors, k)
+    overlap = [len(set(e) & set(f)) / k for e, f in zip(expected, found)]
+    results.update({
+        "cosine_mean": round(float(similarity.mean()), 4),
+        "cosine_min": round(float(similarity.min()), 4),
+        f"overlap_at_{k}": round(float(np.mean(overlap)), 4),
+        "top1_agreement": round(float(np.mean(expected[:, 0] == found[:, 0])), 4),
+    })
+    return results
+
+
+def print_results(results):
+    k = results["k"]
+    print(f"{results['model']}: fp32 vs {results['backend']} on {results['corpus']} FAQs, "
+          f"{results['queries']} queries")
+    print(f"  embedding cosine: mean {results['cosine_mean']:.4f}, min {results['cosine_min']:.4f}")
+    print(f"  top-{k} overlap: {results[f'overlap_at_{k}']:.4f}, top-1 agreement: {results['top1_agreement']:.4f}")
+    for name in dict.fromkeys(("fp32", results["backend"])):
+        print(f"  {name}: {results[name]['p50_latency_ms']:.2f} ms/query (p50), "
+              f"{results[name]['texts_per_second']:.0f} texts/s batched")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare an encoder backend with the fp32 model")
+    parser.add_argument("--backend", default="int8", help="Backend to compare against fp32")
+    parser.add_argument("--queries", help="File with one query per line (default: FAQ questions and answers)")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    queries = None
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    results = evaluate(args.backend, queries, args.top_k, args.batch_size)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
@@ -0,0 +1,336 @@
+"""
+Streaming bulk ingest for large FAQ corpora.
+
+Reads FAQs from a JSONL or CSV file (question, answer and an optional id
+column) in fixed-size chunks, encodes the chunks on a pool of worker
+processes and adds the vectors to the index as they come back, in input
+order. Only new or edited FAQs are encoded, with the same upsert rules as
+faq_ingest.py.
+
+Every `checkpoint_every` chunks the index and the metadata rows written so
+far are committed together with the position in the input file. If a run
+is interrupted, running it again on the same file resumes after the last
+committed chunk. The whole run is published as one new version.
+
+    python faq_bulk_ingest.py faqs.jsonl --chunk-size 1000 --workers 4
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from itertools import islice
+
+import faiss
+import numpy as np
+
+from faq_encoder import encoder_spec
+from faq_ingest import (begin_version, published_index_config, require_same_encoder, encode, print_index_report,
+                        updated_report, rebuild_from_index, published_vectors)
+from faq_index_builder import (load_index_config, train_size, train_new_index, index_report,
+                               supports_remove, remove_vectors, add_vectors, rerank_factor)
+from faq_metadata_store import faq_key, content_hash, filter_attributes
+from faq_store import data_dir, save_index, remove_data_file, publish_version
+from faq_vector_store import VectorFile, vectors_file_name
+
+
+def read_faqs(path):
+    """Yield FAQ dicts from a JSONL or CSV file without loading it into memory."""
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        is_csv = path.endswith(".csv")
+        if is_csv:
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for line_no, row in enumerate(rows, 1):
+            if not row.get("question") or not row.get("answer"):
+                raise ValueError(f"{path}: record {line_no} needs a question and an answer")
+            faq = {"question": row["question"], "answer": row["answer"], **filter_attributes(row)}
+            # An empty CSV cell means no id; in JSONL only a missing or null id does, as in faq_key
+            if row.get("id") is not None and not (is_csv and row["id"] == ""):
+                faq["id"] = row["id"]
+            yield faq
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def encode_chunk(questions):
+    # Runs in a worker process; each worker loads the model once when it imports faq_ingest
+    return encode(questions)
+
+
+class InlineResult:
+    """Stands in for an AsyncResult when encoding in the main process."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+class BulkIngest:
+    def __init__(self, store, index, config, manifest, version, state):
+        self.store = store
+        self.index = index
+        self.config = config
+        self.manifest = manifest
+        self.version = version
+        self.state = state
+        self.next_id = store.next_vector_index()
+
+        # key -> (entry, chunk_no) for rows planned but not yet committed to the store
+        self.pending_keys = {}
+        # (ended ids, entries) per applied chunk since the last checkpoint
+        self.changes = []
+        # state["chunks"] as of the last committed checkpoint, -1 before the first one
+        self.checkpointed = state["chunks"] if state["index_file"] else -1
+        # Vectors held back until there are enough to train a new IVF/PQ index
+        self.train_buffer = []
+        self.train_size = train_size(config)
+        self.report = None
+
+        # Full-precision copies of the vectors for re-ranking, opened on the first write
+        self.rerank = rerank_factor(config) > 0
+        self.vectors_name = vectors_file_name(version) if self.rerank else None
+        self.vector_file = None
+        self.resumed = state["chunks"] > 0
+
+        self.started = time.perf_counter()
+        self.rows_read = 0
+        self.rows_changed = 0
+        self.rows_encoded = 0
+
+    def plan(self, chunk_no, chunk):
+        """Work out which rows of a chunk are new, edited or unchanged."""
+        incoming = {faq_key(faq): faq for faq in chunk}
+        existing = self.store.lookup_keys([k for k in incoming if k not in self.pending_keys], self.version)
+        entries, to_encode, ended, stale = [], [], [], []
+        for key, faq in incoming.items():
+            old = self.pending_keys[key][0] if key in self.pending_keys else existing.get(key)
+            faq_hash = content_hash(faq)
+            if old is not None and old["content_hash"] == faq_hash:
+                continue
+            if old is not None:
+                vector_index = old["vector_index"]
+                ended.append(vector_index)
+            else:
+                vector_index = self.next_id
+                self.next_id += 1
+            entry = dict(faq, vector_index=vector_index, content_hash=faq_hash)
+            self.pending_keys[key] = (entry, chunk_no)
+            entries.append(entry)
+            # Answer-only edits keep their vector
+            if old is None or old["question"] != faq["question"]:
+                to_encode.append(entry)
+                if old is not None:
+                    stale.append(vector_index)
+        return entries, to_encode, ended, stale
+
+    def apply(self, chunk_no, chunk, plan, vectors):
+        """Add a chunk's vectors to the index and queue its metadata changes."""
+        entries, to_encode, ended, stale = plan
+        ids = [e["vector_index"] for e in to_encode]
+        if self.rerank and ids:
+            self._vectors(vectors.shape[1]).write(ids, vectors)
+        if self.index is None:
+            if ids:
+                self.train_buffer.append((vectors, ids))
+            if self.train_buffer and sum(len(b[1]) for b in self.train_buffer) >= self.train_size:
+                self._train()
+        elif ids:
+            if stale:
+                if supports_remove(self.index):
+                    remove_vectors(self.index, stale)
+                else:
+                    # HNSW keeps the old node; the graph is rebuilt once at the end
+                    self.state["needs_rebuild"] = True
+            add_vectors(self.index, vectors, ids)
+
+        self.changes.append((ended, entries))
+        self.state["chunks"] = chunk_no + 1
+        self.state["rows"] += len(chunk)
+        self.rows_read += len(chunk)
+        self.rows_changed += len(entries)
+        self.rows_encoded += len(ids)
+
+    def _vectors(self, dim):
+        if self.vector_file is None:
+            path = os.path.join(data_dir, self.vectors_name)
+            if self.resumed and os.path.exists(path):
+                # Rows written after the last checkpoint are simply written again
+                self.vector_file = VectorFile(path, dim, writable=True)
+            else:
+                published = published_vectors(self.manifest, self.index)
+                self.vector_file = VectorFile.copy(published.path if published is not None else None, path, dim)
+        return self.vector_file
+
+    def _train(self):
+        vectors = np.vstack([b[0] for b in self.train_buffer])
+        ids = np.concatenate([np.asarray(b[1], dtype='int64') for b in self.train_buffer])
+        self.train_buffer = []
+        # An FAQ edited twice within the buffer keeps only its last vector
+        _, last = np.unique(ids[::-1], return_index=True)
+        keep = np.sort(len(ids) - 1 - last)
+        start = time.perf_counter()
+        self.index, params, train_seconds = train_new_index(self.config, vectors)
+        add_vectors(self.index, vectors[keep], ids[keep])
+        self.report = index_report(self.config, params, self.index, train_seconds, time.perf_counter() - start)
+        print_index_report(self.report)
+
+    def checkpoint(self):
+        """Commit the index and metadata so far, together with the input position."""
+        if self.index is None:
+            return  # Nothing can be committed until the index is trained
+        previous_file = self.state["index_file"]
+        self.state["index_file"] = f"faq_index.v{self.version}.ckpt{self.state['chunks']}.index"
+        save_index(self.index, self.state["index_file"])
+        if self.vector_file is not None:
+            self.vector_file.flush()
+        self.store.commit_chunks(self.changes, self.version, self.state)
+        self.changes = []
+        self.pending_keys = {k: v for k, v in self.pending_keys.items() if v[1] >= self.state["chunks"]}
+        if previous_file and previous_file != self.state["index_file"]:
+            remove_data_file(previous_file)
+        self.checkpointed = self.state["chunks"]
+        self.print_progress()
+
+    def print_progress(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.rows_read / elapsed if elapsed > 0 else 0.0
+        print(f"  chunk {self.state['chunks']}: {self.state['rows']} rows committed, "
+              f"{rate:.0f} rows/s ({self.rows_encoded} encoded this run)")
+
+    def finish(self):
+        """Commit the remaining chunks and publish the run as one version."""
+        if self.index is None and self.train_buffer:
+            self._train()
+        if self.index is None or (self.rows_changed == 0 and self.state["index_file"] is None):
+            self.store.discard_unpublished(self.version - 1)
+            self.close_vectors(remove=True)
+            print(f"No changes: all {self.rows_read} FAQs are up to date.")
+            return None
+
+        if self.state["chunks"] != self.checkpointed:
+            # Skipped when the last chunk ended on a checkpoint: it is already committed
+            self.checkpoint()
+        report = self.report
+        if self.state["needs_rebuild"]:
+            self.index, report = rebuild_from_index(self.config, self.index, self.store, self.version,
+                                                    vector_file=self.vector_file)
+            print_index_report(report)
+        elif report is None:
+            report = updated_report(self.manifest, self.config, self.index)
+
+        if self.vector_file is not None:
+            vectors_name = self.vectors_name
+        else:
+            # Answer-only edits: the published vectors are still current
+            vectors_name = self.manifest.get("vectors_file") if self.rerank else None
+        self.close_vectors()
+        manifest = publish_version(self.index, self.version, report, encoder_spec(), vectors_name)
+        self.store.clear_checkpoint()
+        remove_data_file(self.state["index_file"])
+
+        elapsed = time.perf_counter() - self.started
+        print(f"Ingested {self.rows_read} rows in {elapsed:.1f}s "
+              f"({self.rows_read / elapsed if elapsed > 0 else 0.0:.0f} rows/s; "
+              f"{self.rows_changed} changed, {self.rows_encoded} encoded). "
+              f"Published version {manifest['version']}.")
+        return manifest
+
+    def close_vectors(self, remove=False):
+        if self.vector_file is not None:
+            self.vector_file.close()
+            self.vector_file = None
+        if remove and self.vectors_name:
+            remove_data_file(self.vectors_name)
+
+
+def bulk_ingest(path, chunk_size=1000, workers=None, checkpoint_every=10):
+    """Stream FAQs from `path` into the index and publish them as one new version."""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    source = os.path.abspath(path)
+    config = load_index_config()
+    manifest, index, store, published_version = begin_version(discard_unpublished=False)
+    version = published_version + 1
+
+    checkpoint = store.load_checkpoint()
+    if (checkpoint and checkpoint["source"] == source and checkpoint["version"] == version
+            and checkpoint.get("encoder") == encoder_spec()
+            and os.path.exists(os.path.join(data_dir, checkpoint["index_file"]))):
+        index = faiss.read_index(os.path.join(data_dir, checkpoint["index_file"]))
+        state = checkpoint
+        print(f"Resuming {path} after chunk {state['chunks']} ({state['rows']} rows already committed)")
+    else:
+        store.discard_unpublished(published_version)
+        require_same_encoder(manifest, index, store)
+        if index is not None and published_index_config(manifest) != config:
+            store.close()
+            raise SystemExit("index_config.json differs from the published index; "
+                             "run faq_ingest.py once to rebuild it before a bulk ingest")
+        if index is not None and rerank_factor(config) and published_vectors(manifest, index) is None:
+            store.close()
+            raise SystemExit("The published index has no vectors file to re-rank from; "
+                             "run faq_ingest.py once to rebuild it before a bulk ingest")
+        state = {"source": source, "version": version, "encoder": encoder_spec(), "chunks": 0, "rows": 0,
+                 "index_file": None, "needs_rebuild": False}
+
+    run = BulkIngest(store, index, config, manifest, version, state)
+    skip = state["chunks"]
+    # spawn, not fork: forking a process that has already used torch threads can deadlock
+    pool = multiprocessing.get_context("spawn").Pool(workers) if workers > 0 else None
+    max_in_flight = max(1, workers) * 2
+    in_flight = deque()
+    try:
+        for chunk_no, chunk in enumerate(chunked(read_faqs(path), chunk_size)):
+            if chunk_no < skip:
+                continue
+            plan = run.plan(chunk_no, chunk)
+            questions = [e["question"] for e in plan[1]]
+            if not questions:
+                result = InlineResult(None)
+            elif pool is not None:
+                result = pool.apply_async(encode_chunk, (questions,))
+            else:
+                result = InlineResult(encode_chunk(questions))
+            in_flight.append((chunk_no, chunk, plan, result))
+
+            while len(in_flight) >= max_in_flight:
+                done_no, done_chunk, done_plan, done_result = in_flight.popleft()
+                run.apply(done_no, done_chunk, done_plan, done_result.get())
+                if (done_no + 1) % checkpoint_every == 0:
+                    run.checkpoint()
+
+        while in_flight:
+            done_no, done_chunk, done_plan, done_result = in_flight.popleft()
+            run.apply(done_no, done_chunk, done_plan, done_result.get())
+            if (done_no + 1) % checkpoint_every == 0:
+                run.checkpoint()
+        return run.finish()
+    finally:
+        if pool is not None:
+            pool.terminate()
+        store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream FAQs from a JSONL or CSV file into the FAISS index")
+    parser.add_argument("path", help="JSONL or CSV file with question, answer and optional id fields")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Rows encoded per worker task")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Encoder processes (default: CPU count; 0 encodes in this process)")
+    parser.add_argument("--checkpoint-every", type=int, default=10, help="Chunks between checkpoints")
+    args = parser.parse_args()
+    bulk_ingest(args.path, args.chunk_size, args.workers, args.checkpoint_every)
@@ -0,0 +1,55 @@
+"""
+Sentence encoder shared by faq_ingest.py and main.py.
+
+The model and inference backend come from the environment, so ingest and
+serving pick the same encoder from the same settings:
+
+    FAQ_ENCODER_MODEL    SentenceTransformer model name (default all-MiniLM-L6-v2)
+    FAQ_ENCODER_BACKEND  fp32 (default) or int8
+
+The int8 backend applies PyTorch dynamic quantization to the model's Linear
+layers: weights are stored as int8 and activations are quantized on the fly,
+which speeds up CPU inference with a small change in the embeddings.
+
+Index vectors and query vectors are only comparable when they come from the
+same encoder, so ingest records encoder_spec() in the published manifest and
+the server refuses to load a version built with a different one.
+"""
+
+import os
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+BACKENDS = ("fp32", "int8")
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+encoder_model = os.environ.get("FAQ_ENCODER_MODEL", DEFAULT_MODEL)
+encoder_backend = os.environ.get("FAQ_ENCODER_BACKEND", "fp32")
+
+
+def encoder_spec(model_name=None, backend=None):
+    """Identity of an encoder, as recorded in the manifest."""
+    return {"model": model_name or encoder_model, "backend": backend or encoder_backend}
+
+
+def published_encoder(manifest):
+    # Versions published before the encoder was recorded used the fp32 default
+    return manifest.get("encoder") or encoder_spec(DEFAULT_MODEL, "fp32")
+
+
+def load_encoder(model_name=None, backend=None):
+    """Load the SentenceTransformer for the given (or configured) model and backend."""
+    spec = encoder_spec(model_name, backend)
+    if spec["backend"] not in BACKENDS:
+        raise ValueError(f"Unknown encoder backend {spec['backend']!r}; expected one of {', '.join(BACKENDS)}")
+    model = SentenceTransformer(spec["model"], device="cpu")
+    if spec["backend"] == "int8":
+        import torch
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def encode(model, texts):
+    return np.array(model.encode(texts), dtype='float32')
@@ -0,0 +1,103 @@
+"""
+Attribute filters for FAQ search.
+
+FAQs can carry category, locale and product attributes. When the API loads
+a version it builds a FilterIndex: a sorted array of vector_index values per
+(field, value), so a filter such as
+
+    {"category": "billing", "locale": ["en-US", "en-GB"]}
+
+is answered with a few sorted unions (values of one field) and
+intersections (across fields) instead of a metadata scan. The arrays take
+memory in proportion to the FAQs that carry each value, not one corpus-wide
+bitmap per value, so fields with many distinct values stay cheap.
+
+When many FAQs match, the matching ids are turned into a bitmap for that
+query and the FAISS search is restricted up front through an
+IDSelectorBitmap, so every result returned matches and top_k is filled
+whenever enough FAQs match. When only a few FAQs match, scanning their
+vectors directly is cheaper than a search that checks the selector for
+every vector, and approximate indexes (HNSW, IVF) can miss matches that are
+scattered across the graph or lists; brute_force_search() handles that case.
+"""
+
+import faiss
+import numpy as np
+
+from faq_metadata_store import FILTER_FIELDS
+
+def normalize_filter(filters):
+    """A hashable, order-independent form of a {field: value or [values]} filter, or None."""
+    if not filters:
+        return None
+    normalized = []
+    for field, values in filters.items():
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Unknown filter field {field!r}; expected one of {', '.join(FILTER_FIELDS)}")
+        values = [values] if isinstance(values, str) else list(values)
+        if not values:
+            raise ValueError(f"Filter on {field!r} needs at least one value")
+        normalized.append((field, tuple(sorted(set(str(v) for v in values)))))
+    return tuple(sorted(normalized))
+
+
+class FilterIndex:
+    def __init__(self, attributes):
+        """Build the id arrays from (vector_index, {field: value}) pairs."""
+        ids_by_value = {field: {} for field in FILTER_FIELDS}
+        size = 0
+        for vector_index, values in attributes:
+            size = max(size, vector_index + 1)
+            for field, value in values.items():
+                ids_by_value[field].setdefault(value, []).append(vector_index)
+
+        self.nbytes = (size + 7) // 8
+        self.id_arrays = {field: {value: np.unique(np.array(ids, dtype='int64')) for value, ids in values.items()}
+                          for field, values in ids_by_value.items()}
+
+    @classmethod
+    def from_store(cls, metadata, version):
+        return cls(metadata.attributes(version))
+
+    def values(self):
+        """{field: {value: number of FAQs}}"""
+        return {field: {value: len(ids) for value, ids in sorted(arrays.items())}
+                for field, arrays in self.id_arrays.items()}
+
+    def match(self, filters):
+        """Sorted vector_index values of the FAQs matching a normalized filter."""
+        per_field = []
+        for field, values in filters:
+            arrays = [self.id_arrays[field][v] for v in values if v in self.id_arrays[field]]
+            if not arrays:
+                return np.empty(0, dtype='int64')
+            per_field.append(arrays[0] if len(arrays) == 1 else np.unique(np.concatenate(arrays)))
+        # Smallest first, so each intersection is bounded by the most selective field
+        per_field.sort(key=len)
+        combined = per_field[0]
+        for ids in per_field[1:]:
+            combined = np.intersect1d(combined, ids, assume_unique=True)
+        return combined
+
+    def bitmap(self, ids):
+        """A bitmap over vector_index with the bits of `ids` set, for selector()."""
+        bits = np.zeros(self.nbytes * 8, dtype=bool)
+        bits[ids] = True
+        return np.packbits(bits, bitorder="little")
+
+    @staticmethod
+    def selector(bitmap):
+        """An IDSelector for the bitmap; the bitmap must outlive the search that uses it."""
+        return faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+
+
+def brute_force_search(queries, vectors, ids, k):
+    """Exact L2 search of `queries` over `vectors` stored under `ids`, padded with -1 like index.search."""
+    distances = np.full((len(queries), k), np.inf, dtype='float32')
+    labels = np.full((len(queries), k), -1, dtype='int64')
+    n = min(k, len(ids))
+    if n:
+        found_distances, positions = faiss.knn(queries, vectors, n)
+        distances[:, :n] = found_distances
+        labels[:, :n] = np.where(positions >= 0, ids[positions], -1)
+    return distances, labels
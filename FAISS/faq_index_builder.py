@@ -0,0 +1,270 @@
+"""
+Index construction for the FAQ corpus.
+
+The index type is chosen by a small JSON config (index_config.json, or the
+file named by FAQ_INDEX_CONFIG):
+
+    {"type": "flat"}
+    {"type": "ivf_flat", "nlist": 1024, "nprobe": 16}
+    {"type": "ivf_pq", "nlist": 1024, "nprobe": 16, "pq_m": 48, "pq_nbits": 8}
+    {"type": "hnsw", "hnsw_m": 32, "ef_construction": 200, "ef_search": 64}
+    {"type": "sq", "sq_type": "fp16"}            (or "sq8": 8-bit scalar quantization)
+    {"type": "pq", "pq_m": 48, "pq_nbits": 8}
+
+sq and pq store compressed vectors and scan all of them like flat: fp16
+halves the memory, sq8 quarters it, and PQ stores pq_m * pq_nbits bits per
+vector. Any type can add "rerank": N to re-rank N * top_k candidates against
+full-precision vectors kept on disk (see faq_vector_store.py).
+
+IVF and PQ indexes are trained on a random sample of the corpus
+(`train_size` rows, `seed` for reproducibility). All types use L2 distance,
+so scores stay comparable with the original IndexFlatL2.
+
+Vectors are stored under stable ids (the metadata vector_index) so single
+FAQs can be replaced or removed: IVF indexes keep ids natively, the other
+types are wrapped in IndexIDMap2.
+"""
+
+import json
+import math
+import os
+import time
+
+import faiss
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+index_config_path = os.environ.get("FAQ_INDEX_CONFIG", os.path.join(script_dir, "index_config.json"))
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw", "sq", "pq")
+
+SQ_TYPES = {"fp16": faiss.ScalarQuantizer.QT_fp16, "sq8": faiss.ScalarQuantizer.QT_8bit}
+
+DEFAULTS = {
+    "flat": {},
+    "ivf_flat": {"nlist": 1024, "nprobe": 16, "seed": 42},
+    "ivf_pq": {"nlist": 1024, "nprobe": 16, "pq_m": 48, "pq_nbits": 8, "seed": 42},
+    "hnsw": {"hnsw_m": 32, "ef_construction": 200, "ef_search": 64},
+    "sq": {"sq_type": "sq8"},
+    "pq": {"pq_m": 48, "pq_nbits": 8, "seed": 42},
+}
+
+# FAISS wants roughly this many training points per centroid
+TRAIN_POINTS_PER_CENTROID = 40
+
+
+def load_index_config(path=None):
+    """Read the index config, falling back to an exact flat index."""
+    path = path or index_config_path
+    if not os.path.exists(path):
+        return {"type": "flat"}
+    with open(path, "r") as f:
+        config = json.load(f)
+    if config.get("type") not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {config.get('type')!r}; expected one of {', '.join(INDEX_TYPES)}")
+    if config["type"] == "sq" and config.get("sq_type", "sq8") not in SQ_TYPES:
+        raise ValueError(f"Unknown sq_type {config['sq_type']!r}; expected one of {', '.join(SQ_TYPES)}")
+    return config
+
+
+def rerank_factor(config):
+    """How many candidates per result to re-rank against full-precision vectors (0 = off)."""
+    factor = int((config or {}).get("rerank", 0) or 0)
+    return factor if factor > 1 else 0
+
+
+def resolve_params(config, n, dim):
+    """Fill in defaults and shrink training-dependent sizes to fit a corpus of n vectors."""
+    params = {"type": config["type"], **DEFAULTS[config["type"]], **config}
+    if params["type"] in ("ivf_flat", "ivf_pq"):
+        if params["nlist"] > n:
+            print(f"Warning: nlist={params['nlist']} exceeds {n} vectors; using nlist={n}")
+            params["nlist"] = max(1, n)
+    if params["type"] in ("ivf_pq", "pq"):
+        if dim % params["pq_m"] != 0:
+            raise ValueError(f"pq_m={params['pq_m']} must divide the embedding dimension {dim}")
+        max_nbits = max(1, int(math.log2(max(n, 2))))
+        if params["pq_nbits"] > max_nbits:
+            print(f"Warning: pq_nbits={params['pq_nbits']} needs more than {n} training vectors; using pq_nbits={max_nbits}")
+            params["pq_nbits"] = max_nbits
+    if params["type"] in ("ivf_flat", "ivf_pq", "pq"):
+        params["train_size"] = _train_size(params)
+    return params
+
+
+def _train_size(params):
+    centroids = params.get("nlist", 1)
+    if params["type"] in ("ivf_pq", "pq"):
+        centroids = max(centroids, 2 ** params["pq_nbits"])
+    return params.get("train_size", TRAIN_POINTS_PER_CENTROID * centroids)
+
+
+def train_size(config):
+    """Vectors to collect before training an index for `config`, before the corpus size or dimension is known.
+
+    0 for types that need no training.
+    """
+    params = {"type": config["type"], **DEFAULTS[config["type"]], **config}
+    if params["type"] not in ("ivf_flat", "ivf_pq", "pq"):
+        return 0
+    return _train_size(params)
+
+
+def select_training_sample(embeddings, train_size, seed):
+    """Pick a uniform random sample of rows to train the coarse quantizer / PQ codebooks."""
+    n = embeddings.shape[0]
+    if train_size >= n:
+        return embeddings
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(n, size=train_size, replace=False))
+    return embeddings[rows]
+
+
+def create_index(params, dim):
+    index_type = params["type"]
+    if index_type == "flat":
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, params["hnsw_m"])
+        index.hnsw.efConstruction = params["ef_construction"]
+        index.hnsw.efSearch = params["ef_search"]
+        return faiss.IndexIDMap2(index)
+    if index_type == "sq":
+        return faiss.IndexIDMap2(faiss.IndexScalarQuantizer(dim, SQ_TYPES[params["sq_type"]], faiss.METRIC_L2))
+    if index_type == "pq":
+        return faiss.IndexIDMap2(faiss.IndexPQ(dim, params["pq_m"], params["pq_nbits"], faiss.METRIC_L2))
+    quantizer = faiss.IndexFlatL2(dim)
+    if index_type == "ivf_flat":
+        index = faiss.IndexIVFFlat(quantizer, dim, params["nlist"])
+    else:
+        index = faiss.IndexIVFPQ(quantizer, dim, params["nlist"], params["pq_m"], params["pq_nbits"])
+    index.nprobe = params["nprobe"]
+    # Lets vectors be looked up by id for compaction
+    index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    return index
+
+
+def base_index(index):
+    """The index behind an IndexIDMap wrapper, downcast to its concrete type."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def supports_ids(index):
+    """True if the index stores vectors under caller-supplied ids."""
+    index = faiss.downcast_index(index)
+    return isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2, faiss.IndexIVF))
+
+
+def supports_remove(index):
+    # HNSW graphs can't drop nodes; they are rebuilt instead
+    return not isinstance(base_index(index), faiss.IndexHNSW)
+
+
+def reconstruction_is_exact(index):
+    # PQ and 8-bit codes only approximate the original vectors; fp16 values
+    # re-quantize to themselves
+    base = base_index(index)
+    if isinstance(base, faiss.IndexScalarQuantizer):
+        return base.sq.qtype == faiss.ScalarQuantizer.QT_fp16
+    return not isinstance(base, (faiss.IndexIVFPQ, faiss.IndexPQ))
+
+
+def remove_vectors(index, ids):
+    if len(ids):
+        index.remove_ids(np.asarray(ids, dtype='int64'))
+
+
+def add_vectors(index, vectors, ids):
+    if len(ids):
+        index.add_with_ids(vectors, np.asarray(ids, dtype='int64'))
+
+
+def reconstruct_vectors(index, ids):
+    base = base_index(index)
+    if isinstance(base, faiss.IndexIVF) and base.direct_map.type == faiss.DirectMap.NoMap:
+        # IVF indexes built before ids were supported have no id lookup yet
+        base.set_direct_map_type(faiss.DirectMap.Hashtable)
+    return index.reconstruct_batch(np.asarray(ids, dtype='int64'))
+
+
+def index_nbytes(index):
+    """Size of the serialized index, a close proxy for its resident memory."""
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def train_new_index(config, training_vectors):
+    """Create an empty index for `config`, trained on a sample of `training_vectors` if needed.
+
+    Returns the index, the resolved parameters and the training time.
+    """
+    n, dim = training_vectors.shape
+    params = resolve_params(config, n, dim)
+    index = create_index(params, dim)
+    train_seconds = 0.0
+    if not index.is_trained:
+        sample = select_training_sample(training_vectors, params.get("train_size", n), params.get("seed", 42))
+        train_start = time.perf_counter()
+        index.train(sample)
+        train_seconds = time.perf_counter() - train_start
+        params["train_size"] = int(sample.shape[0])
+    return index, params, train_seconds
+
+
+def index_report(config, params, index, train_seconds, build_seconds):
+    """Summary of a built index, recorded in the published manifest."""
+    return {
+        "config": config,
+        "params": params,
+        "dim": int(index.d),
+        "train_seconds": round(train_seconds, 3),
+        "build_seconds": round(build_seconds, 3),
+        "index_bytes": index_nbytes(index),
+    }
+
+
+def build_index(config, embeddings, ids):
+    """Build and fill an index for the given embeddings, stored under `ids`.
+
+    Returns the index and a report with the resolved parameters, build time
+    and index size, which is recorded in the published manifest.
+    """
+    start = time.perf_counter()
+    index, params, train_seconds = train_new_index(config, embeddings)
+    add_vectors(index, embeddings, ids)
+    build_seconds = time.perf_counter() - start
+    return index, index_report(config, params, index, train_seconds, build_seconds)
+
+
+def supports_selector(index):
+    """Whether searches can be restricted to a subset of ids (IndexPQ does not support it)."""
+    return not isinstance(base_index(index), faiss.IndexPQ)
+
+
+def search_parameters(index, nprobe=None, ef_search=None, selector=None):
+    """Per-request search knobs and id filter for the given index, or None to use its defaults.
+
+    Knobs that do not apply to the index type are ignored.
+    """
+    if nprobe is None and ef_search is None and selector is None:
+        return None
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        ivf = None
+    base = base_index(index)
+    if ivf is not None:
+        params = faiss.SearchParametersIVF()
+        params.nprobe = nprobe if nprobe is not None else ivf.nprobe
+    elif isinstance(base, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = ef_search if ef_search is not None else base.hnsw.efSearch
+    elif selector is not None:
+        params = faiss.SearchParameters()
+    else:
+        return None
+    if selector is not None:
+        params.sel = selector
+    return params
@@ -1,79 +1,268 @@
-from sentence_transformers import SentenceTransformer
 import numpy as np
-import faiss
-import json
+import argparse
 import os
+from faq_store import (data_dir, read_manifest, version_exists, load_version, publish_version,
+                       open_metadata_store, open_vectors, migrate_json_metadata)
+from faq_index_builder import (load_index_config, build_index, index_nbytes, supports_ids, supports_remove,
+                               reconstruction_is_exact, remove_vectors, add_vectors, reconstruct_vectors,
+                               rerank_factor)
+from faq_vector_store import VectorFile, vectors_file_name
+from faq_metadata_store import faq_key, content_hash
+from faq_encoder import load_encoder, encoder_spec, published_encoder
+import faq_encoder
 
 faq_data = [
     {
         "question": "How can I reset my password?",
-        "answer": "To reset your password, click on 'Forgot Password' on the login screen and follow the instructions."
+        "answer": "To reset your password, click on 'Forgot Password' on the login screen and follow the instructions.",
+        "category": "account"
     },
     {
         "question": "Where can I view my purchase history?",
-        "answer": "You can find your purchase history under the 'Orders' section in your account dashboard."
+        "answer": "You can find your purchase history under the 'Orders' section in your account dashboard.",
+        "category": "orders"
     },
     {
         "question": "How do I update my email address?",
-        "answer": "Go to your account settings and edit your email address under 'Personal Information'."
+        "answer": "Go to your account settings and edit your email address under 'Personal Information'.",
+        "category": "account"
     },
     {
         "question": "How can I contact customer support?",
-        "answer": "You can contact our support team via the 'Help & Support' section or email us at support@example.com."
+        "answer": "You can contact our support team via the 'Help & Support' section or email us at support@example.com.",
+        "category": "support"
     },
     {
         "question": "What is the return policy?",
-        "answer": "You can return any item within 30 days of delivery for a full refund. See our return policy page for details."
+        "answer": "You can return any item within 30 days of delivery for a full refund. See our return policy page for details.",
+        "category": "orders"
     }
 ]
 
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
+model = load_encoder()
 
-data_dir = "data"
-os.makedirs(data_dir, exist_ok=True)
-faq_index_path = os.path.join(data_dir, "faq_index.index")
-faq_meta_path = os.path.join(data_dir, "faq_metadata.json")
+# Load the currently published index, or None if nothing has been published
+def load_current_index():
+    manifest = read_manifest()
+    if version_exists(manifest):
+        _, index, metadata = load_version(manifest)
+        metadata.close()
+        return manifest, index
+    return manifest, None
 
-# Load or create index
-def get_faq_index(dim):
-    if os.path.exists(faq_index_path):
-        return faiss.read_index(faq_index_path)
+def published_index_config(manifest):
+    return (manifest.get("index") or {}).get("config", {"type": "flat"})
+
+def encoder_changed(manifest, index):
+    # Vectors from another model or backend can't be mixed with ours
+    return index is not None and published_encoder(manifest) != encoder_spec()
+
+def require_same_encoder(manifest, index, store):
+    if encoder_changed(manifest, index):
+        store.close()
+        raise SystemExit(f"The published index was encoded with {published_encoder(manifest)}, not {encoder_spec()}; "
+                         f"run faq_ingest.py to re-encode it first")
+
+def begin_version(discard_unpublished=True):
+    """Open the published index and metadata store that the next version is built from."""
+    migrate_json_metadata()
+    manifest, index = load_current_index()
+    published_version = manifest["version"] if index is not None else 0
+    if index is not None and not supports_ids(index):
+        # Indexes from before stable ids store vectors by position, which equals vector_index
+        vectors = index.reconstruct_n(0, index.ntotal)
+        index, _ = build_index(published_index_config(manifest), vectors, np.arange(index.ntotal))
+    store = open_metadata_store()
+    if discard_unpublished:
+        store.discard_unpublished(published_version)
+    return manifest, index, store, published_version
+
+def encode(texts):
+    return faq_encoder.encode(model, texts)
+
+def print_index_report(report):
+    params = ", ".join(f"{k}={v}" for k, v in report["params"].items() if k != "type")
+    print(f"Built {report['params']['type']} index ({params})")
+    print(f"  build time: {report['build_seconds']:.2f}s (training {report['train_seconds']:.2f}s)")
+    print(f"  index size: {report['index_bytes'] / 1024 / 1024:.2f} MiB")
+
+def updated_report(manifest, config, index):
+    return {**(manifest.get("index") or {"config": config}), "index_bytes": index_nbytes(index)}
+
+def published_vectors(manifest, index):
+    """The published full-precision vectors, if they exist and match the index."""
+    vector_file = open_vectors(manifest)
+    if vector_file is not None and index is not None and vector_file.dim != index.d:
+        return None
+    return vector_file
+
+def write_vectors(config, manifest, version, ids, vectors, dim, fresh=False):
+    """Write the full-precision vectors of `version` if the config re-ranks.
+
+    Unless fresh, rows of the published version are carried over and only
+    `ids` are written. Returns the file name to publish, or None.
+    """
+    if not rerank_factor(config):
+        return None
+    name = vectors_file_name(version)
+    base = None if fresh or manifest.get("vectors_dim") != dim else manifest.get("vectors_file")
+    vector_file = VectorFile.copy(os.path.join(data_dir, base) if base else None, os.path.join(data_dir, name), dim)
+    vector_file.write(ids, vectors)
+    vector_file.close()
+    return name
+
+def rebuild_from_index(config, index, store, version, vectors=None, ids=(), vector_file=None):
+    """Build a fresh index over every row of `version`.
+
+    Vectors for `ids` are given; all others are read from `vector_file` (the
+    full-precision copies kept for re-ranking) or taken from the old index,
+    and re-encoded when the old index only holds approximations of them.
+    """
+    new_ids = set(ids)
+    rows = [row for row in store.rows(version) if row["vector_index"] not in new_ids]
+    keep_ids = [row["vector_index"] for row in rows]
+    if not keep_ids:
+        kept = np.empty((0, index.d), dtype='float32')
+    elif vector_file is not None:
+        kept = vector_file.read(keep_ids)
+    elif reconstruction_is_exact(index):
+        kept = reconstruct_vectors(index, keep_ids)
     else:
-        return faiss.IndexFlatL2(dim)
+        kept = encode([row["question"] for row in rows])
+    if vectors is not None:
+        kept = np.vstack([kept, vectors])
+    return build_index(config, kept, keep_ids + list(ids))
 
-# Save metadata
-def save_faq_metadata(entries):
-    if os.path.exists(faq_meta_path):
-        with open(faq_meta_path, "r") as f:
-            metadata = json.load(f)
+# Insert or update FAQs. Unchanged FAQs cost nothing; edited ones keep their
+# vector_index and have their vector replaced in place.
+def ingest_faqs(faq_data):
+    config = load_index_config()
+    manifest, index, store, published_version = begin_version()
+    version = published_version + 1
+
+    incoming = {faq_key(faq): faq for faq in faq_data}  # last one wins
+    existing = store.lookup_keys(incoming.keys(), published_version)
+    next_id = store.next_vector_index()
+    entries, to_encode, replaced = [], [], []
+    for key, faq in incoming.items():
+        old = existing.get(key)
+        if old is not None and old["content_hash"] == content_hash(faq):
+            continue
+        if old is not None:
+            entry = dict(faq, vector_index=old["vector_index"])
+            replaced.append(old["vector_index"])
+        else:
+            entry = dict(faq, vector_index=next_id)
+            next_id += 1
+        entries.append(entry)
+        # Answer-only edits keep their vector
+        if old is None or old["question"] != faq["question"]:
+            to_encode.append(entry)
+
+    rebuild = index is None or published_index_config(manifest) != config or encoder_changed(manifest, index)
+    # Re-ranking needs every vector at full precision
+    rebuild = rebuild or (rerank_factor(config) > 0 and published_vectors(manifest, index) is None)
+    if not entries and not rebuild:
+        store.close()
+        print(f"No changes: all {len(incoming)} FAQs are up to date.")
+        return
+
+    # Rows of the new version are invisible to readers until the manifest points at it
+    store.end_rows(replaced, version)
+    store.append(entries, version)
+
+    if rebuild:
+        # New corpus, changed index config or encoder: encode everything and build from scratch
+        rows = list(store.rows(version))
+        vectors = encode([row["question"] for row in rows])
+        ids = [row["vector_index"] for row in rows]
+        index, index_report = build_index(config, vectors, ids)
+        vectors_file = write_vectors(config, manifest, version, ids, vectors, index.d, fresh=True)
+        print_index_report(index_report)
+    elif to_encode:
+        vectors = encode([e["question"] for e in to_encode])
+        ids = [e["vector_index"] for e in to_encode]
+        replaced_ids = set(replaced)
+        stale = [i for i in ids if i in replaced_ids]
+        if stale and not supports_remove(index):
+            index, index_report = rebuild_from_index(config, index, store, version, vectors, ids,
+                                                     published_vectors(manifest, index))
+            print_index_report(index_report)
+        else:
+            remove_vectors(index, stale)
+            add_vectors(index, vectors, ids)
+            index_report = updated_report(manifest, config, index)
+        vectors_file = write_vectors(config, manifest, version, ids, vectors, index.d)
     else:
-        metadata = []
+        # Only answers or attributes changed: keep serving the current index and vectors files
+        index, index_report, vectors_file = None, manifest.get("index"), None
 
-    metadata.extend(entries)
-    with open(faq_meta_path, "w") as f:
-        json.dump(metadata, f, indent=2)
+    store.close()
+    manifest = publish_version(index, version, index_report, encoder_spec(), vectors_file)
+    print(f"Upserted {len(entries)} FAQs ({len(entries) - len(replaced)} new, {len(replaced)} updated, "
+          f"{len(to_encode)} encoded, {len(incoming) - len(entries)} unchanged). "
+          f"Published version {manifest['version']}.")
 
-# Ingest all FAQs
-def ingest_faqs(faq_data):
-    questions = [faq["question"] for faq in faq_data]
-    embeddings = model.encode(questions)
-    embeddings_np = np.array(embeddings, dtype='float32')
-
-    index = get_faq_index(embeddings_np.shape[1])
-    start_index = index.ntotal
-    index.add(embeddings_np)
-    faiss.write_index(index, faq_index_path)
-
-    metadata_entries = []
-    for i, faq in enumerate(faq_data):
-        metadata_entries.append({
-            "question": faq["question"],
-            "answer": faq["answer"],
-            "vector_index": start_index + i
-        })
-    save_faq_metadata(metadata_entries)
-    print(f"Ingested {len(faq_data)} FAQs.")
-
-# Call this once
-ingest_faqs(faq_data)
+# Delete FAQs by key (their "id", or the question for FAQs without one)
+def delete_faqs(keys):
+    manifest, index, store, published_version = begin_version()
+    require_same_encoder(manifest, index, store)
+    version = published_version + 1
+    existing = store.lookup_keys(keys, published_version) if index is not None else {}
+    if not existing:
+        store.close()
+        print("No matching FAQs to delete.")
+        return
+
+    ids = [row["vector_index"] for row in existing.values()]
+    store.end_rows(ids, version)
+    config = published_index_config(manifest)
+    vector_file = published_vectors(manifest, index)
+    if supports_remove(index):
+        remove_vectors(index, ids)
+        index_report = updated_report(manifest, config, index)
+    else:
+        index, index_report = rebuild_from_index(config, index, store, version, vector_file=vector_file)
+    store.close()
+    # Rows of deleted ids are simply never read again, so the vectors file is reused as is
+    manifest = publish_version(index, version, index_report, encoder_spec(),
+                               manifest.get("vectors_file") if vector_file is not None else None)
+    print(f"Deleted {len(ids)} FAQs. Published version {manifest['version']}.")
+
+# Rebuild the index from its live vectors and drop metadata rows that no
+# retained version can see any more
+def compact():
+    manifest, index, store, published_version = begin_version()
+    if index is None:
+        store.close()
+        print("Nothing to compact.")
+        return
+    require_same_encoder(manifest, index, store)
+    before = index_nbytes(index)
+    vector_file = published_vectors(manifest, index)
+    index, index_report = rebuild_from_index(published_index_config(manifest), index, store, published_version,
+                                             vector_file=vector_file)
+    manifest = publish_version(index, published_version + 1, index_report, encoder_spec(),
+                               manifest.get("vectors_file") if vector_file is not None else None)
+    # Rows ended at or before the previous version are invisible to both retained versions
+    removed = store.purge(published_version)
+    store.close()
+    print(f"Compacted index: {before / 1024 / 1024:.2f} MiB -> {index_report['index_bytes'] / 1024 / 1024:.2f} MiB, "
+          f"removed {removed} stale metadata rows. Published version {manifest['version']}.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest FAQs into the FAISS index")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("upsert", help="Insert or update the FAQs in faq_data (default)")
+    delete_parser = commands.add_parser("delete", help="Delete FAQs")
+    delete_parser.add_argument("keys", nargs="+", help="FAQ ids, or questions for FAQs without an id")
+    commands.add_parser("compact", help="Reclaim space left by deleted and replaced FAQs")
+    args = parser.parse_args()
+
+    if args.command == "delete":
+        delete_faqs(args.keys)
+    elif args.command == "compact":
+        compact()
+    else:
+        ingest_faqs(faq_data)
@@ -0,0 +1,302 @@
+"""
+Random-access storage for FAQ metadata.
+
+Metadata lives in a SQLite table keyed by vector_index, so a search reads
+only the k rows it needs and an ingest appends rows without rewriting the
+existing ones. Each row records the index versions it belongs to
+(valid_from inclusive, valid_to exclusive): a server still serving version N
+keeps seeing exactly the rows of version N while an ingest writes N+1.
+
+Rows also carry the FAQ's stable key and a hash of its content, which lets
+ingest skip FAQs that have not changed and replace edited ones in place, and
+the optional filter attributes (category, locale, product) that searches can
+be restricted by.
+
+JSONMetadata wraps the original faq_metadata.json array behind the same read
+interface, so data that has not been migrated yet can still be served.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS faq_metadata (
+    vector_index INTEGER NOT NULL,
+    valid_from INTEGER NOT NULL,
+    valid_to INTEGER,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    faq_key TEXT,
+    content_hash TEXT,
+    category TEXT,
+    locale TEXT,
+    product TEXT,
+    PRIMARY KEY (vector_index, valid_from)
+)
+"""
+
+CHECKPOINT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingest_checkpoint (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    state TEXT NOT NULL
+)
+"""
+
+# Optional FAQ attributes that searches can filter on
+FILTER_FIELDS = ("category", "locale", "product")
+
+# Columns added after the first version of the table
+UPGRADE_COLUMNS = {"faq_key": "TEXT", "content_hash": "TEXT", **{field: "TEXT" for field in FILTER_FIELDS}}
+
+# Rows visible to readers of a given index version
+VISIBLE = "valid_from <= :version AND (valid_to IS NULL OR valid_to > :version)"
+
+# SQLite limits the number of bound parameters per statement
+FETCH_CHUNK = 500
+
+
+def faq_key(faq):
+    """Stable identity of an FAQ: its explicit "id" if given, otherwise the question text."""
+    return str(faq["id"] if faq.get("id") is not None else faq["question"])
+
+
+def filter_attributes(faq):
+    """The FAQ's filter attributes that are set, as strings."""
+    return {field: str(faq[field]) for field in FILTER_FIELDS if faq.get(field) not in (None, "")}
+
+
+def content_hash(faq):
+    text = f"{faq['question']}\x1f{faq['answer']}"
+    # Attributes are only hashed when set, so FAQs without any keep their hash
+    for field, value in filter_attributes(faq).items():
+        text += f"\x1f{field}={value}"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SQLiteMetadataStore:
+    def __init__(self, path, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        # One connection per thread; searches run on several worker threads
+        self.local = threading.local()
+        if not readonly:
+            conn = self._connection()
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(SCHEMA)
+            conn.execute(CHECKPOINT_SCHEMA)
+            self._upgrade_schema(conn)
+            conn.execute("CREATE INDEX IF NOT EXISTS faq_metadata_key ON faq_metadata (faq_key)")
+            conn.commit()
+        # A server may read a store that no ingest has upgraded yet
+        columns = {row[1] for row in self._connection().execute("PRAGMA table_info(faq_metadata)")}
+        self.fields = tuple(field for field in FILTER_FIELDS if field in columns)
+        self.columns = ", ".join(("vector_index", "question", "answer") + self.fields)
+
+    def _upgrade_schema(self, conn):
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(faq_metadata)")}
+        for name, sql_type in UPGRADE_COLUMNS.items():
+            if name not in columns:
+                conn.execute(f"ALTER TABLE faq_metadata ADD COLUMN {name} {sql_type}")
+        # Rows written before keys existed are keyed by their question
+        missing = conn.execute(
+            "SELECT vector_index, valid_from, question, answer FROM faq_metadata WHERE content_hash IS NULL"
+        ).fetchall()
+        conn.executemany(
+            "UPDATE faq_metadata SET faq_key = ?, content_hash = ? WHERE vector_index = ? AND valid_from = ?",
+            [(faq_key(dict(row)), content_hash(dict(row)), row["vector_index"], row["valid_from"]) for row in missing]
+        )
+
+    def _connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            if self.readonly:
+                conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            else:
+                conn = sqlite3.connect(self.path)
+            conn.row_factory = sqlite3.Row
+            self.local.conn = conn
+        return conn
+
+    def fetch(self, ids, version):
+        """Return {vector_index: row} for the given ids as seen by `version`."""
+        ids = sorted({int(i) for i in ids if i >= 0})
+        rows = {}
+        conn = self._connection()
+        for start in range(0, len(ids), FETCH_CHUNK):
+            chunk = ids[start:start + FETCH_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            cursor = conn.execute(
+                f"SELECT {self.columns} FROM faq_metadata "
+                f"WHERE vector_index IN ({placeholders}) "
+                f"AND valid_from <= ? AND (valid_to IS NULL OR valid_to > ?)",
+                (*chunk, version, version)
+            )
+            for row in cursor:
+                rows[row["vector_index"]] = dict(row)
+        return rows
+
+    def count(self, version):
+        return self._connection().execute(
+            f"SELECT COUNT(*) FROM faq_metadata WHERE {VISIBLE}", {"version": version}
+        ).fetchone()[0]
+
+    def rows(self, version):
+        """Iterate over all rows of `version` in vector_index order."""
+        cursor = self._connection().execute(
+            f"SELECT {self.columns} FROM faq_metadata WHERE {VISIBLE} ORDER BY vector_index",
+            {"version": version}
+        )
+        for row in cursor:
+            yield dict(row)
+
+    def attributes(self, version):
+        """Iterate over (vector_index, {field: value}) of the rows of `version` that have attributes."""
+        if not self.fields:
+            return
+        any_set = " OR ".join(f"{field} IS NOT NULL" for field in self.fields)
+        cursor = self._connection().execute(
+            f"SELECT vector_index, {', '.join(self.fields)} FROM faq_metadata WHERE {VISIBLE} AND ({any_set})",
+            {"version": version}
+        )
+        for row in cursor:
+            yield row["vector_index"], {field: row[field] for field in self.fields if row[field] is not None}
+
+    def lookup_keys(self, keys, version):
+        """Return {faq_key: row} for the keys that exist in `version`."""
+        keys = list(keys)
+        rows = {}
+        conn = self._connection()
+        for start in range(0, len(keys), FETCH_CHUNK):
+            chunk = keys[start:start + FETCH_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            cursor = conn.execute(
+                f"SELECT {self.columns}, faq_key, content_hash FROM faq_metadata "
+                f"WHERE faq_key IN ({placeholders}) "
+                f"AND valid_from <= ? AND (valid_to IS NULL OR valid_to > ?)",
+                (*chunk, version, version)
+            )
+            for row in cursor:
+                rows[row["faq_key"]] = dict(row)
+        return rows
+
+    def next_vector_index(self):
+        """An id not used by any row in the store, so ids of replaced FAQs are not recycled."""
+        value = self._connection().execute("SELECT MAX(vector_index) FROM faq_metadata").fetchone()[0]
+        return 0 if value is None else value + 1
+
+    def append(self, entries, version):
+        """Add rows that become visible from `version` on."""
+        conn = self._connection()
+        with conn:
+            self._append(conn, entries, version)
+
+    def end_rows(self, vector_indexes, version):
+        """Hide the current rows of these ids from `version` on (replaced or deleted)."""
+        conn = self._connection()
+        with conn:
+            self._end_rows(conn, vector_indexes, version)
+
+    def _append(self, conn, entries, version):
+        # A row written earlier for the same unpublished version is overwritten
+        conn.executemany(
+            f"INSERT OR REPLACE INTO faq_metadata "
+            f"(vector_index, valid_from, question, answer, faq_key, content_hash, {', '.join(FILTER_FIELDS)}) "
+            f"VALUES (?, ?, ?, ?, ?, ?{', ?' * len(FILTER_FIELDS)})",
+            [(e["vector_index"], version, e["question"], e["answer"], faq_key(e), content_hash(e),
+              *(filter_attributes(e).get(field) for field in FILTER_FIELDS))
+             for e in entries]
+        )
+
+    def _end_rows(self, conn, vector_indexes, version):
+        conn.executemany(
+            "UPDATE faq_metadata SET valid_to = ? WHERE vector_index = ? AND valid_to IS NULL",
+            [(version, int(i)) for i in vector_indexes]
+        )
+
+    def commit_chunks(self, changes, version, checkpoint):
+        """Apply (ended ids, entries) pairs and record the ingest checkpoint in one transaction."""
+        conn = self._connection()
+        with conn:
+            for ended, entries in changes:
+                self._end_rows(conn, ended, version)
+                self._append(conn, entries, version)
+            conn.execute(
+                "INSERT OR REPLACE INTO ingest_checkpoint (id, state) VALUES (1, ?)", (json.dumps(checkpoint),)
+            )
+
+    def load_checkpoint(self):
+        row = self._connection().execute("SELECT state FROM ingest_checkpoint WHERE id = 1").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def clear_checkpoint(self):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM ingest_checkpoint")
+
+    def purge(self, oldest_version):
+        """Delete rows no longer visible to `oldest_version` or later, and reclaim the space."""
+        conn = self._connection()
+        with conn:
+            removed = conn.execute(
+                "DELETE FROM faq_metadata WHERE valid_to IS NOT NULL AND valid_to <= ?", (oldest_version,)
+            ).rowcount
+        conn.execute("VACUUM")
+        return removed
+
+    def discard_unpublished(self, published_version):
+        """Undo writes of an ingest that never published its version (e.g. it crashed)."""
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM faq_metadata WHERE valid_from > ?", (published_version,))
+            conn.execute("UPDATE faq_metadata SET valid_to = NULL WHERE valid_to > ?", (published_version,))
+            # A paused bulk ingest can't resume once its rows are gone
+            conn.execute("DELETE FROM ingest_checkpoint")
+
+    def close(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+
+class JSONMetadata:
+    """Read-only view of a legacy faq_metadata.json array."""
+
+    def __init__(self, path):
+        with open(path, "r") as f:
+            self.entries = json.load(f)
+
+    def fetch(self, ids, version):
+        rows = {}
+        for i in ids:
+            i = int(i)
+            if 0 <= i < len(self.entries):
+                rows[i] = self.entries[i]
+        return rows
+
+    def count(self, version):
+        return len(self.entries)
+
+    def rows(self, version):
+        for i, entry in enumerate(self.entries):
+            yield {"vector_index": i, "question": entry["question"], "answer": entry["answer"]}
+
+    def attributes(self, version):
+        return iter(())
+
+    def close(self):
+        pass
+
+
+def migrate_json_to_sqlite(json_path, db_path, version):
+    """Copy a JSON metadata array into a SQLite store as rows of `version`."""
+    store = SQLiteMetadataStore(db_path)
+    try:
+        store.discard_unpublished(version)
+        if store.count(version) == 0:
+            store.append(list(JSONMetadata(json_path).rows(version)), version)
+        return store.count(version)
+    finally:
+        store.close()
@@ -0,0 +1,85 @@
+"""
+Prometheus metrics for the FAQ API, served on /metrics.
+
+- faq_stage_seconds{stage}: time per search stage. Stages are embed (encoding
+  cache misses), filter (matching attribute filters), index_search, rerank
+  (exact distances for compressed indexes), metadata (row lookup), results
+  (building FAQSearchResult objects) and serialize (response JSON).
+- faq_request_seconds{endpoint}, faq_requests_total{endpoint,status} and
+  faq_requests_in_flight{endpoint}, recorded by RequestMetricsMiddleware.
+- Cache, coalescing, search pool and index figures, read from their stats()
+  at scrape time by StatsCollector.
+
+Timers are a perf_counter() pair and one histogram observe per stage, cheap
+next to encoding or a FAISS search. The timer and the middleware come from
+request_metrics.py, shared with the JobFinder API.
+"""
+
+from prometheus_client import CollectorRegistry, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from request_metrics import RequestMetrics, stage_timer
+
+registry = CollectorRegistry()
+
+STAGES = ("embed", "filter", "index_search", "rerank", "metadata", "results", "serialize")
+
+# Stages range from microseconds (a cached metadata lookup) to a second (a large batch encode)
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+stage_seconds = Histogram("faq_stage_seconds", "Time spent in each FAQ search stage", ["stage"],
+                          buckets=STAGE_BUCKETS, registry=registry)
+# Recorded by RequestMetricsMiddleware
+http_metrics = RequestMetrics("faq", registry)
+
+timed = stage_timer(stage_seconds, STAGES)
+
+
+class StatsCollector:
+    """Exports the /stats/* figures and the loaded index at scrape time."""
+
+    def __init__(self, cache_stats, batching_stats, pool_stats, index_stats):
+        self.cache_stats = cache_stats
+        self.batching_stats = batching_stats
+        self.pool_stats = pool_stats
+        self.index_stats = index_stats
+
+    def collect(self):
+        cache = self.cache_stats()
+        for name, kind, help_text in (("hits", CounterMetricFamily, "Cache hits"),
+                                      ("misses", CounterMetricFamily, "Cache misses"),
+                                      ("evictions", CounterMetricFamily, "Cache evictions"),
+                                      ("entries", GaugeMetricFamily, "Cached entries")):
+            family = kind(f"faq_cache_{name}", help_text, labels=["cache"])
+            for cache_name in ("embeddings", "results"):
+                family.add_metric([cache_name], cache[cache_name][name])
+            yield family
+
+        batching = self.batching_stats()
+        yield CounterMetricFamily("faq_batches", "Coalesced search batches", value=batching["batches"])
+        yield CounterMetricFamily("faq_batched_queries", "Queries in coalesced batches", value=batching["queries"])
+        yield CounterMetricFamily("faq_failed_batches", "Coalesced batches re-run one query at a time",
+                                  value=batching["failed_batches"])
+        yield GaugeMetricFamily("faq_batch_queue_depth", "Queries waiting to be batched",
+                                value=batching["queue_depth"])
+        wait = GaugeMetricFamily("faq_batch_queue_wait_seconds", "Recent queue wait before a batch ran",
+                                 labels=["quantile"])
+        wait.add_metric(["0.5"], batching["p50_queue_wait_ms"] / 1000)
+        wait.add_metric(["0.95"], batching["p95_queue_wait_ms"] / 1000)
+        yield wait
+
+        pool = self.pool_stats()
+        yield GaugeMetricFamily("faq_search_pool_running", "Search jobs running", value=pool["running"])
+        yield GaugeMetricFamily("faq_search_pool_waiting", "Search jobs waiting for a worker", value=pool["waiting"])
+        yield CounterMetricFamily("faq_search_pool_rejected", "Search jobs rejected with 503",
+                                  value=pool["rejected"])
+
+        index = self.index_stats()
+        if index is not None:
+            yield GaugeMetricFamily("faq_index_version", "Loaded index version", value=index["version"])
+            yield GaugeMetricFamily("faq_index_vectors", "Vectors in the loaded index", value=index["vectors"])
+
+
+def render():
+    """The metrics in Prometheus text format, and its content type."""
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,214 @@
+"""
+Versioned storage for the FAQ index and metadata.
+
+faq_ingest.py publishes every ingest as a new version: the index is written
+to a version-specific file, the new metadata rows are appended to the SQLite
+metadata store tagged with that version, and then a small manifest is
+atomically replaced to point at them. main.py only ever reads the index
+named by a single manifest together with the metadata rows of that same
+version, so a new index is never paired with old metadata.
+
+Run `python faq_store.py migrate` to move an existing faq_metadata.json into
+the SQLite store in one step (faq_ingest.py also does this automatically).
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+import faiss
+
+from faq_metadata_store import SQLiteMetadataStore, JSONMetadata, migrate_json_to_sqlite
+from faq_vector_store import VectorFile
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+data_dir = os.path.join(script_dir, "data")
+manifest_path = os.path.join(data_dir, "faq_manifest.json")
+metadata_db_file = "faq_metadata.db"
+
+# File names used before versioned publishing; served as version 0
+legacy_index_file = "faq_index.index"
+legacy_metadata_file = "faq_metadata.json"
+
+
+def read_manifest():
+    """Return the manifest of the currently published version."""
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            return json.load(f)
+    return {
+        "version": 0,
+        "index_file": legacy_index_file,
+        "metadata_file": legacy_metadata_file,
+    }
+
+
+def version_exists(manifest):
+    """Check that both files named by the manifest are on disk."""
+    return (os.path.exists(os.path.join(data_dir, manifest["index_file"]))
+            and os.path.exists(os.path.join(data_dir, manifest["metadata_file"])))
+
+
+def open_metadata(manifest, readonly=True):
+    """Open the metadata named by the manifest (SQLite store or legacy JSON)."""
+    path = os.path.join(data_dir, manifest["metadata_file"])
+    if manifest["metadata_file"].endswith(".json"):
+        return JSONMetadata(path)
+    return SQLiteMetadataStore(path, readonly=readonly)
+
+
+def index_io_flags(mmap):
+    """faiss.read_index flags that map the index file read-only instead of copying it into memory.
+
+    Mapped pages live in the page cache, so every process serving the same
+    version shares one copy. IO_FLAG_MMAP_IFC (newer faiss releases) maps the
+    vectors of every index type; older releases can only map IVF lists and
+    load other types normally.
+    """
+    if not mmap:
+        return 0
+    return getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+def load_version(manifest=None, readonly=True, mmap=False):
+    """Load the index and metadata named by one manifest as a consistent pair.
+
+    mmap=True maps the index read-only (for serving; it can't be modified).
+    """
+    if manifest is None:
+        manifest = read_manifest()
+    index = faiss.read_index(os.path.join(data_dir, manifest["index_file"]), index_io_flags(mmap))
+    return manifest, index, open_metadata(manifest, readonly=readonly)
+
+
+def open_vectors(manifest):
+    """Map the full-precision vectors of a version read-only, or None if it has none."""
+    if not manifest.get("vectors_file"):
+        return None
+    path = os.path.join(data_dir, manifest["vectors_file"])
+    if not os.path.exists(path):
+        return None
+    return VectorFile(path, manifest["vectors_dim"])
+
+
+def open_metadata_store():
+    """Open the writable SQLite metadata store used by ingest."""
+    os.makedirs(data_dir, exist_ok=True)
+    return SQLiteMetadataStore(os.path.join(data_dir, metadata_db_file))
+
+
+def migrate_json_metadata():
+    """Move JSON metadata of the published version into the SQLite store.
+
+    The manifest keeps its version and index file and is pointed at the store.
+    Returns False if there was nothing to migrate.
+    """
+    manifest = read_manifest()
+    if not manifest["metadata_file"].endswith(".json") or not version_exists(manifest):
+        return False
+    count = migrate_json_to_sqlite(
+        os.path.join(data_dir, manifest["metadata_file"]),
+        os.path.join(data_dir, metadata_db_file),
+        manifest["version"]
+    )
+    _write_json(manifest_path, dict(manifest, metadata_file=metadata_db_file), indent=2)
+    print(f"Migrated {count} metadata rows from {manifest['metadata_file']} to {metadata_db_file}")
+    return True
+
+
+def _atomic_write(path, write):
+    # Write to a temp file in the same directory, then rename over the target
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _write_json(path, obj, indent=None):
+    def write(tmp_path):
+        with open(tmp_path, "w") as f:
+            json.dump(obj, f, indent=indent)
+    _atomic_write(path, write)
+
+
+def save_index(index, file_name):
+    """Atomically write an index file into the data directory."""
+    os.makedirs(data_dir, exist_ok=True)
+    _atomic_write(os.path.join(data_dir, file_name), lambda p: faiss.write_index(index, p))
+
+
+def remove_data_file(file_name):
+    path = os.path.join(data_dir, file_name)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def publish_version(index, version, index_report=None, encoder=None, vectors_file=None):
+    """Write the index for `version` and point the manifest at it.
+
+    The metadata rows of `version` must already be in the store. Pass
+    index=None when only metadata changed to keep serving the current index
+    file. index_report (index type, parameters, build time, size) is recorded
+    in the manifest next to the files it describes, and so is the encoder
+    (model and backend) that produced the vectors. vectors_file names the
+    full-precision vectors written for re-ranking, if any; with index=None
+    the current one is kept.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    current = read_manifest()
+    if index is None:
+        index_file = current["index_file"]
+        ntotal = current.get("ntotal")
+        vectors_file = current.get("vectors_file")
+        dim = current.get("vectors_dim")
+    else:
+        index_file = f"faq_index.v{version}.index"
+        ntotal = int(index.ntotal)
+        dim = int(index.d)
+        save_index(index, index_file)
+
+    manifest = {
+        "version": version,
+        "index_file": index_file,
+        "metadata_file": metadata_db_file,
+        "ntotal": ntotal,
+        "index": index_report if index_report is not None else current.get("index"),
+        "encoder": encoder if encoder is not None else current.get("encoder"),
+        "vectors_file": vectors_file,
+        "vectors_dim": dim if vectors_file else None,
+        "previous": {
+            "index_file": current["index_file"],
+            "metadata_file": current["metadata_file"],
+            "vectors_file": current.get("vectors_file"),
+        },
+    }
+    # The manifest swap is the commit point for readers
+    _write_json(manifest_path, manifest, indent=2)
+
+    # Keep the previous version for readers still loading it, drop the one before
+    _remove_version_files(current.get("previous"),
+                          keep=(index_file, current["index_file"], vectors_file, current.get("vectors_file")))
+    return manifest
+
+
+def _remove_version_files(files, keep=()):
+    if not files:
+        return
+    for name in (files["index_file"], files["metadata_file"], files.get("vectors_file")):
+        if not name or name in (legacy_index_file, legacy_metadata_file, metadata_db_file) or name in keep:
+            continue
+        remove_data_file(name)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["migrate"]:
+        print("Usage: python faq_store.py migrate")
+        sys.exit(1)
+    if not migrate_json_metadata():
+        print("Nothing to migrate: metadata is already in the SQLite store")
@@ -0,0 +1,102 @@
+"""
+Full-precision FAQ vectors kept on disk for exact re-ranking.
+
+A compressed index (sq, pq, ivf_pq) only approximates distances. When the
+index config sets "rerank": N, each published version also gets a raw
+float32 file (faq_vectors.v{N}.f32) with row i holding the vector stored
+under id i. The server maps it read-only, searches the compressed index for
+N * top_k candidates, and orders them by their exact L2 distance to the
+query, reading only the candidate rows from disk.
+
+Like index files, a vectors file is never changed once published: an ingest
+copies the previous file, writes the new and edited rows, and publishes the
+copy with the new version.
+"""
+
+import os
+import shutil
+
+import numpy as np
+
+
+def vectors_file_name(version):
+    return f"faq_vectors.v{version}.f32"
+
+
+class VectorFile:
+    def __init__(self, path, dim, writable=False):
+        self.path = path
+        self.dim = dim
+        self.writable = writable
+        self.data = None
+        if writable and not os.path.exists(path):
+            open(path, "wb").close()
+        self._map()
+
+    def _map(self):
+        rows = os.path.getsize(self.path) // (4 * self.dim)
+        if rows == 0:
+            self.data = np.zeros((0, self.dim), dtype='float32')
+        else:
+            mode = "r+" if self.writable else "r"
+            self.data = np.memmap(self.path, dtype='float32', mode=mode, shape=(rows, self.dim))
+
+    @classmethod
+    def copy(cls, source_path, path, dim):
+        """Start a new version's file from the previous version's rows."""
+        if source_path is not None and os.path.exists(source_path):
+            shutil.copyfile(source_path, path)
+        elif os.path.exists(path):
+            os.remove(path)
+        return cls(path, dim, writable=True)
+
+    @property
+    def rows(self):
+        return self.data.shape[0]
+
+    def write(self, ids, vectors):
+        """Store `vectors` under `ids`, growing the file to the largest id."""
+        if not len(ids):
+            return
+        ids = np.asarray(ids, dtype='int64')
+        needed = int(ids.max()) + 1
+        if needed > self.rows:
+            self.flush()
+            with open(self.path, "r+b") as f:
+                f.truncate(needed * 4 * self.dim)
+            self._map()
+        self.data[ids] = vectors
+
+    def read(self, ids):
+        return np.asarray(self.data[np.asarray(ids, dtype='int64')], dtype='float32')
+
+    def flush(self):
+        if isinstance(self.data, np.memmap):
+            self.data.flush()
+
+    def rerank(self, queries, candidates, k):
+        """Reorder each row of `candidates` by exact L2 distance to its query and keep k.
+
+        Returns (distances, ids) shaped like index.search output, padded with -1.
+        """
+        distances = np.full((len(queries), k), np.inf, dtype='float32')
+        ids = np.full((len(queries), k), -1, dtype='int64')
+        valid = candidates[candidates >= 0]
+        if valid.size == 0:
+            return distances, ids
+        # Each candidate row is read from disk once, even if several queries share it
+        unique = np.unique(valid)
+        vectors = self.read(unique)
+        for q, (query, row) in enumerate(zip(queries, candidates)):
+            row = row[row >= 0]
+            if row.size == 0:
+                continue
+            exact = ((vectors[np.searchsorted(unique, row)] - query) ** 2).sum(axis=1)
+            order = np.argsort(exact, kind="stable")[:k]
+            distances[q, :len(order)] = exact[order]
+            ids[q, :len(order)] = row[order]
+        return distances, ids
+
+    def close(self):
+        self.flush()
+        self.data = None
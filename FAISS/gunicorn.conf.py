@@ -0,0 +1,26 @@
+"""
+Gunicorn settings for serving the FAQ API with several worker processes:
+
+    gunicorn main:app -c gunicorn.conf.py
+
+The app is imported once in the master process (preload_app), so the
+encoder weights are loaded before the workers fork and their pages are shared
+copy-on-write. Each worker maps the same index file read-only (FAQ_INDEX_MMAP),
+warms up, and only then reports "ready" on /health.
+"""
+
+import gc
+import os
+
+bind = os.environ.get("FAQ_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("FAQ_WORKERS", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# Loading the model and warming up can take longer than the default 30s
+timeout = int(os.environ.get("FAQ_WORKER_TIMEOUT", "120"))
+
+
+def when_ready(server):
+    # Keep the garbage collector from touching (and so un-sharing) the pages of
+    # objects created while the app was imported
+    gc.freeze()
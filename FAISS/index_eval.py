@@ -0,0 +1,223 @@
+"""
+Recall versus speed and memory for index configurations.
+
+Ground truth is the exact IndexFlatL2 top-k of fp32 embeddings, on two
+corpora:
+
+- faq: the published FAQ questions, queried with the FAQ answers (or one
+  query per line from --queries)
+- jobs: the search_text of job_dataset_demo.csv, queried with the job titles
+
+Every candidate configuration is built over the embeddings of each encoder
+backend and searched with every combination of its search-time settings. One
+table reports recall@k (share of the exact top-k found), MRR@k (reciprocal
+rank of the exact nearest neighbour), single-threaded QPS, and memory (index
+plus the on-disk vectors file that re-ranking reads).
+
+Configurations come from --configs, a JSON list of index configs as in
+index_config.json where nprobe, ef_search and rerank may be lists to sweep:
+
+    [{"type": "hnsw", "hnsw_m": 32, "ef_search": [16, 64, 256]},
+     {"type": "pq", "pq_m": 48, "rerank": [1, 4, 8]}]
+
+    python index_eval.py --corpus faq jobs --backends fp32 int8 --top-k 10
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+from compression_report import recall
+from faq_encoder import load_encoder, encoder_model, encode
+from faq_index_builder import build_index, index_nbytes, search_parameters, rerank_factor
+from faq_store import read_manifest, version_exists, open_metadata
+from faq_vector_store import VectorFile
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+default_jobs_csv = os.path.join(script_dir, "..", "Weaviate", "JobFinder", "job_dataset_demo.csv")
+
+# Settings that only change how an index is searched, so one build serves all their values
+SEARCH_SETTINGS = ("nprobe", "ef_search", "rerank")
+
+DEFAULT_SWEEP = [
+    {"type": "flat"},
+    {"type": "hnsw", "ef_search": [16, 32, 64, 128]},
+    {"type": "ivf_flat", "nprobe": [1, 4, 16, 64]},
+    {"type": "ivf_pq", "nprobe": [4, 16, 64], "rerank": [1, 4]},
+    {"type": "sq", "sq_type": "fp16"},
+    {"type": "sq", "sq_type": "sq8", "rerank": [1, 4]},
+    {"type": "pq", "rerank": [1, 4, 8]},
+]
+
+
+def faq_corpus(queries=None):
+    manifest = read_manifest()
+    if not version_exists(manifest):
+        raise SystemExit("No published FAQ index found. Please run faq_ingest.py first.")
+    metadata = open_metadata(manifest)
+    try:
+        faqs = list(metadata.rows(manifest["version"]))
+    finally:
+        metadata.close()
+    return [faq["question"] for faq in faqs], queries or [faq["answer"] for faq in faqs]
+
+
+def jobs_corpus(path, queries=None):
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        jobs = [row for row in csv.DictReader(f) if row.get("search_text")]
+    if not jobs:
+        raise SystemExit(f"{path} has no search_text column; run clean_job_data.py first")
+    return [job["search_text"] for job in jobs], queries or list(dict.fromkeys(job["Job Title"] for job in jobs))
+
+
+def mrr(expected, found):
+    """Mean reciprocal rank of each query's exact nearest neighbour in the returned list."""
+    total = 0.0
+    for e, f in zip(expected, found):
+        rank = np.flatnonzero(f == e[0])
+        total += 1.0 / (rank[0] + 1) if rank.size else 0.0
+    return total / len(expected)
+
+
+def expand(config):
+    """(build config, [search settings]) for one sweep entry."""
+    build = {key: value for key, value in config.items() if key not in SEARCH_SETTINGS or not isinstance(value, list)}
+    swept = {key: value for key, value in config.items() if key in SEARCH_SETTINGS and isinstance(value, list)}
+    combos = [dict(zip(swept, values)) for values in itertools.product(*swept.values())]
+    return build, combos
+
+
+def config_label(build, settings):
+    config = {**build, **settings}
+    label = config["type"] + "".join(f" {k}={v}" for k, v in config.items() if k not in ("type", "rerank"))
+    factor = rerank_factor(config)
+    return label + (f" rerank={factor}" if factor else "")
+
+
+def search(index, vector_file, queries, k, settings, batch_size):
+    """Search all queries in batches; returns (ids, seconds)."""
+    factor = rerank_factor(settings)
+    params = search_parameters(index, settings.get("nprobe"), settings.get("ef_search"))
+    found = []
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch_size):
+        batch = queries[i:i + batch_size]
+        _, ids = index.search(batch, min(index.ntotal, k * factor) if factor else k, params=params)
+        if factor:
+            _, ids = vector_file.rerank(batch, ids, k)
+        found.append(ids)
+    return np.vstack(found), time.perf_counter() - start
+
+
+def evaluate_corpus(name, texts, query_texts, backends, sweep, k, batch_size):
+    k = min(k, len(texts))
+    ids = np.arange(len(texts))
+    embeddings = {}
+    for backend in dict.fromkeys(["fp32", *backends]):
+        model = load_encoder(encoder_model, backend)
+        embeddings[backend] = (encode(model, texts), encode(model, query_texts))
+
+    # Ground truth: exact search over the fp32 embeddings
+    reference, reference_queries = embeddings["fp32"]
+    expected = faiss.knn(reference_queries, reference, k)[1]
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in backends:
+            corpus, queries = embeddings[backend]
+            # Full-precision vectors on disk, read by re-ranking as the server does
+            path = os.path.join(tmp, f"{backend}.f32")
+            writer = VectorFile(path, corpus.shape[1], writable=True)
+            writer.write(ids, corpus)
+            writer.close()
+            vector_file = VectorFile(path, corpus.shape[1])
+
+            for entry in sweep:
+                build, combos = expand(entry)
+                try:
+                    index, report = build_index(build, corpus, ids)
+                except (RuntimeError, ValueError, KeyError) as e:
+                    print(f"  skipped {config_label(build, {})} on {name}/{backend}: {e}")
+                    continue
+                for settings in combos:
+                    found, seconds = search(index, vector_file, queries, k, {**build, **settings}, batch_size)
+                    uses_vectors = rerank_factor({**build, **settings}) > 0
+                    rows.append({
+                        "corpus": name,
+                        "backend": backend,
+                        "config": {**build, **settings},
+                        "label": config_label(build, settings),
+                        f"recall_at_{k}": round(recall(expected, found), 4),
+                        f"mrr_at_{k}": round(mrr(expected, found), 4),
+                        "qps": round(len(queries) / seconds, 1) if seconds > 0 else None,
+                        "index_bytes": index_nbytes(index),
+                        "vectors_file_bytes": corpus.nbytes if uses_vectors else 0,
+                        "build_seconds": round(report["build_seconds"], 3),
+                    })
+            vector_file.close()
+    return {"corpus": name, "vectors": len(texts), "queries": len(query_texts), "dim": int(reference.shape[1]),
+            "k": k, "results": rows}
+
+
+def print_table(reports):
+    for report in reports:
+        k = report["k"]
+        print(f"\n{report['corpus']}: {report['vectors']} vectors of {report['dim']} dims, "
+              f"{report['queries']} queries, ground truth exact fp32 top-{k}")
+        print(f"{'config':<36} {'backend':<8} {f'recall@{k}':>9} {f'MRR@{k}':>7} {'QPS':>9} "
+              f"{'index MiB':>10} {'disk MiB':>9}")
+        for row in report["results"]:
+            print(f"{row['label']:<36} {row['backend']:<8} {row[f'recall_at_{k}']:>9.4f} "
+                  f"{row[f'mrr_at_{k}']:>7.4f} {row['qps'] or 0:>9.0f} "
+                  f"{row['index_bytes'] / 1024 / 1024:>10.2f} {row['vectors_file_bytes'] / 1024 / 1024:>9.2f}")
+
+
+def read_lines(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall@k, MRR, QPS and memory of index configurations")
+    parser.add_argument("--corpus", nargs="+", choices=["faq", "jobs"], default=["faq", "jobs"])
+    parser.add_argument("--configs", help="JSON file with a list of index configs to sweep (default: built-in sweep)")
+    parser.add_argument("--backends", nargs="+", default=["fp32"], help="Encoder backends to evaluate (fp32, int8)")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=1, help="Queries per search call when timing")
+    parser.add_argument("--threads", type=int, default=1, help="FAISS threads (1 keeps QPS comparable)")
+    parser.add_argument("--queries", help="FAQ queries, one per line (default: the FAQ answers)")
+    parser.add_argument("--job-queries", help="Job queries, one per line (default: the job titles)")
+    parser.add_argument("--jobs-csv", default=default_jobs_csv, help="Cleaned job CSV with a search_text column")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(args.threads)
+    sweep = DEFAULT_SWEEP
+    if args.configs:
+        with open(args.configs, "r") as f:
+            sweep = json.load(f)
+
+    reports = []
+    if "faq" in args.corpus:
+        texts, queries = faq_corpus(read_lines(args.queries) if args.queries else None)
+        reports.append(evaluate_corpus("faq", texts, queries, args.backends, sweep, args.top_k, args.batch_size))
+    if "jobs" in args.corpus:
+        texts, queries = jobs_corpus(args.jobs_csv, read_lines(args.job_queries) if args.job_queries else None)
+        reports.append(evaluate_corpus("jobs", texts, queries, args.backends, sweep, args.top_k, args.batch_size))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"model": encoder_model, "top_k": args.top_k, "threads": args.threads,
+                       "batch_size": args.batch_size, "corpora": reports}, f, indent=2)
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        print_table(reports)
@@ -0,0 +1,355 @@
+"""
+Load test for the FAQ API and the JobFinder API.
+
+Drives a running server (or one started with --spawn) with a weighted mix of
+requests, either closed-loop (--concurrency clients sending back to back) or
+open-loop (--rate requests per second, latency measured from the scheduled
+send time so a slow server can't hide its queueing). Query popularity follows
+a Zipf distribution, so repeated queries hit the caches about as often as
+real traffic would.
+
+Reports throughput and p50/p95/p99 latency per endpoint and writes the
+results, the settings and the git commit to JSON so runs can be compared:
+
+    python load_test.py run --target faq --spawn --concurrency 16 --duration 30 --output faq.json
+    python load_test.py run --target jobfinder --spawn --rate 200 --duration 30 --output jobs.json
+    python load_test.py compare before.json after.json
+
+--spawn runs the server locally. For JobFinder it serves job_dataset_demo.csv
+from an in-memory Weaviate stand-in (Weaviate/JobFinder/weaviate_standin.py),
+so the whole run is offline and measures our own code path.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+jobfinder_dir = os.path.join(script_dir, "..", "Weaviate", "JobFinder")
+
+FAQ_QUERIES = [
+    "forgot my password", "reset password", "how do i change my password", "purchase history",
+    "where are my orders", "return item", "refund policy", "how long do returns take",
+    "contact support", "talk to customer service", "support email", "update email address",
+    "change my email", "delete my account", "shipping time", "track my order", "cancel my order",
+    "payment methods", "change delivery address", "is my data safe",
+]
+
+# (weight, endpoint name) per target
+FAQ_MIX = [(0.85, "search"), (0.10, "search_knobs"), (0.05, "search_batch")]
+JOBFINDER_MIX = [(0.40, "semantic"), (0.30, "hybrid"), (0.20, "exact"), (0.10, "jobs_all")]
+
+
+class QueryPool:
+    """Query texts with Zipf-distributed popularity: a few are very common, most are rare."""
+
+    def __init__(self, queries, zipf_s, rng):
+        self.queries = list(queries)
+        weights = 1.0 / np.arange(1, len(self.queries) + 1) ** zipf_s
+        self.cumulative = np.cumsum(weights / weights.sum())
+        self.rng = rng
+
+    def pick(self):
+        i = int(np.searchsorted(self.cumulative, self.rng.random()))
+        return self.queries[min(i, len(self.queries) - 1)]
+
+
+def faq_queries(path=None):
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    # A long tail of rarer variants after the common phrasings
+    tail = [f"{q} {suffix}" for suffix in ("please", "asap", "help", "urgent", "today") for q in FAQ_QUERIES]
+    return FAQ_QUERIES + tail
+
+
+def job_queries(csv_path):
+    titles, locations, skills = [], [], []
+    with open(csv_path, "r", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            titles.append(row.get("Job Title") or "")
+            locations.append(row.get("location") or "")
+            skills.extend(s.strip() for s in (row.get("skills") or "").split(",")[:2])
+    unique = lambda values: list(dict.fromkeys(v for v in values if v))
+    return unique(titles), unique(locations), unique(skills)
+
+
+def faq_request_factory(pool, rng):
+    def make(endpoint):
+        if endpoint == "search":
+            return "POST", "/faq/search", {"json": {"query": pool.pick(), "top_k": rng.choice((1, 3, 3, 5))}}
+        if endpoint == "search_knobs":
+            return "POST", "/faq/search", {"json": {"query": pool.pick(), "top_k": 3,
+                                                    "nprobe": rng.choice((4, 16, 64)), "ef_search": 64}}
+        queries = [{"query": pool.pick(), "top_k": 3} for _ in range(8)]
+        return "POST", "/faq/search/batch", {"json": {"queries": queries}}
+    return make
+
+
+def jobfinder_request_factory(csv_path, zipf_s, rng, np_rng):
+    titles, locations, skills = job_queries(csv_path)
+    title_pool = QueryPool(titles, zipf_s, np_rng)
+    text_pool = QueryPool([f"{s} {t}".strip() for t in titles for s in skills[:5]] + titles, zipf_s, np_rng)
+
+    def make(endpoint):
+        if endpoint == "semantic":
+            return "POST", "/search/semantic", {"json": {"query": text_pool.pick(), "k": 10}}
+        if endpoint == "hybrid":
+            return "POST", "/search/hybrid", {"json": {"query": text_pool.pick(), "k": 10,
+                                                       "alpha": rng.choice((0.25, 0.5, 0.75))}}
+        if endpoint == "exact":
+            params = {"job_title": title_pool.pick().split()[-1], "k": 10}
+            if rng.random() < 0.3:
+                params["location"] = rng.choice(locations)
+            return "GET", "/search/exact", {"params": params}
+        return "GET", "/jobs/all", {"params": {"offset": rng.randrange(0, 200), "limit": 20}}
+    return make
+
+
+def pick_endpoint(mix, rng):
+    r = rng.random() * sum(w for w, _ in mix)
+    for weight, name in mix:
+        r -= weight
+        if r <= 0:
+            return name
+    return mix[-1][1]
+
+
+class Recorder:
+    def __init__(self, measure_from):
+        self.measure_from = measure_from
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint, started, latency_ms, status):
+        # Requests scheduled during warm-up are sent but not counted
+        if started < self.measure_from:
+            return
+        self.statuses[endpoint][status] += 1
+        if status == "200":
+            self.latencies[endpoint].append(latency_ms)
+
+
+async def send(client, recorder, endpoint, request, scheduled):
+    method, path, kwargs = request
+    try:
+        response = await client.request(method, path, **kwargs)
+        status = str(response.status_code)
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    recorder.record(endpoint, scheduled, (time.perf_counter() - scheduled) * 1000, status)
+
+
+async def closed_loop(client, recorder, make_request, mix, rng, concurrency, deadline):
+    async def worker():
+        while time.perf_counter() < deadline:
+            endpoint = pick_endpoint(mix, rng)
+            await send(client, recorder, endpoint, make_request(endpoint), time.perf_counter())
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def open_loop(client, recorder, make_request, mix, rng, concurrency, rate, poisson, deadline):
+    # At most `concurrency` requests in flight; later arrivals wait, and their
+    # wait counts towards their latency
+    slots = asyncio.Semaphore(concurrency)
+    tasks = set()
+
+    async def fire(endpoint, request, scheduled):
+        async with slots:
+            await send(client, recorder, endpoint, request, scheduled)
+
+    next_send = time.perf_counter()
+    while next_send < deadline:
+        delay = next_send - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        endpoint = pick_endpoint(mix, rng)
+        task = asyncio.create_task(fire(endpoint, make_request(endpoint), next_send))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        next_send += rng.expovariate(rate) if poisson else 1.0 / rate
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+def summarize(latencies, statuses, seconds):
+    ok = len(latencies)
+    total = sum(statuses.values())
+    summary = {
+        "requests": total,
+        "ok": ok,
+        "errors": total - ok,
+        "throughput_rps": round(ok / seconds, 2) if seconds > 0 else 0.0,
+        "statuses": dict(statuses),
+    }
+    if ok:
+        values = np.asarray(latencies)
+        summary.update({
+            "mean_ms": round(float(values.mean()), 2),
+            "p50_ms": round(float(np.percentile(values, 50)), 2),
+            "p95_ms": round(float(np.percentile(values, 95)), 2),
+            "p99_ms": round(float(np.percentile(values, 99)), 2),
+            "max_ms": round(float(values.max()), 2),
+        })
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=script_dir, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def spawn_server(target, port, jobs_csv):
+    env = dict(os.environ)
+    if target == "faq":
+        cwd, app, ready_path = script_dir, "main:app", "/health"
+    else:
+        cwd, app, ready_path = jobfinder_dir, "job_search_api:app", "/jobs/all?limit=1"
+        env["JOBFINDER_WEAVIATE_STANDIN"] = os.path.abspath(jobs_csv)
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port)],
+                               cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.perf_counter() + 120
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"{app} exited during start-up (code {process.returncode})")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}{ready_path}", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    process.terminate()
+    raise SystemExit(f"{app} did not become ready")
+
+
+async def run_load(args):
+    rng = random.Random(args.seed)
+    np_rng = np.random.default_rng(args.seed)
+    if args.target == "faq":
+        make_request = faq_request_factory(QueryPool(faq_queries(args.queries), args.zipf, np_rng), rng)
+        mix = FAQ_MIX
+    else:
+        make_request = jobfinder_request_factory(args.jobs_csv, args.zipf, rng, np_rng)
+        mix = JOBFINDER_MIX
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        start = time.perf_counter()
+        recorder = Recorder(measure_from=start + args.warmup)
+        deadline = start + args.warmup + args.duration
+        if args.rate:
+            await open_loop(client, recorder, make_request, mix, rng, args.concurrency, args.rate,
+                            args.arrivals == "poisson", deadline)
+        else:
+            await closed_loop(client, recorder, make_request, mix, rng, args.concurrency, deadline)
+        measured = time.perf_counter() - recorder.measure_from
+
+    all_latencies, all_statuses = [], defaultdict(int)
+    for endpoint, statuses in recorder.statuses.items():
+        all_latencies.extend(recorder.latencies[endpoint])
+        for status, count in statuses.items():
+            all_statuses[status] += count
+    return {
+        "target": args.target,
+        "url": args.url,
+        "git_commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "settings": {"concurrency": args.concurrency, "rate": args.rate, "arrivals": args.arrivals,
+                     "duration": args.duration, "warmup": args.warmup, "zipf": args.zipf, "seed": args.seed},
+        "seconds": round(measured, 2),
+        "overall": summarize(all_latencies, all_statuses, measured),
+        "endpoints": {endpoint: summarize(recorder.latencies[endpoint], statuses, measured)
+                      for endpoint, statuses in sorted(recorder.statuses.items())},
+    }
+
+
+def print_results(results):
+    settings = results["settings"]
+    load = f"{settings['rate']} req/s ({settings['arrivals']})" if settings["rate"] else "closed loop"
+    print(f"{results['target']} @ {results['url']} (commit {results['git_commit']}): "
+          f"{load}, concurrency {settings['concurrency']}, {results['seconds']:.0f}s")
+    print(f"  {'endpoint':<14} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, s in [*results["endpoints"].items(), ("overall", results["overall"])]:
+        print(f"  {name:<14} {s['requests']:>9} {s['errors']:>7} {s['throughput_rps']:>9.1f} "
+              f"{s.get('p50_ms', 0):>8.1f} {s.get('p95_ms', 0):>8.1f} {s.get('p99_ms', 0):>8.1f} {s.get('max_ms', 0):>8.1f}")
+    errors = {status: n for status, n in results["overall"]["statuses"].items() if status != "200"}
+    if errors:
+        print(f"  non-200 responses: {errors}")
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before['target']}: {before['git_commit']} -> {after['git_commit']}")
+    print(f"  {'endpoint':<14} {'metric':<15} {'before':>10} {'after':>10} {'change':>8}")
+    for name in [*after["endpoints"], "overall"]:
+        old = before["overall"] if name == "overall" else before["endpoints"].get(name)
+        new = after["overall"] if name == "overall" else after["endpoints"][name]
+        if old is None:
+            continue
+        for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "errors"):
+            a, b = old.get(metric, 0), new.get(metric, 0)
+            change = f"{(b - a) / a * 100:+.1f}%" if a else "-"
+            print(f"  {name:<14} {metric:<15} {a:>10} {b:>10} {change:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the FAQ or JobFinder API")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run a load test")
+    run_parser.add_argument("--target", choices=("faq", "jobfinder"), default="faq")
+    run_parser.add_argument("--url", help="Server to test (default: the spawned server, or 127.0.0.1:8000)")
+    run_parser.add_argument("--spawn", action="store_true", help="Start the server locally for the run")
+    run_parser.add_argument("--port", type=int, default=8020, help="Port for --spawn")
+    run_parser.add_argument("--concurrency", type=int, default=8, help="Clients, or max requests in flight with --rate")
+    run_parser.add_argument("--rate", type=float, help="Open-loop request rate (req/s); default is closed loop")
+    run_parser.add_argument("--arrivals", choices=("poisson", "uniform"), default="poisson")
+    run_parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    run_parser.add_argument("--warmup", type=float, default=5, help="Seconds of load before measuring")
+    run_parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout (s)")
+    run_parser.add_argument("--zipf", type=float, default=1.1, help="Skew of query popularity (0 = uniform)")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--queries", help="FAQ queries, one per line (default: built-in mix)")
+    run_parser.add_argument("--jobs-csv", default=os.path.join(jobfinder_dir, "job_dataset_demo.csv"),
+                            help="Jobs used for JobFinder queries and the spawned stand-in")
+    run_parser.add_argument("--output", help="Write the results as JSON to this file")
+
+    compare_parser = commands.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        compare(args.before, args.after)
+        sys.exit(0)
+
+    server = spawn_server(args.target, args.port, args.jobs_csv) if args.spawn else None
+    args.url = args.url or (f"http://127.0.0.1:{args.port}" if args.spawn else "http://127.0.0.1:8000")
+    try:
+        results = asyncio.run(run_load(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
@@ -1,83 +1,423 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import Optional, List
-from sentence_transformers import SentenceTransformer
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, List, Dict, Union
+from dataclasses import dataclass
 import numpy as np
 import faiss
-import json
+import asyncio
+import threading
 import os
+import time
+
+from faq_store import read_manifest, version_exists, load_version, open_vectors
+from faq_index_builder import search_parameters, rerank_factor, supports_selector, reconstruct_vectors
+from faq_filter_index import FilterIndex, normalize_filter, brute_force_search
+from query_batcher import QueryBatcher
+from search_pool import SearchPool, PoolSaturated
+from query_cache import QueryCache
+from faq_encoder import load_encoder, encoder_spec, published_encoder
+import faq_encoder
+import faq_metrics
+from faq_metrics import timed, StatsCollector
+from request_metrics import RequestMetricsMiddleware
+from sampling_profiler import SamplingProfiler, ProfilerBusy
 
 app = FastAPI(title="FAQ Search API", description="A simple FAQ search service using FAISS and sentence transformers")
-model = SentenceTransformer("all-MiniLM-L6-v2")
+# Must match the encoder the index was built with (FAQ_ENCODER_MODEL / FAQ_ENCODER_BACKEND).
+# Loaded at import so that with `gunicorn --preload` the weights are read once
+# before the workers fork and shared between them. Don't run inference here:
+# torch thread pools started before a fork can hang the workers.
+model = load_encoder()
+
+# Largest number of queries accepted by /faq/search/batch
+max_batch_queries = int(os.environ.get("FAQ_MAX_BATCH_QUERIES", "256"))
+# Largest top_k accepted per query
+max_top_k = int(os.environ.get("FAQ_MAX_TOP_K", "100"))
+
+# Coalescing of concurrent /faq/search requests into one encode/search batch
+batch_max_size = int(os.environ.get("FAQ_BATCH_MAX_SIZE", "32"))
+batch_max_wait_ms = float(os.environ.get("FAQ_BATCH_MAX_WAIT_MS", "2"))
+
+# Worker threads for encode/search and how many jobs may wait for one before
+# requests are rejected with 503
+search_workers = int(os.environ.get("FAQ_SEARCH_WORKERS", str(os.cpu_count() or 1)))
+search_queue_size = int(os.environ.get("FAQ_SEARCH_QUEUE_SIZE", "64"))
+
+# Bounded LRU caches for query embeddings and search results (0 disables)
+query_cache = QueryCache(
+    max_embeddings=int(os.environ.get("FAQ_EMBEDDING_CACHE_SIZE", "10000")),
+    max_results=int(os.environ.get("FAQ_RESULT_CACHE_SIZE", "10000"))
+)
+
+# How often to check for a version published by faq_ingest.py (seconds)
+reload_interval = float(os.environ.get("FAQ_RELOAD_INTERVAL", "5"))
+
+# Filters matching at most this many FAQs are answered by scanning just their
+# vectors instead of a filtered index search
+filter_brute_force_max = int(os.environ.get("FAQ_FILTER_BRUTE_FORCE_MAX", "2000"))
+
+# Memory-map the index read-only so worker processes share one copy of it
+index_mmap = os.environ.get("FAQ_INDEX_MMAP", "1") == "1"
+
+# Encoded and searched once per worker before /health reports ready
+warmup_queries = [
+    "How can I reset my password?",
+    "Where can I see my orders?",
+    "How do I contact customer support?",
+]
+warmup_embeddings: Optional[np.ndarray] = None
+warmup_seconds: Optional[float] = None
+
+# GET /debug/profile records a sampling profile of the running server; off
+# unless FAQ_PROFILER_ENABLED=1
+profiler = SamplingProfiler() if os.environ.get("FAQ_PROFILER_ENABLED", "0") == "1" else None
+
+@dataclass(frozen=True)
+class FAQSnapshot:
+    version: int
+    index: faiss.Index
+    metadata: object  # SQLiteMetadataStore, or JSONMetadata for unmigrated data
+    index_type: str = "flat"
+    vectors: object = None  # VectorFile with full-precision vectors when the index re-ranks
+    rerank: int = 0
+    filters: Optional[FilterIndex] = None
+
+# The loaded index/metadata pair. Requests read this reference once, so a
+# reload swaps it for new requests while in-flight ones finish on the old pair.
+snapshot: Optional[FAQSnapshot] = None
+reload_lock = threading.Lock()
+# Last version skipped because it was encoded with a different encoder
+rejected_version: Optional[int] = None
+
+def reload_snapshot(force: bool = False) -> bool:
+    """Load the published version if it differs from the one in memory."""
+    global snapshot, rejected_version
+    with reload_lock:
+        manifest = read_manifest()
+        if not version_exists(manifest):
+            return False
+        if not force and snapshot is not None and snapshot.version == manifest["version"]:
+            return False
+        if published_encoder(manifest) != encoder_spec():
+            # Query vectors from this encoder can't be searched against that index
+            if rejected_version != manifest["version"]:
+                rejected_version = manifest["version"]
+                print(f"Not loading FAQ index version {manifest['version']}: it was encoded with "
+                      f"{published_encoder(manifest)}, this server uses {encoder_spec()}")
+            return False
+        manifest, index, metadata = load_version(manifest, mmap=index_mmap)
+        warm_index(index)
+        config = (manifest.get("index") or {}).get("config") or {}
+        vectors = open_vectors(manifest)
+        rerank = rerank_factor(config) if vectors is not None and vectors.dim == index.d else 0
+        filters = FilterIndex.from_store(metadata, manifest["version"])
+        snapshot = FAQSnapshot(version=manifest["version"], index=index, metadata=metadata,
+                               index_type=config.get("type", "flat"), vectors=vectors if rerank else None,
+                               rerank=rerank, filters=filters)
+        query_cache.set_version(snapshot.version)
+        return True
 
-# Use absolute paths to ensure the files are found regardless of working directory
-script_dir = os.path.dirname(os.path.abspath(__file__))
-data_dir = os.path.join(script_dir, "data")
-faq_index_path = os.path.join(data_dir, "faq_index.index")
-faq_meta_path = os.path.join(data_dir, "faq_metadata.json")
+def warm_index(index):
+    # Touches the pages of a mapped index the first searches need
+    if warmup_embeddings is not None and warmup_embeddings.shape[1] == index.d:
+        index.search(warmup_embeddings, 3)
+
+def warm_up():
+    """Run the encoder and a search once, so the first request doesn't pay for
+    lazy initialisation (torch thread pools, page faults in the mapped index)."""
+    global warmup_embeddings, warmup_seconds
+    start = time.perf_counter()
+    warmup_embeddings = faq_encoder.encode(model, warmup_queries)
+    current = snapshot
+    if current is not None:
+        warm_index(current.index)
+        current.metadata.count(current.version)
+    warmup_seconds = time.perf_counter() - start
+    print(f"Warm-up finished in {warmup_seconds:.2f}s")
+
+def resident_memory_mb() -> Optional[float]:
+    """Resident set size of this process (Linux only)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024, 1)
+    except (OSError, ValueError):
+        return None
+
+async def watch_for_new_versions():
+    while True:
+        await asyncio.sleep(reload_interval)
+        try:
+            if await asyncio.to_thread(reload_snapshot):
+                print(f"Loaded FAQ index version {snapshot.version}")
+        except Exception as e:
+            print(f"Failed to reload FAQ index: {e}")
 
 class FAQSearchRequest(BaseModel):
     query: str
-    top_k: Optional[int] = 3
+    # Validated here: queries of one search_faqs call share max(top_ks), so one bad value would fail them all
+    top_k: int = Field(3, ge=1, le=max_top_k)
+    # Search-time knobs for approximate indexes; ignored by index types they do not apply to
+    nprobe: Optional[int] = Field(None, ge=1)
+    ef_search: Optional[int] = Field(None, ge=1)
+    # Only return FAQs whose attributes match, e.g. {"category": "billing", "locale": ["en-US", "en-GB"]}:
+    # any of the values of a field, all of the fields
+    filter: Optional[Dict[str, Union[str, List[str]]]] = None
+
+    @field_validator("filter")
+    @classmethod
+    def check_filter(cls, value):
+        normalize_filter(value)
+        return value
+
+    def search_knobs(self) -> tuple:
+        return (self.nprobe, self.ef_search, normalize_filter(self.filter))
+
+DEFAULT_KNOBS = (None, None, None)
 
 class FAQSearchResult(BaseModel):
     question: str
     answer: str
     score: float
+    category: Optional[str] = None
+    locale: Optional[str] = None
+    product: Optional[str] = None
 
 class FAQSearchResponse(BaseModel):
     results: List[FAQSearchResult]
 
+class FAQBatchSearchRequest(BaseModel):
+    queries: List[FAQSearchRequest] = Field(..., min_length=1, max_length=max_batch_queries)
+
+class FAQBatchSearchResponse(BaseModel):
+    # One result list per query, in the order the queries were sent
+    results: List[List[FAQSearchResult]]
+
+def embed_queries(queries: List[str]) -> np.ndarray:
+    """Return query embeddings, encoding only the queries not already cached."""
+    embeddings = [query_cache.get_embedding(q) for q in queries]
+    missing = [i for i, e in enumerate(embeddings) if e is None]
+    if missing:
+        with timed("embed"):
+            encoded = faq_encoder.encode(model, [queries[i] for i in missing])
+        for i, embedding in zip(missing, encoded):
+            query_cache.put_embedding(queries[i], embedding)
+            embeddings[i] = embedding
+    return np.vstack(embeddings)
+
+def search_subset(current: FAQSnapshot, query_np: np.ndarray, ids: np.ndarray, k: int):
+    """Exact search over the few FAQs a selective filter leaves."""
+    with timed("index_search"):
+        if current.vectors is not None:
+            vectors = current.vectors.read(ids)
+        else:
+            vectors = reconstruct_vectors(current.index, ids)
+        return brute_force_search(query_np, vectors, ids, k)
+
+def search_faqs(current: FAQSnapshot, queries: List[str], top_ks: List[int],
+                search_knobs: tuple = DEFAULT_KNOBS) -> List[List[FAQSearchResult]]:
+    """Encode all queries in one batch and search them with one index.search call."""
+    query_np = embed_queries(queries)
+
+    # Search once with the largest k, then cut each row down to its own top_k
+    k = max(top_ks)
+    nprobe, ef_search, filters = search_knobs
+    selector = None
+    if filters is not None:
+        with timed("filter"):
+            matched = current.filters.match(filters)
+            use_selector = len(matched) > filter_brute_force_max and supports_selector(current.index)
+            bitmap = current.filters.bitmap(matched) if use_selector else None
+        if bitmap is None:
+            D, I = search_subset(current, query_np, matched, k)
+        else:
+            # Restricts the search itself; `bitmap` stays alive until it has finished
+            selector = current.filters.selector(bitmap)
+    if filters is None or selector is not None:
+        params = search_parameters(current.index, nprobe, ef_search, selector)
+        with timed("index_search"):
+            D, I = current.index.search(query_np, k * current.rerank if current.rerank else k, params=params)
+        if current.rerank:
+            # Compressed distances only pick candidates; the full-precision vectors order them
+            with timed("rerank"):
+                D, I = current.vectors.rerank(query_np, I, k)
+
+    # Fetch only the metadata rows this batch needs
+    needed = {int(idx) for row_ids, top_k in zip(I, top_ks) for idx in row_ids[:top_k] if idx >= 0}
+    with timed("metadata"):
+        metadata = current.metadata.fetch(needed, current.version)
+
+    all_results = []
+    with timed("results"):
+        for query, row_ids, row_scores, top_k in zip(queries, I, D, top_ks):
+            results = []
+            for idx, score in zip(row_ids[:top_k], row_scores[:top_k]):
+                meta = metadata.get(int(idx))
+                if meta is not None:
+                    results.append(FAQSearchResult(
+                        question=meta["question"],
+                        answer=meta["answer"],
+                        score=float(score),
+                        category=meta.get("category"),
+                        locale=meta.get("locale"),
+                        product=meta.get("product")
+                    ))
+            query_cache.put_results(query, top_k, current.version, results, search_knobs)
+            all_results.append(results)
+    return all_results
+
+def json_response(response: BaseModel) -> Response:
+    # Serialized here instead of by FastAPI so the time is recorded as its own stage
+    with timed("serialize"):
+        # Unset FAQ attributes are left out rather than sent as null
+        return Response(content=response.model_dump_json(exclude_none=True), media_type="application/json")
+
+search_pool = SearchPool(workers=search_workers, queue_size=search_queue_size)
+
+async def search_coalesced_batch(queries: List[str], top_ks: List[int]) -> List[List[FAQSearchResult]]:
+    # Every query in a coalesced batch is answered from the same snapshot
+    return await search_pool.run(search_faqs, snapshot, queries, top_ks)
+
+def saturated_error(e: PoolSaturated) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+query_batcher = QueryBatcher(search_coalesced_batch, max_batch_size=batch_max_size, max_wait_ms=batch_max_wait_ms,
+                             shared_errors=(PoolSaturated,))
+
 @app.post("/faq/search", response_model=FAQSearchResponse)
 async def faq_search(request: FAQSearchRequest):
+    current = snapshot
+    if current is None:
+        raise HTTPException(status_code=404, detail="FAQ index not found. Please run faq_ingest.py first.")
+    knobs = request.search_knobs()
+    cached = query_cache.get_results(request.query, request.top_k, current.version, knobs)
+    if cached is not None:
+        return json_response(FAQSearchResponse(results=cached))
     try:
-        # Check if files exist
-        if not os.path.exists(faq_index_path):
-            raise HTTPException(status_code=404, detail="FAQ index not found. Please run faq_ingest.py first.")
-        if not os.path.exists(faq_meta_path):
-            raise HTTPException(status_code=404, detail="FAQ metadata not found. Please run faq_ingest.py first.")
-        
-        # Encode the query
-        query_embedding = model.encode([request.query])
-        query_np = np.array(query_embedding, dtype='float32')
-
-        # Load index and search
-        index = faiss.read_index(faq_index_path)
-        D, I = index.search(query_np, request.top_k)
-
-        # Load metadata
-        with open(faq_meta_path, 'r') as f:
-            metadata = json.load(f)
-
-        # Prepare results
-        results = []
-        for idx, score in zip(I[0], D[0]):
-            if idx < len(metadata):  # Check bounds
-                meta = metadata[idx]
-                results.append(FAQSearchResult(
-                    question=meta["question"],
-                    answer=meta["answer"],
-                    score=float(score)
-                ))
-
-        return FAQSearchResponse(results=results)
+        if knobs == DEFAULT_KNOBS:
+            results = await query_batcher.search(request.query, request.top_k)
+        else:
+            # Requests with their own knobs can't share a coalesced batch
+            results = (await search_pool.run(search_faqs, current, [request.query], [request.top_k], knobs))[0]
+        return json_response(FAQSearchResponse(results=results))
     
+    except PoolSaturated as e:
+        raise saturated_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.post("/faq/search/batch", response_model=FAQBatchSearchResponse)
+async def faq_search_batch(request: FAQBatchSearchRequest):
+    current = snapshot
+    if current is None:
+        raise HTTPException(status_code=404, detail="FAQ index not found. Please run faq_ingest.py first.")
+    results = [query_cache.get_results(q.query, q.top_k, current.version, q.search_knobs()) for q in request.queries]
+
+    # One search call per distinct set of knobs among the cache misses
+    groups = {}
+    for i, r in enumerate(results):
+        if r is None:
+            groups.setdefault(request.queries[i].search_knobs(), []).append(i)
+    try:
+        for knobs, rows in groups.items():
+            searched = await search_pool.run(
+                search_faqs,
+                current,
+                [request.queries[i].query for i in rows],
+                [request.queries[i].top_k for i in rows],
+                knobs
+            )
+            for i, r in zip(rows, searched):
+                results[i] = r
+        return json_response(FAQBatchSearchResponse(results=results))
+    
+    except PoolSaturated as e:
+        raise saturated_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @app.get("/")
 async def root():
-    return {"message": "FAQ Search API is running! Use POST /faq/search to search FAQs."}
+    return {"message": "FAQ Search API is running! Use POST /faq/search or POST /faq/search/batch to search FAQs."}
 
 @app.get("/health")
 async def health_check():
-    index_exists = os.path.exists(faq_index_path)
-    metadata_exists = os.path.exists(faq_meta_path)
-    return {
-        "status": "healthy" if index_exists and metadata_exists else "not ready",
-        "index_exists": index_exists,
-        "metadata_exists": metadata_exists
-    }
+    current = snapshot
+    if current is None:
+        status = "not ready"
+    elif warmup_seconds is None:
+        status = "warming up"
+    else:
+        status = "ready"
+    # 503 until ready, so load balancers hold traffic back during start-up
+    return JSONResponse(status_code=200 if status == "ready" else 503, content={
+        "status": status,
+        "index_version": current.version if current is not None else None,
+        "vector_count": int(current.index.ntotal) if current is not None else 0,
+        "index_type": current.index_type if current is not None else None,
+        "rerank": current.rerank if current is not None else 0,
+        "encoder": encoder_spec(),
+        "warmup_seconds": round(warmup_seconds, 3) if warmup_seconds is not None else None,
+        "worker": {"pid": os.getpid(), "rss_mb": resident_memory_mb()}
+    })
+
+@app.get("/faq/filters")
+async def filter_values():
+    """Attribute values that can be filtered on, with the number of FAQs having each."""
+    current = snapshot
+    if current is None:
+        raise HTTPException(status_code=404, detail="FAQ index not found. Please run faq_ingest.py first.")
+    return current.filters.values()
+
+@app.get("/stats/batching")
+async def batching_stats():
+    return query_batcher.stats()
+
+@app.get("/stats/cache")
+async def cache_stats():
+    return query_cache.stats()
+
+@app.get("/stats/search_pool")
+async def search_pool_stats():
+    return search_pool.stats()
+
+@app.get("/metrics")
+async def metrics():
+    content, content_type = faq_metrics.render()
+    return Response(content=content, media_type=content_type)
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def debug_profile(seconds: float = Query(10.0, gt=0, le=60), interval_ms: float = Query(5.0, ge=1)):
+    """Sample every thread's stack for `seconds`; returns collapsed stacks for a flame graph."""
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiling is disabled. Set FAQ_PROFILER_ENABLED=1 to enable it.")
+    try:
+        return await asyncio.to_thread(profiler.profile, seconds, interval_ms / 1000)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+def index_stats():
+    current = snapshot
+    if current is None:
+        return None
+    return {"version": current.version, "vectors": int(current.index.ntotal)}
+
+faq_metrics.registry.register(StatsCollector(query_cache.stats, query_batcher.stats, search_pool.stats, index_stats))
+app.add_middleware(RequestMetricsMiddleware, paths=[route.path for route in app.routes],
+                   metrics=faq_metrics.http_metrics)
+
+@app.on_event("startup")
+async def startup_event():
+    reload_snapshot()
+    query_batcher.start()
+    app.state.reload_task = asyncio.create_task(watch_for_new_versions())
+    app.state.warmup_task = asyncio.create_task(asyncio.to_thread(warm_up))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.reload_task.cancel()
+    await query_batcher.stop()
+    search_pool.shutdown()
 
 if __name__ == "__main__":
     import uvicorn
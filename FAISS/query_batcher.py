@@ -0,0 +1,140 @@
+"""
+Dynamic request coalescing for FAQ search.
+
+Concurrent single-query requests are queued and collected into one batch,
+which is handed to a single search call (one encode batch and one
+index.search). A batch is dispatched as soon as it reaches max_batch_size
+or the oldest request has waited max_wait_ms, whichever comes first.
+
+If a batch fails, its queries are run again one at a time, so a query that
+makes the search raise fails only its own request. Errors listed in
+shared_errors (e.g. an overloaded pool) would fail every query alike and are
+passed to the whole batch without retrying.
+"""
+
+import asyncio
+import time
+from collections import Counter, deque
+
+
+class QueryBatcher:
+    def __init__(self, search_batch, max_batch_size=32, max_wait_ms=2.0, stats_window=1000, shared_errors=()):
+        # search_batch is an async callable: (queries, top_ks) -> list of results, one per query
+        self.search_batch = search_batch
+        self.shared_errors = tuple(shared_errors)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = None
+        self.worker = None
+        self.running = set()
+
+        # Statistics for tuning max_batch_size and max_wait_ms
+        self.batches = 0
+        self.queries = 0
+        self.batch_sizes = Counter()
+        self.total_wait = 0.0
+        self.max_queue_wait = 0.0
+        self.recent_waits = deque(maxlen=stats_window)
+        self.failed_batches = 0
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self.worker = asyncio.create_task(self._collect())
+
+    async def stop(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
+        if self.running:
+            await asyncio.gather(*self.running, return_exceptions=True)
+
+    async def search(self, query, top_k):
+        """Queue one query and wait for its result from a coalesced batch."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((query, top_k, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        while True:
+            batch = [await self.queue.get()]
+            deadline = batch[0][3] + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Dispatch without waiting so the next batch can start collecting
+            task = asyncio.create_task(self._run(batch))
+            self.running.add(task)
+            task.add_done_callback(self.running.discard)
+
+    async def _run(self, batch):
+        dispatched = time.perf_counter()
+        self._record(batch, dispatched)
+        queries = [item[0] for item in batch]
+        top_ks = [item[1] for item in batch]
+        try:
+            results = await self.search_batch(queries, top_ks)
+        except Exception as e:
+            if len(batch) == 1 or isinstance(e, self.shared_errors):
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            self.failed_batches += 1
+            await self._run_singly(batch)
+            return
+        for (_, _, future, _), result in zip(batch, results):
+            # The caller may have gone away (e.g. client disconnect)
+            if not future.done():
+                future.set_result(result)
+
+    async def _run_singly(self, batch):
+        # One after another, so the retries don't flood the search pool
+        for query, top_k, future, _ in batch:
+            if future.done():
+                continue
+            try:
+                result = (await self.search_batch([query], [top_k]))[0]
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            if not future.done():
+                future.set_result(result)
+
+    def _record(self, batch, dispatched):
+        self.batches += 1
+        self.queries += len(batch)
+        self.batch_sizes[len(batch)] += 1
+        for item in batch:
+            wait = dispatched - item[3]
+            self.total_wait += wait
+            self.max_queue_wait = max(self.max_queue_wait, wait)
+            self.recent_waits.append(wait)
+
+    def stats(self):
+        recent = sorted(self.recent_waits)
+
+        def percentile_ms(p):
+            if not recent:
+                return 0.0
+            return recent[min(len(recent) - 1, int(p * len(recent)))] * 1000
+
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "queries": self.queries,
+            "avg_batch_size": self.queries / self.batches if self.batches else 0.0,
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "avg_queue_wait_ms": self.total_wait / self.queries * 1000 if self.queries else 0.0,
+            "p50_queue_wait_ms": percentile_ms(0.50),
+            "p95_queue_wait_ms": percentile_ms(0.95),
+            "max_queue_wait_ms": self.max_queue_wait * 1000,
+        }
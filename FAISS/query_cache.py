@@ -0,0 +1,101 @@
+"""
+In-process caches for repeated FAQ queries.
+
+Query embeddings are cached by normalized query text. Search results are
+cached separately by normalized text, top_k and search knobs, and tagged
+with the index version they were computed against, so a result from an
+older index is never served after a reload. Both caches are bounded and evict the least
+recently used entry.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+def normalize_query(query):
+    """Lowercase and collapse whitespace so trivially different queries share entries."""
+    return " ".join(query.lower().split())
+
+
+class LRUCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        # Accessed from the search worker threads as well as the event loop
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+class QueryCache:
+    def __init__(self, max_embeddings, max_results):
+        self.embeddings = LRUCache(max_embeddings)
+        self.results = LRUCache(max_results)
+        self.version = None
+
+    def get_embedding(self, query):
+        return self.embeddings.get(normalize_query(query))
+
+    def put_embedding(self, query, embedding):
+        self.embeddings.put(normalize_query(query), embedding)
+
+    def get_results(self, query, top_k, version, search_knobs=()):
+        entry = self.results.get((normalize_query(query), top_k, search_knobs))
+        if entry is None or entry[0] != version:
+            return None
+        return entry[1]
+
+    def put_results(self, query, top_k, version, results, search_knobs=()):
+        if version == self.version:
+            self.results.put((normalize_query(query), top_k, search_knobs), (version, results))
+
+    def set_version(self, version):
+        """Drop cached results when a new index version is loaded.
+
+        Embeddings depend only on the encoder, so they stay valid.
+        """
+        if version != self.version:
+            self.results.clear()
+            self.version = version
+
+    def stats(self):
+        return {
+            "index_version": self.version,
+            "embeddings": self.embeddings.stats(),
+            "results": self.results.stats(),
+        }
@@ -0,0 +1,81 @@
+"""
+Stage timers and per-endpoint HTTP metrics for an ASGI app.
+
+The same file is in FAISS/ and Weaviate/JobFinder/, as is
+sampling_profiler.py. The two APIs are separate example projects without a
+shared package to import from, so the copies are deliberate: change both
+together. Each app's metrics module (faq_metrics.py, jobfinder_metrics.py)
+declares its own metrics and builds the generic parts with these helpers.
+"""
+
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram
+
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def stage_timer(histogram, stages):
+    """A timed(stage) context manager recording into `histogram`, labelled by stage."""
+    # Label lookups are resolved once, not on every observation
+    timers = {stage: histogram.labels(stage) for stage in stages}
+
+    @contextmanager
+    def timed(stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timers[stage].observe(time.perf_counter() - start)
+
+    return timed
+
+
+class RequestMetrics:
+    """<prefix>_request_seconds{endpoint}, <prefix>_requests_total{endpoint,status}
+    and <prefix>_requests_in_flight{endpoint} in `registry`."""
+
+    def __init__(self, prefix, registry, buckets=REQUEST_BUCKETS):
+        self.seconds = Histogram(f"{prefix}_request_seconds", "HTTP request latency", ["endpoint"],
+                                 buckets=buckets, registry=registry)
+        self.total = Counter(f"{prefix}_requests", "HTTP requests by endpoint and status", ["endpoint", "status"],
+                             registry=registry)
+        self.in_flight = Gauge(f"{prefix}_requests_in_flight", "HTTP requests being handled", ["endpoint"],
+                               registry=registry)
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware recording latency, status and in-flight count per endpoint into RequestMetrics.
+
+    Paths that aren't routes of the app are counted as "other", so scanners
+    hitting random URLs can't create unbounded label values.
+    """
+
+    def __init__(self, app, paths, metrics):
+        self.app = app
+        self.paths = set(paths)
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        endpoint = scope["path"] if scope["path"] in self.paths else "other"
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        in_flight = self.metrics.in_flight.labels(endpoint)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.metrics.seconds.labels(endpoint).observe(time.perf_counter() - start)
+            self.metrics.total.labels(endpoint, status).inc()
+            in_flight.dec()
@@ -0,0 +1,61 @@
+"""
+Bounded worker pool for the CPU-bound parts of FAQ search.
+
+model.encode and index.search release the GIL, so running them on a thread
+pool keeps the event loop free for other connections (including /health)
+while letting searches use several cores. At most `workers` jobs run at
+once; up to `queue_size` more wait for a free worker, and anything beyond
+that is rejected with PoolSaturated so the API can answer 503.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+class SearchPool:
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="faq-search")
+        self.slots = asyncio.Semaphore(workers)
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, fn, *args):
+        """Run fn(*args) on a worker thread, waiting for a free worker if needed."""
+        if self.slots.locked() and self.waiting >= self.queue_size:
+            self.rejected += 1
+            raise PoolSaturated(f"Search pool is saturated ({self.workers} running, {self.waiting} queued)")
+
+        self.waiting += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self.slots.release()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "running": self.running,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,153 @@
+"""
+Measure start-up time and per-worker memory of the FAQ API (Linux only).
+
+Starts the server with N workers, then reports
+
+- time until the first HTTP response and the first successful search,
+- time until every worker reports "ready" on /health (warm-up finished),
+- RSS, PSS and shared/private memory of each worker process. PSS splits
+  shared pages between the processes that map them, so the PSS total is the
+  real memory cost of the whole server.
+
+    python startup_benchmark.py --server gunicorn --workers 4
+    python startup_benchmark.py --server uvicorn --workers 4 --no-mmap
+
+`gunicorn` preloads the model before forking (see gunicorn.conf.py);
+`uvicorn --workers` starts every worker from scratch, for comparison.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import requests
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def server_command(server, workers, port):
+    if server == "gunicorn":
+        return [sys.executable, "-m", "gunicorn", "main:app", "-c", "gunicorn.conf.py",
+                "--workers", str(workers), "--bind", f"127.0.0.1:{port}"]
+    return [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers)]
+
+
+def child_pids(pid):
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; the parent pid follows the closing parenthesis
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return children
+
+
+def process_memory(pid):
+    """RSS, PSS, shared and private memory of a process in MiB, from smaps_rollup."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss_mb": round(fields.get("Rss", 0.0), 1),
+        "pss_mb": round(fields.get("Pss", 0.0), 1),
+        "shared_mb": round(fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0), 1),
+        "private_mb": round(fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0), 1),
+    }
+
+
+def wait_until(check, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if check():
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.05)
+    return False
+
+
+def benchmark(server="gunicorn", workers=2, port=8010, mmap=True, timeout=300):
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, FAQ_INDEX_MMAP="1" if mmap else "0")
+    start = time.perf_counter()
+    process = subprocess.Popen(server_command(server, workers, port), cwd=script_dir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    results = {"server": server, "workers": workers, "mmap": mmap}
+    try:
+        if not wait_until(lambda: requests.get(f"{base_url}/", timeout=1).ok, timeout):
+            raise SystemExit("Server did not start")
+        results["first_response_seconds"] = round(time.perf_counter() - start, 3)
+
+        payload = {"query": "How can I reset my password?", "top_k": 3}
+        if not wait_until(lambda: requests.post(f"{base_url}/faq/search", json=payload, timeout=30).ok, timeout):
+            raise SystemExit("Search never succeeded; is there a published index?")
+        results["first_search_seconds"] = round(time.perf_counter() - start, 3)
+
+        # Connections land on arbitrary workers; poll until each has answered "ready"
+        ready = {}
+        def all_ready():
+            health = requests.get(f"{base_url}/health", timeout=1).json()
+            if health["status"] == "ready":
+                ready[health["worker"]["pid"]] = health
+            return len(ready) >= workers
+        all_seen = wait_until(all_ready, timeout)
+        results["ready_seconds"] = round(time.perf_counter() - start, 3) if all_seen else None
+        results["warmup_seconds"] = {pid: h["warmup_seconds"] for pid, h in ready.items()}
+
+        pids = child_pids(process.pid)
+        # uvicorn --workers adds a helper process between the supervisor and the workers
+        pids = [p for p in pids if p in ready] or pids
+        results["memory"] = {pid: process_memory(pid) for pid in pids}
+        results["master"] = process_memory(process.pid)
+        results["total_pss_mb"] = round(sum(m["pss_mb"] for m in results["memory"].values())
+                                        + results["master"]["pss_mb"], 1)
+        return results
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def print_results(results):
+    print(f"{results['server']}, {results['workers']} workers, mmap {'on' if results['mmap'] else 'off'}")
+    print(f"  first response: {results['first_response_seconds']:.2f}s, "
+          f"first search: {results['first_search_seconds']:.2f}s, "
+          f"all workers ready: {results['ready_seconds'] if results['ready_seconds'] is not None else 'timed out'}s")
+    print(f"  {'pid':>8} {'rss MiB':>9} {'pss MiB':>9} {'shared':>9} {'private':>9}")
+    for pid, memory in [("master", results["master"]), *results["memory"].items()]:
+        print(f"  {pid:>8} {memory['rss_mb']:>9.1f} {memory['pss_mb']:>9.1f} "
+              f"{memory['shared_mb']:>9.1f} {memory['private_mb']:>9.1f}")
+    print(f"  total PSS: {results['total_pss_mb']:.1f} MiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure FAQ API start-up time and memory per worker")
+    parser.add_argument("--server", choices=("gunicorn", "uvicorn"), default="gunicorn")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--no-mmap", action="store_true", help="Read the index into each worker's memory")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds to wait for each start-up stage")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    results = benchmark(args.server, args.workers, args.port, not args.no_mmap, args.timeout)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
@@ -1,57 +1,278 @@
 # Populate a vector index with embeddings from SentenceTransformer.
-import boto3
+#
+# Streams records from a file, encodes them in batches and uploads them with
+# concurrent put_vectors calls:
+#
+#     python ingest_to_s3.py movies.jsonl --workers 8 --failed-keys failed.jsonl
+#
+# Input is JSONL ({"key": ..., "text": ..., "metadata": {...}}; "id" also
+# works as the key) or plain text with one text per line, keyed by line
+# number. Without a file the three demo movies are ingested.
+#
+# - Vectors are grouped into put_vectors requests of at most --chunk-size
+#   vectors (the API allows 500) and --max-request-bytes of payload.
+# - Up to --workers requests run at once on one pooled client; encoding of the
+#   next batch continues meanwhile, and at most 2 * --workers requests are
+#   queued, so memory stays flat however large the input is.
+# - Throttled and transient errors are retried up to --max-attempts times with
+#   exponential backoff and jitter. Keys that still fail are written to
+#   --failed-keys in the input format, so the file can be ingested again.
+#
+# With --reduction (or S3VECTOR_REDUCTION) embeddings are reduced by a saved
+# s3vector_reduction.py artifact before upload; query_from_s3.py must use the
+# same one.
+#
+# Set S3VECTOR_STUB=<dir> to upload to the local stub client instead of AWS.
+# With --mirror <dir> (or S3VECTOR_MIRROR) every uploaded request is also
+# appended to that mirror's journal, so query processes serving from a local
+# mirror (s3vector_mirror.py) see the new vectors without a full refresh.
+import argparse
 import json
-from sentence_transformers import SentenceTransformer
-
-# Create S3 Vectors client and initialize SentenceTransformer model. 
-s3vectors = boto3.client("s3vectors", region_name="us-east-1")
-# Using a model that produces 1024-dimensional embeddings to match your S3 vector index
-model = SentenceTransformer("sentence-transformers/all-roberta-large-v1")  # 1024 dimensions
-
-# Texts to convert to embeddings.
-texts = [
-    "Star Wars: A farm boy joins rebels to fight an evil empire in space", 
-    "Jurassic Park: Scientists create dinosaurs in a theme park that goes wrong",
-    "Finding Nemo: A father fish searches the ocean to find his lost son"
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+
+import numpy as np
+from botocore.exceptions import ClientError, ConnectionClosedError, ConnectTimeoutError, ReadTimeoutError
+
+from s3vector_common import BUCKET, INDEX, MIRROR_PATH, REDUCTION_PATH, create_client, load_model
+
+# Texts to convert to embeddings when no input file is given.
+SAMPLE_MOVIES = [
+    {"key": "Star Wars", "text": "Star Wars: A farm boy joins rebels to fight an evil empire in space",
+     "metadata": {"genre": "scifi"}},
+    {"key": "Jurassic Park", "text": "Jurassic Park: Scientists create dinosaurs in a theme park that goes wrong",
+     "metadata": {"genre": "scifi"}},
+    {"key": "Finding Nemo", "text": "Finding Nemo: A father fish searches the ocean to find his lost son",
+     "metadata": {"genre": "family"}},
 ]
 
-# Generate vector embeddings using SentenceTransformer.
-embeddings = model.encode(texts)
-# Convert numpy arrays to lists for S3 vectors API compatibility
-embeddings = [embedding.tolist() for embedding in embeddings]
-
-# Write embeddings into vector index with metadata.
-# Note: This requires the S3 bucket and vector index to exist
-try:
-    s3vectors.put_vectors(
-        vectorBucketName="media-embeddings",   
-        indexName="movies",   
-        vectors=[
-            {
-                "key": "Star Wars",
-                "data": {"float32": embeddings[0]},
-                "metadata": {"source_text": texts[0], "genre":"scifi"}
-            },
-            {
-                "key": "Jurassic Park",
-                "data": {"float32": embeddings[1]},
-                "metadata": {"source_text": texts[1], "genre":"scifi"}
-            },
-            {
-                "key": "Finding Nemo",
-                "data": {"float32": embeddings[2]},
-                "metadata": {"source_text": texts[2], "genre":"family"}
-            }
-        ]
-    )
-    print("Successfully ingested vectors to S3!")
-except Exception as e:
-    print(f"Error ingesting vectors: {e}")
-    print("\nDemo: Showing what would be ingested:")
-    print(f"Generated {len(embeddings)} embeddings with dimension {len(embeddings[0])}")
-    for i, text in enumerate(texts):
-        print(f"  {i+1}. {text[:50]}... -> embedding dimension: {len(embeddings[i])}")
-    print("\nNote: To run this script successfully, you need:")
-    print("1. AWS credentials configured")
-    print("2. An S3 bucket named 'media-embeddings' with S3 vectors enabled")
-    print("3. A vector index named 'movies' created in that bucket")
\ No newline at end of file
+MAX_VECTORS_PER_REQUEST = 500
+# The service accepts larger requests; this leaves headroom for the JSON encoding estimate
+DEFAULT_MAX_REQUEST_BYTES = 16 * 1024 * 1024
+# Error codes worth retrying: throttling and transient server-side failures
+RETRYABLE_ERRORS = {"TooManyRequestsException", "ThrottlingException", "SlowDown", "ServiceUnavailableException",
+                    "InternalServerException", "RequestTimeoutException"}
+# Network failures worth retrying
+RETRYABLE_EXCEPTIONS = (ConnectionClosedError, ConnectTimeoutError, ReadTimeoutError)
+# Seconds between progress lines
+PROGRESS_INTERVAL = 10.0
+
+
+def read_records(path):
+    """Yield {"key", "text", "metadata"} records from a JSONL or text file without loading it whole."""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl") or path.endswith(".json"):
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                if not row.get("text"):
+                    raise ValueError(f"{path}: line {line_no} has no text")
+                yield {"key": str(row.get("key") or row.get("id") or line_no), "text": row["text"],
+                       "metadata": row.get("metadata") or {}}
+        else:
+            for line_no, line in enumerate(f, 1):
+                if line.strip():
+                    yield {"key": str(line_no), "text": line.strip(), "metadata": {}}
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def request_chunks(records, model, encode_batch, chunk_size, max_request_bytes, reduction=None):
+    """Encode records in batches and group them into (records, embeddings) put_vectors requests."""
+    pending, pending_vectors, pending_bytes = [], [], 0
+    for batch in batched(records, encode_batch):
+        embeddings = np.asarray(model.encode([r["text"] for r in batch], batch_size=encode_batch,
+                                             convert_to_numpy=True), dtype='float32')
+        if reduction is not None:
+            embeddings = reduction.apply(embeddings)
+        for record, embedding in zip(batch, embeddings):
+            # Rough size of the JSON body: about 12 characters per float plus the metadata
+            size = embedding.shape[0] * 12 + len(json.dumps(record["metadata"])) + len(record["text"]) + 64
+            if pending and (len(pending) >= chunk_size or pending_bytes + size > max_request_bytes):
+                yield pending, np.vstack(pending_vectors)
+                pending, pending_vectors, pending_bytes = [], [], 0
+            pending.append(record)
+            pending_vectors.append(embedding)
+            pending_bytes += size
+    if pending:
+        yield pending, np.vstack(pending_vectors)
+
+
+class Uploader:
+    def __init__(self, client, bucket, index, workers=8, max_attempts=8, base_delay=0.2, max_delay=20.0,
+                 on_uploaded=None):
+        self.client = client
+        self.bucket = bucket
+        self.index = index
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Called with each request's vectors after it succeeds, e.g. MirrorJournal.append_put
+        self.on_uploaded = on_uploaded
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="put_vectors")
+        self.in_flight = set()
+        self.lock = threading.Lock()
+        self.uploaded = 0
+        self.requests = 0
+        self.retries = 0
+        self.failed = []  # (record, error)
+        # Uploaded vectors whose on_uploaded call raised, and its first error
+        self.callback_failed = 0
+        self.callback_error = None
+        self.seconds = 0.0
+
+    def submit(self, records, embeddings):
+        # Bounded queue: wait for a request to finish before reading further ahead
+        while len(self.in_flight) >= self.workers * 2:
+            done, self.in_flight = wait(self.in_flight, return_when=FIRST_COMPLETED)
+            self._collect(done)
+        self.in_flight.add(self.pool.submit(self._put, records, embeddings))
+
+    @staticmethod
+    def _collect(done):
+        # Re-raises anything _put didn't handle instead of leaving it unread in the future
+        for future in done:
+            future.result()
+
+    def _put(self, records, embeddings):
+        # One tolist() per request instead of one per vector; boto3 needs Python floats
+        values = embeddings.tolist()
+        vectors = [{"key": r["key"], "data": {"float32": v}, "metadata": {**r["metadata"], "source_text": r["text"]}}
+                   for r, v in zip(records, values)]
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self.client.put_vectors(vectorBucketName=self.bucket, indexName=self.index, vectors=vectors)
+            except (ClientError, *RETRYABLE_EXCEPTIONS) as e:
+                code = e.response.get("Error", {}).get("Code") if isinstance(e, ClientError) else type(e).__name__
+                retryable = code in RETRYABLE_ERRORS or isinstance(e, RETRYABLE_EXCEPTIONS)
+                if retryable and attempt < self.max_attempts:
+                    with self.lock:
+                        self.retries += 1
+                    # Full jitter keeps throttled workers from retrying in lockstep
+                    time.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))))
+                    continue
+                self._fail(records, f"{code} after {attempt} attempts: {e}" if retryable else str(e))
+                return
+            except Exception as e:
+                # e.g. missing credentials: not worth retrying, but the keys must still be reported
+                self._fail(records, f"{type(e).__name__}: {e}")
+                return
+            with self.lock:
+                self.uploaded += len(records)
+                self.requests += 1
+            if self.on_uploaded:
+                try:
+                    self.on_uploaded(vectors)
+                except Exception as e:
+                    # The upload itself succeeded; count it so the caller can tell the callback's work is incomplete
+                    with self.lock:
+                        self.callback_failed += len(vectors)
+                        self.callback_error = self.callback_error or f"{type(e).__name__}: {e}"
+            return
+
+    def _fail(self, records, error):
+        with self.lock:
+            self.failed.extend((r, error) for r in records)
+
+    def finish(self):
+        done, _ = wait(self.in_flight)
+        self.in_flight = set()
+        self.pool.shutdown()
+        self._collect(done)
+
+
+def write_failed(path, failed):
+    with open(path, "w", encoding="utf-8") as f:
+        for record, error in failed:
+            f.write(json.dumps({**record, "error": error}) + "\n")
+
+
+def ingest(records, bucket=BUCKET, index=INDEX, encode_batch=64, chunk_size=MAX_VECTORS_PER_REQUEST,
+           max_request_bytes=DEFAULT_MAX_REQUEST_BYTES, workers=8, max_attempts=8, client=None, model=None,
+           on_uploaded=None, reduction=None):
+    """Encode and upload `records`; returns the finished Uploader with counts and failed keys."""
+    client = client or create_client(max_pool_connections=workers, max_attempts=1)
+    model = model or load_model()
+    uploader = Uploader(client, bucket, index, workers, max_attempts, on_uploaded=on_uploaded)
+    started = last_report = time.perf_counter()
+    encoded = 0
+    try:
+        chunks = request_chunks(records, model, encode_batch, min(chunk_size, MAX_VECTORS_PER_REQUEST),
+                                max_request_bytes, reduction)
+        for chunk_records, embeddings in chunks:
+            uploader.submit(chunk_records, embeddings)
+            encoded += len(chunk_records)
+            now = time.perf_counter()
+            if now - last_report >= PROGRESS_INTERVAL:
+                last_report = now
+                print(f"  {encoded} encoded, {uploader.uploaded} uploaded "
+                      f"({uploader.uploaded / (now - started):.0f} vectors/s, {uploader.retries} retries)")
+    finally:
+        uploader.finish()
+    uploader.seconds = time.perf_counter() - started
+    return uploader
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream texts into an S3 vector index")
+    parser.add_argument("path", nargs="?", help="JSONL or text file (default: the three demo movies)")
+    parser.add_argument("--bucket", default=BUCKET)
+    parser.add_argument("--index", default=INDEX)
+    parser.add_argument("--encode-batch", type=int, default=64, help="Texts encoded per model call")
+    parser.add_argument("--chunk-size", type=int, default=MAX_VECTORS_PER_REQUEST, help="Vectors per put_vectors")
+    parser.add_argument("--max-request-bytes", type=int, default=DEFAULT_MAX_REQUEST_BYTES)
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent put_vectors requests")
+    parser.add_argument("--max-attempts", type=int, default=8, help="Attempts per request before its keys fail")
+    parser.add_argument("--failed-keys", default="failed_keys.jsonl", help="Where to write records that failed")
+    parser.add_argument("--mirror", default=MIRROR_PATH, help="Local mirror directory whose journal gets the uploads")
+    parser.add_argument("--reduction", default=REDUCTION_PATH, help="Saved dimension reduction to apply (.npz)")
+    args = parser.parse_args()
+
+    records = read_records(args.path) if args.path else SAMPLE_MOVIES
+    client = create_client(max_pool_connections=args.workers, max_attempts=1)
+    on_uploaded = None
+    if args.mirror:
+        from s3vector_mirror import MirrorJournal
+        on_uploaded = MirrorJournal(args.mirror, args.bucket, args.index).append_put
+    reduction = None
+    if args.reduction:
+        from s3vector_reduction import load_reduction
+        reduction = load_reduction(args.reduction)
+        print(f"Reducing embeddings: {reduction.describe()}")
+    result = ingest(records, args.bucket, args.index, args.encode_batch, args.chunk_size, args.max_request_bytes,
+                    args.workers, args.max_attempts, client=client, on_uploaded=on_uploaded, reduction=reduction)
+    if hasattr(client, "close"):
+        client.close()
+
+    total = result.uploaded + len(result.failed)
+    print(f"Uploaded {result.uploaded} of {total} vectors to {args.bucket}/{args.index} in {result.seconds:.1f}s "
+          f"({result.uploaded / result.seconds if result.seconds > 0 else 0:.0f} vectors/s, "
+          f"{result.requests} requests, {result.retries} retries)")
+    if result.callback_failed:
+        print(f"Warning: {result.callback_failed} uploaded vectors are missing from the mirror journal in "
+              f"{args.mirror} ({result.callback_error}); refresh the mirror with s3vector_mirror.py")
+    if result.failed:
+        write_failed(args.failed_keys, result.failed)
+        print(f"{len(result.failed)} keys failed; wrote them to {args.failed_keys} "
+              f"(first error: {result.failed[0][1]})")
+        if result.uploaded == 0:
+            print("\nNote: To run this script successfully, you need:")
+            print("1. AWS credentials configured")
+            print(f"2. An S3 bucket named '{args.bucket}' with S3 vectors enabled")
+            print(f"3. A vector index named '{args.index}' created in that bucket")
+            print("Or set S3VECTOR_STUB=<dir> to use the local stub client.")
+    if result.failed or result.callback_failed:
+        sys.exit(1)
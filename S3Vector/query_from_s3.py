@@ -1,52 +1,148 @@
-# Query a vector index with an embedding from SentenceTransformer.
-import boto3 
+# Query a vector index with embeddings from SentenceTransformer.
+#
+# Many queries and filters are answered in one run:
+#
+#     python query_from_s3.py "adventures in space" "talking animals" \
+#         --filter none --filter '{"genre": "scifi"}' --top-k 3 --workers 8
+#
+# Every query text is run with every --filter ("none" is unfiltered); without
+# texts the demo query "adventures in space" runs unfiltered and scifi-only.
+#
+# - Texts are encoded together in batches of --encode-batch, and each distinct
+#   text only once: its embedding (already converted to the list boto3 sends)
+#   is shared by all of its filter variants.
+# - The query_vectors calls run on up to --workers threads over one pooled
+#   client, so the index sees at most that many requests at once.
+# - Results come back in input order, each with the latency of its call, and
+#   a failed call is reported in its result instead of stopping the batch.
+# - With --reduction (or S3VECTOR_REDUCTION) query embeddings are reduced
+#   like the ingested ones.
+import argparse
 import json
-from sentence_transformers import SentenceTransformer 
-
-# Create S3 Vectors client and initialize SentenceTransformer model. 
-s3vectors = boto3.client("s3vectors", region_name="us-east-1")
-# Using a model that produces 1024-dimensional embeddings to match your S3 vector index
-model = SentenceTransformer("sentence-transformers/all-roberta-large-v1")  # 1024 dimensions 
-
-# Query text to convert to an embedding. 
-input_text = "adventures in space"
-
-# Generate the vector embedding using SentenceTransformer.
-embedding = model.encode([input_text])[0].tolist()
-
-# Query vector index.
-try:
-    response = s3vectors.query_vectors(
-        vectorBucketName="media-embeddings",
-        indexName="movies",
-        queryVector={"float32": embedding}, 
-        topK=3, 
-        returnDistance=True,
-        returnMetadata=True
-    )
-    print("Query results:")
-    print(json.dumps(response["vectors"], indent=2))
-
-    # Query vector index with a metadata filter.
-    response = s3vectors.query_vectors(
-        vectorBucketName="media-embeddings",
-        indexName="movies",
-        queryVector={"float32": embedding}, 
-        topK=3, 
-        filter={"genre": "scifi"},
-        returnDistance=True,
-        returnMetadata=True
-    )
-    print("\nFiltered query results (scifi only):")
-    print(json.dumps(response["vectors"], indent=2))
-    
-except Exception as e:
-    print(f"Error querying vectors: {e}")
-    print(f"\nDemo: Generated embedding for query '{input_text}'")
-    print(f"Embedding dimension: {len(embedding)}")
-    print(f"First 5 values: {embedding[:5]}")
-    print("\nNote: To run this script successfully, you need:")
-    print("1. AWS credentials configured")
-    print("2. An S3 bucket named 'media-embeddings' with S3 vectors enabled")
-    print("3. A vector index named 'movies' with ingested data")
-    
\ No newline at end of file
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from s3vector_common import BUCKET, INDEX, REDUCTION_PATH, create_query_client, load_model
+
+DEMO_QUERY = "adventures in space"
+DEMO_FILTERS = [None, {"genre": "scifi"}]
+
+
+def query_requests(texts, filters=(None,), top_k=3):
+    """One {"text", "filter", "topK"} request per text and filter, text-major."""
+    return [{"text": text, "filter": condition, "topK": top_k} for text in texts for condition in filters]
+
+
+def encode_queries(model, texts, encode_batch=64, reduction=None):
+    """{text: {"float32": [...]}} for the distinct texts, encoded in batches."""
+    distinct = list(dict.fromkeys(texts))
+    embeddings = np.asarray(model.encode(distinct, batch_size=encode_batch, convert_to_numpy=True), dtype='float32')
+    if reduction is not None:
+        embeddings = reduction.apply(embeddings)
+    # One tolist() per distinct text; boto3 needs Python floats
+    return {text: {"float32": values} for text, values in zip(distinct, embeddings.tolist())}
+
+
+def run_queries(requests, client=None, model=None, bucket=BUCKET, index=INDEX, workers=8, encode_batch=64,
+                return_metadata=True, return_distance=True, reduction=None):
+    """Run query requests concurrently; returns one result per request, in order.
+
+    Each result is the request plus "vectors" and "latency_ms", or "error" if
+    its call failed. `reduction` must be the one the index was ingested with.
+    """
+    client = client or create_query_client(max_pool_connections=workers)
+    model = model or load_model()
+    vectors = encode_queries(model, [r["text"] for r in requests], encode_batch, reduction)
+
+    def run(request):
+        kwargs = {"filter": request["filter"]} if request.get("filter") else {}
+        started = time.perf_counter()
+        try:
+            response = client.query_vectors(vectorBucketName=bucket, indexName=index,
+                                            queryVector=vectors[request["text"]], topK=request.get("topK", 3),
+                                            returnMetadata=return_metadata, returnDistance=return_distance, **kwargs)
+            result = {**request, "vectors": response["vectors"]}
+        except Exception as e:
+            result = {**request, "error": f"{type(e).__name__}: {e}"}
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+    # map() yields in input order whatever order the calls finish in
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="query_vectors") as pool:
+        return list(pool.map(run, requests))
+
+
+def latency_summary(results, seconds):
+    latencies = np.asarray([r["latency_ms"] for r in results])
+    return {"queries": len(results), "errors": sum("error" in r for r in results),
+            "qps": round(len(results) / seconds, 1) if seconds > 0 else None,
+            "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+            "max_ms": round(float(latencies.max()), 2)}
+
+
+def parse_filter(value):
+    return None if value.lower() == "none" else json.loads(value)
+
+
+def read_lines(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query an S3 vector index with many texts and filters")
+    parser.add_argument("texts", nargs="*", help=f"Query texts (default: {DEMO_QUERY!r})")
+    parser.add_argument("--queries-file", help="More query texts, one per line")
+    parser.add_argument("--filter", action="append", type=parse_filter, dest="filters",
+                        help="Metadata filter as JSON, or 'none'; repeat for several variants of every query")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--bucket", default=BUCKET)
+    parser.add_argument("--index", default=INDEX)
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent query_vectors calls")
+    parser.add_argument("--encode-batch", type=int, default=64, help="Texts encoded per model call")
+    parser.add_argument("--reduction", default=REDUCTION_PATH, help="Saved dimension reduction used at ingest (.npz)")
+    parser.add_argument("--json", action="store_true", help="Print results and latency summary as JSON")
+    args = parser.parse_args()
+
+    texts = args.texts + (read_lines(args.queries_file) if args.queries_file else [])
+    if texts:
+        filters = args.filters or [None]
+    else:
+        texts, filters = [DEMO_QUERY], args.filters or DEMO_FILTERS
+
+    # Create S3 Vectors client (or the local stub with S3VECTOR_STUB=<dir>, behind a local mirror with
+    # S3VECTOR_MIRROR=<dir>) and initialize SentenceTransformer model.
+    client = create_query_client(max_pool_connections=args.workers)
+    # Using a model that produces 1024-dimensional embeddings to match your S3 vector index
+    model = load_model()
+    reduction = None
+    if args.reduction:
+        from s3vector_reduction import load_reduction
+        reduction = load_reduction(args.reduction)
+
+    started = time.perf_counter()
+    results = run_queries(query_requests(texts, filters, args.top_k), client, model, args.bucket, args.index,
+                          args.workers, args.encode_batch, reduction=reduction)
+    summary = latency_summary(results, time.perf_counter() - started)
+
+    if args.json:
+        print(json.dumps({"results": results, "summary": summary}, indent=2))
+    else:
+        for result in results:
+            label = f"filter {json.dumps(result['filter'])}" if result["filter"] else "no filter"
+            print(f"\n{result['text']!r} ({label}, {result['latency_ms']:.1f} ms):")
+            print(json.dumps(result["vectors"], indent=2) if "vectors" in result else f"  Error: {result['error']}")
+        print(f"\n{summary['queries']} queries, {summary['errors']} errors, {summary['qps']} queries/s, "
+              f"latency p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, max {summary['max_ms']} ms")
+
+    if summary["errors"] == summary["queries"]:
+        print("\nNote: To run this script successfully, you need:")
+        print("1. AWS credentials configured")
+        print(f"2. An S3 bucket named '{args.bucket}' with S3 vectors enabled")
+        print(f"3. A vector index named '{args.index}' with ingested data")
+        print("Or set S3VECTOR_STUB=<dir> to use the local stub client.")
+        sys.exit(1)
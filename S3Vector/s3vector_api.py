@@ -0,0 +1,67 @@
+"""
+Request limits, errors and metadata filter semantics of the S3 Vectors API.
+
+Shared by the offline stub client (s3vectors_stub.py) and the local query
+mirror (s3vector_mirror.py), so both validate requests and evaluate filters
+the way the service does.
+"""
+
+from botocore.exceptions import ClientError
+
+MAX_PUT_VECTORS = 500
+MAX_DELETE_VECTORS = 500
+MAX_GET_VECTORS = 100
+MAX_LIST_RESULTS = 1000
+MAX_TOP_K = 100
+
+
+def client_error(code, message, operation):
+    return ClientError({"Error": {"Code": code, "Message": message}}, operation)
+
+
+def matches(metadata, condition):
+    """Evaluate an S3 Vectors metadata filter ($eq, $ne, $gt(e), $lt(e), $in, $nin, $exists, $and, $or)."""
+    for key, expected in condition.items():
+        if key == "$and":
+            if not all(matches(metadata, c) for c in expected):
+                return False
+        elif key == "$or":
+            if not any(matches(metadata, c) for c in expected):
+                return False
+        elif isinstance(expected, dict):
+            if not all(compare(metadata, key, op, value) for op, value in expected.items()):
+                return False
+        elif not compare(metadata, key, "$eq", expected):
+            return False
+    return True
+
+
+def compare(metadata, key, op, value):
+    present = key in metadata
+    actual = metadata.get(key)
+    if op == "$exists":
+        return present == bool(value)
+    if not present:
+        return op in ("$ne", "$nin")
+    # A list-valued field matches when any of its elements does
+    values = actual if isinstance(actual, list) else [actual]
+    if op == "$eq":
+        return value in values
+    if op == "$ne":
+        return value not in values
+    if op == "$in":
+        return any(v in value for v in values)
+    if op == "$nin":
+        return not any(v in value for v in values)
+    try:
+        if op == "$gt":
+            return any(v > value for v in values)
+        if op == "$gte":
+            return any(v >= value for v in values)
+        if op == "$lt":
+            return any(v < value for v in values)
+        if op == "$lte":
+            return any(v <= value for v in values)
+    except TypeError:
+        return False
+    raise client_error("ValidationException", f"Unsupported filter operator {op}", "QueryVectors")
@@ -0,0 +1,58 @@
+"""
+Settings and clients shared by the S3Vector scripts.
+
+    S3VECTOR_BUCKET   vector bucket (default media-embeddings)
+    S3VECTOR_INDEX    vector index (default movies)
+    AWS_REGION        region of the bucket (default us-east-1)
+    S3VECTOR_MODEL    SentenceTransformer model (default all-roberta-large-v1, 1024 dims)
+    S3VECTOR_STUB     directory for the offline stub client (s3vectors_stub.py); unset uses AWS
+    S3VECTOR_MIRROR   directory of the local query mirror (s3vector_mirror.py); unset queries the service
+    S3VECTOR_MIRROR_MAX_AGE  seconds a mirror serves queries after its last refresh (default 300)
+    S3VECTOR_REDUCTION  saved dimension reduction (s3vector_reduction.py) applied by ingest and query
+"""
+
+import os
+
+BUCKET = os.environ.get("S3VECTOR_BUCKET", "media-embeddings")
+INDEX = os.environ.get("S3VECTOR_INDEX", "movies")
+REGION = os.environ.get("AWS_REGION", "us-east-1")
+# Must produce vectors of the index's dimension (1024)
+MODEL_NAME = os.environ.get("S3VECTOR_MODEL", "sentence-transformers/all-roberta-large-v1")
+STUB_PATH = os.environ.get("S3VECTOR_STUB")
+MIRROR_PATH = os.environ.get("S3VECTOR_MIRROR")
+MIRROR_MAX_AGE = float(os.environ.get("S3VECTOR_MIRROR_MAX_AGE", "300"))
+REDUCTION_PATH = os.environ.get("S3VECTOR_REDUCTION")
+
+
+def create_client(max_pool_connections=10, max_attempts=None):
+    """An s3vectors client whose connection pool fits `max_pool_connections` threads.
+
+    boto3 clients are thread-safe, so one client is shared by all threads.
+    max_attempts=1 turns off botocore's own retries for callers that retry
+    themselves.
+    """
+    if STUB_PATH:
+        from s3vectors_stub import StubS3VectorsClient
+        return StubS3VectorsClient(STUB_PATH)
+
+    import boto3
+    from botocore.config import Config
+    retries = {"mode": "standard"}
+    if max_attempts is not None:
+        retries["max_attempts"] = max_attempts
+    config = Config(max_pool_connections=max_pool_connections, retries=retries)
+    return boto3.client("s3vectors", region_name=REGION, config=config)
+
+
+def create_query_client(max_pool_connections=10):
+    """create_client(), wrapped in a local mirror for query_vectors when S3VECTOR_MIRROR is set."""
+    client = create_client(max_pool_connections)
+    if not MIRROR_PATH:
+        return client
+    from s3vector_mirror import MirroredClient
+    return MirroredClient(client, MIRROR_PATH, MIRROR_MAX_AGE)
+
+
+def load_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(MODEL_NAME)
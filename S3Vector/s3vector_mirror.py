@@ -0,0 +1,515 @@
+"""
+Local read-through mirror of S3 vector indexes.
+
+MirroredClient wraps an s3vectors client (boto3 or the stub) and answers
+query_vectors for an index from an in-process copy of its vectors and
+metadata: an exact FAISS index in the index's distance metric (read with
+get_index), so distances are the ones the service returns, and the
+service's metadata filters evaluated locally. Every other call goes to the
+remote client.
+
+- cosine: inner product over the normalized vectors, distance 1 - similarity
+- euclidean: L2 over the vectors as uploaded, distance the square root of
+  FAISS's squared L2
+
+An index with any other metric is never served locally: its refresh fails
+and its queries keep going to the remote.
+
+    client = MirroredClient(create_client(), path="./mirror", max_age=300)
+    client.query_vectors(vectorBucketName=..., indexName=..., queryVector=..., topK=3, filter={"genre": "scifi"})
+
+Keeping it fresh:
+
+- refresh() copies the whole index with list_vectors (returnData and
+  returnMetadata) and saves a snapshot to `path`, so the next process starts
+  warm. `python s3vector_mirror.py` does this from the command line.
+- put_vectors and delete_vectors through MirroredClient update the mirror as
+  soon as the remote call succeeds.
+- Other processes (ingest_to_s3.py --mirror) append what they uploaded to a
+  journal in `path`; mirrors replay new journal entries before each query.
+  After a refresh has saved a snapshot that covers the whole journal, the
+  journal is replaced by an empty one, so it only holds what was written
+  since the last snapshot. Mirrors in other processes notice the new file
+  and reload the snapshot.
+- A mirror that hasn't been refreshed for max_age seconds is stale: its
+  queries go to the remote while a refresh runs in the background. The same
+  happens on a miss, i.e. the first query of an index with no snapshot.
+"""
+
+import argparse
+import base64
+import json
+import os
+import threading
+import time
+
+import faiss
+import numpy as np
+
+from s3vector_api import MAX_LIST_RESULTS, MAX_TOP_K, client_error, matches
+
+# Seconds after the last full refresh before queries go back to the remote
+DEFAULT_MAX_AGE = 300.0
+# Compiled filters kept per mirror; cleared whenever the vectors change
+FILTER_CACHE_SIZE = 256
+# distanceMetric values the mirror can reproduce
+METRICS = ("cosine", "euclidean")
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends from one writer at a time only
+    fcntl = None
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype='float32').reshape(len(vectors), -1)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+class MirrorJournal:
+    """Append-only log of put/delete requests, shared between writer and mirror processes.
+
+    Positions in it are (file id, offset): rotate() swaps in a new file, and
+    an offset only means something in the file it was taken from.
+    """
+
+    def __init__(self, path, bucket, index):
+        self.path = os.path.join(path, f"{bucket}.{index}.journal.jsonl")
+        os.makedirs(path, exist_ok=True)
+
+    def position(self):
+        """(file id, size) of the journal, or (None, 0) if there is none."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None, 0
+        return st.st_ino, st.st_size
+
+    def _open_locked(self):
+        """The journal opened for appending under the writers' lock, after any rotation in progress."""
+        while True:
+            f = open(self.path, "ab")
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                if os.fstat(f.fileno()).st_ino == os.stat(self.path).st_ino:
+                    return f
+            except FileNotFoundError:
+                pass
+            # Rotated or removed while waiting for the lock: this file is no longer the journal
+            f.close()
+
+    def _append(self, entry):
+        line = (json.dumps(entry) + "\n").encode("utf-8")
+        with self._open_locked() as f:
+            f.write(line)
+            # Closing the file releases the lock
+
+    def rotate(self, snapshot):
+        """Replace the journal with an empty file once `snapshot(file)` has saved everything in it.
+
+        snapshot is called with the current journal locked against writers,
+        as (locked file id, size, new file id). It must cover the locked file
+        up to `size` and record the new file at offset 0.
+        """
+        if self.position()[0] is None:
+            return
+        tmp = self.path + ".tmp"
+        with self._open_locked() as f:
+            st = os.fstat(f.fileno())
+            open(tmp, "wb").close()
+            snapshot(st.st_ino, st.st_size, os.stat(tmp).st_ino)
+            # Writers waiting for the lock find the new file and append there
+            os.replace(tmp, self.path)
+
+    def append_put(self, vectors):
+        """Record a successful put_vectors request (its `vectors` argument)."""
+        self._append({"op": "put", "vectors": [
+            {"key": v["key"], "metadata": v.get("metadata") or {},
+             "float32": base64.b64encode(np.asarray(v["data"]["float32"], dtype='float32').tobytes()).decode()}
+            for v in vectors]})
+
+    def append_delete(self, keys):
+        self._append({"op": "delete", "keys": list(keys)})
+
+    def read(self, file_id, offset, size=None):
+        """(entries, new offset) for the complete lines after `offset` (up to `size`) in file `file_id`.
+
+        None if the journal is no longer that file.
+        """
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return None
+        with f:
+            if os.fstat(f.fileno()).st_ino != file_id:
+                return None
+            f.seek(offset)
+            data = f.read() if size is None else f.read(max(0, size - offset))
+        # A line still being written is picked up next time
+        end = data.rfind(b"\n") + 1
+        entries = []
+        for line in data[:end].splitlines():
+            entry = json.loads(line)
+            if entry["op"] == "put":
+                for v in entry["vectors"]:
+                    v["data"] = {"float32": np.frombuffer(base64.b64decode(v.pop("float32")), dtype='float32')}
+            entries.append(entry)
+        return entries, offset + end
+
+
+class VectorMirror:
+    """In-memory copy of one index, searchable like query_vectors."""
+
+    def __init__(self, bucket, index, path=None, max_age=DEFAULT_MAX_AGE):
+        self.bucket = bucket
+        self.index_name = index
+        self.path = path
+        self.max_age = max_age
+        self.journal = MirrorJournal(path, bucket, index) if path else None
+        self.lock = threading.Lock()
+        self.refreshing = threading.Lock()
+        self.synced_at = None  # wall-clock time of the last full copy; None until loaded
+        # Journal position the mirror has replayed up to
+        self.journal_id = None
+        self.journal_offset = 0
+        self.metric = None  # the index's distanceMetric; None until refreshed or loaded
+        self._reset(None)
+
+    def _reset(self, dimension):
+        self.dimension = dimension
+        self.index = None
+        if dimension:
+            flat = faiss.IndexFlatL2(dimension) if self.metric == "euclidean" else faiss.IndexFlatIP(dimension)
+            self.index = faiss.IndexIDMap2(flat)
+        self.ids = {}  # key -> FAISS id
+        self.keys = {}  # FAISS id -> key
+        self.metadata = {}  # FAISS id -> metadata
+        self.next_id = 0
+        self.filters = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def age(self):
+        return None if self.synced_at is None else time.time() - self.synced_at
+
+    def is_fresh(self):
+        return self.synced_at is not None and time.time() - self.synced_at <= self.max_age
+
+    def _rows(self, vectors):
+        rows = np.asarray(vectors, dtype='float32').reshape(len(vectors), -1)
+        return normalize(rows) if self.metric == "cosine" else rows
+
+    def _put(self, vectors):
+        if not vectors:
+            return
+        rows = self._rows([v["data"]["float32"] for v in vectors])
+        if self.index is None:
+            self._reset(rows.shape[1])
+        if rows.shape[1] != self.dimension:
+            raise ValueError(f"Mirror of {self.bucket}/{self.index_name} holds {self.dimension}-dim vectors, "
+                             f"got {rows.shape[1]}")
+        # Last write of a key in the batch wins, as in put_vectors
+        latest = {v["key"]: i for i, v in enumerate(vectors)}
+        replaced = [self.ids[key] for key in latest if key in self.ids]
+        if replaced:
+            self.index.remove_ids(faiss.IDSelectorBatch(np.asarray(replaced, dtype='int64')))
+        new_ids = np.arange(self.next_id, self.next_id + len(latest), dtype='int64')
+        self.next_id += len(latest)
+        for key, faiss_id in zip(latest, new_ids):
+            old = self.ids.pop(key, None)
+            if old is not None:
+                del self.keys[old], self.metadata[old]
+            self.ids[key] = int(faiss_id)
+            self.keys[int(faiss_id)] = key
+            self.metadata[int(faiss_id)] = vectors[latest[key]].get("metadata") or {}
+        self.index.add_with_ids(rows[list(latest.values())], new_ids)
+        self.filters = {}
+
+    def _delete(self, keys):
+        removed = [self.ids.pop(key) for key in keys if key in self.ids]
+        if not removed:
+            return
+        for faiss_id in removed:
+            del self.keys[faiss_id], self.metadata[faiss_id]
+        self.index.remove_ids(faiss.IDSelectorBatch(np.asarray(removed, dtype='int64')))
+        self.filters = {}
+
+    def apply_put(self, vectors):
+        """Apply a successful put_vectors request (its `vectors` argument)."""
+        with self.lock:
+            # Before the first refresh or load there is nothing to update; the copy will include it
+            if self.metric is not None:
+                self._put(vectors)
+
+    def apply_delete(self, keys):
+        with self.lock:
+            if self.metric is not None:
+                self._delete(keys)
+
+    def _replay(self, entries):
+        for entry in entries:
+            if entry["op"] == "put":
+                self._put(entry["vectors"])
+            else:
+                self._delete(entry["keys"])
+
+    def catch_up(self):
+        """Replay journal entries written since the last refresh or replay."""
+        if self.journal is None or self.synced_at is None:
+            return
+        file_id, size = self.journal.position()
+        if file_id == self.journal_id and size == self.journal_offset:
+            return
+        with self.lock:
+            if self.journal_id is None and file_id is not None:
+                # Journal started since the copy: all of it is new
+                self.journal_id, self.journal_offset = file_id, 0
+            read = self.journal.read(self.journal_id, self.journal_offset) if file_id is not None else None
+            if read is not None:
+                entries, self.journal_offset = read
+                self._replay(entries)
+                return
+        # The journal was rotated or removed: entries we haven't seen are only in the newer snapshot
+        if not self.load():
+            with self.lock:
+                # Stale until refreshed
+                self.synced_at = 0.0
+
+    def refresh(self, remote, page_size=MAX_LIST_RESULTS):
+        """Copy the whole index from `remote` with list_vectors; returns the number of vectors."""
+        with self.refreshing:
+            info = remote.get_index(vectorBucketName=self.bucket, indexName=self.index_name)["index"]
+            metric = info.get("distanceMetric")
+            if metric not in METRICS:
+                raise ValueError(f"{self.bucket}/{self.index_name} uses distance metric {metric!r}; "
+                                 f"the mirror supports {', '.join(METRICS)}")
+            # Journal entries from here on may or may not be in the listing; replaying them is idempotent
+            journal_id, offset = self.journal.position() if self.journal else (None, 0)
+            started = time.time()
+            vectors, token = [], None
+            while True:
+                kwargs = {"nextToken": token} if token else {}
+                page = remote.list_vectors(vectorBucketName=self.bucket, indexName=self.index_name,
+                                           maxResults=page_size, returnData=True, returnMetadata=True, **kwargs)
+                vectors.extend(page["vectors"])
+                token = page.get("nextToken")
+                if not token:
+                    break
+            with self.lock:
+                self.metric = metric
+                self._reset(None)
+                for start in range(0, len(vectors), page_size):
+                    self._put(vectors[start:start + page_size])
+                self.synced_at = started
+                self.journal_id, self.journal_offset = journal_id, offset
+            self.catch_up()
+            if self.journal is not None:
+                self.journal.rotate(self._save_for_rotation)
+            else:
+                self.save()
+            return len(self)
+
+    def _save_for_rotation(self, file_id, size, new_file_id):
+        # Writers are locked out: replay the rest of the journal, then point the snapshot at the new file
+        with self.lock:
+            read = self.journal.read(self.journal_id, self.journal_offset, size) if file_id == self.journal_id else None
+            if read is None:
+                raise RuntimeError(f"Journal of {self.bucket}/{self.index_name} was rotated by another refresh")
+            self._replay(read[0])
+            self.journal_id, self.journal_offset = new_file_id, 0
+        self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        base = os.path.join(self.path, f"{self.bucket}.{self.index_name}.mirror")
+        with self.lock:
+            if self.index is None:
+                return
+            keys = list(self.ids)
+            vectors = self.index.reconstruct_batch(np.asarray([self.ids[k] for k in keys], dtype='int64'))
+            state = {"bucket": self.bucket, "index": self.index_name, "dimension": self.dimension,
+                     "distance_metric": self.metric, "synced_at": self.synced_at, "journal_id": self.journal_id,
+                     "journal_offset": self.journal_offset, "keys": keys,
+                     "metadata": [self.metadata[self.ids[k]] for k in keys]}
+        np.save(base + ".tmp.npy", vectors)
+        with open(base + ".tmp.json", "w") as f:
+            json.dump(state, f)
+        # Vectors first: a reader that sees the new JSON also finds matching vectors
+        os.replace(base + ".tmp.npy", base + ".npy")
+        os.replace(base + ".tmp.json", base + ".json")
+
+    def load(self):
+        """Load the snapshot saved in `path`; False if there is none or it can't be caught up."""
+        base = os.path.join(self.path or "", f"{self.bucket}.{self.index_name}.mirror")
+        if not self.path or not os.path.exists(base + ".json"):
+            return False
+        with open(base + ".json", "r") as f:
+            state = json.load(f)
+        if state.get("distance_metric") not in METRICS:
+            # A snapshot from before the metric was recorded; refresh instead of guessing
+            return False
+        journal_id = state.get("journal_id")
+        if journal_id is not None and (self.journal is None or journal_id != self.journal.position()[0]):
+            # Its journal offset is in a file that has since been replaced or removed
+            return False
+        vectors = np.load(base + ".npy")
+        with self.lock:
+            self.metric = state["distance_metric"]
+            self._reset(state["dimension"])
+            self._put([{"key": k, "data": {"float32": v}, "metadata": m}
+                       for k, v, m in zip(state["keys"], vectors, state["metadata"])])
+            self.synced_at = state["synced_at"]
+            self.journal_id, self.journal_offset = journal_id, state["journal_offset"]
+        self.catch_up()
+        return True
+
+    def _matching(self, condition):
+        """FAISS ids whose metadata matches a filter, cached until the vectors change."""
+        cache_key = json.dumps(condition, sort_keys=True)
+        ids = self.filters.get(cache_key)
+        if ids is None:
+            ids = np.asarray([i for i, metadata in self.metadata.items() if matches(metadata, condition)],
+                             dtype='int64')
+            if len(self.filters) >= FILTER_CACHE_SIZE:
+                self.filters = {}
+            self.filters[cache_key] = ids
+        return ids
+
+    def query_vectors(self, queryVector, topK, filter=None, returnMetadata=False, returnDistance=False):
+        """Same arguments (minus bucket and index) and response as the client's query_vectors."""
+        if not 1 <= topK <= MAX_TOP_K:
+            raise client_error("ValidationException", f"topK must be between 1 and {MAX_TOP_K}", "QueryVectors")
+        with self.lock:
+            query = self._rows([queryVector["float32"]])
+            if query.shape[1] != self.dimension:
+                raise client_error("ValidationException", f"Query dimension must be {self.dimension}",
+                                   "QueryVectors")
+            params = None
+            if filter:
+                ids = self._matching(filter)
+                if not len(ids):
+                    return {"vectors": [], "distanceMetric": self.metric}
+                # The selector copies the ids, so the cached array can be dropped meanwhile
+                params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(ids))
+            scores, labels = self.index.search(query, min(topK, len(self.ids)) or 1, params=params)
+            if self.metric == "euclidean":
+                distances = np.sqrt(np.maximum(scores[0], 0.0))
+            else:
+                distances = 1.0 - scores[0]
+            results = []
+            for distance, label in zip(distances, labels[0]):
+                if label < 0:
+                    continue
+                item = {"key": self.keys[int(label)]}
+                if returnMetadata:
+                    item["metadata"] = self.metadata[int(label)]
+                if returnDistance:
+                    item["distance"] = float(distance)
+                results.append(item)
+            return {"vectors": results, "distanceMetric": self.metric}
+
+
+class MirroredClient:
+    """An s3vectors client whose query_vectors is served from local mirrors while they are fresh."""
+
+    def __init__(self, remote, path=None, max_age=DEFAULT_MAX_AGE):
+        self.remote = remote
+        self.path = path
+        self.max_age = max_age
+        self.mirrors = {}
+        self.lock = threading.Lock()
+        self.threads = []
+        self.stats = {"local": 0, "remote": 0, "refreshes": 0, "refresh_errors": 0, "last_error": None}
+
+    def mirror(self, bucket, index):
+        with self.lock:
+            mirror = self.mirrors.get((bucket, index))
+            if mirror is None:
+                mirror = self.mirrors[(bucket, index)] = VectorMirror(bucket, index, self.path, self.max_age)
+                mirror.load()
+            return mirror
+
+    def refresh(self, bucket, index):
+        """Copy an index now; returns the number of vectors mirrored."""
+        count = self.mirror(bucket, index).refresh(self.remote)
+        with self.lock:
+            self.stats["refreshes"] += 1
+        return count
+
+    def _refresh_in_background(self, mirror):
+        # Single flight: a mirror already refreshing isn't refreshed again
+        if mirror.refreshing.locked():
+            return
+
+        def run():
+            try:
+                self.refresh(mirror.bucket, mirror.index_name)
+            except Exception as e:
+                with self.lock:
+                    self.stats["refresh_errors"] += 1
+                    self.stats["last_error"] = f"{type(e).__name__}: {e}"
+
+        thread = threading.Thread(target=run, name=f"mirror-{mirror.bucket}-{mirror.index_name}", daemon=True)
+        thread.start()
+        with self.lock:
+            self.threads = [t for t in self.threads if t.is_alive()] + [thread]
+
+    def query_vectors(self, vectorBucketName, indexName, queryVector, topK, filter=None,
+                      returnMetadata=False, returnDistance=False):
+        mirror = self.mirror(vectorBucketName, indexName)
+        mirror.catch_up()
+        if mirror.is_fresh() and len(queryVector["float32"]) == mirror.dimension:
+            with self.lock:
+                self.stats["local"] += 1
+            return mirror.query_vectors(queryVector, topK, filter, returnMetadata, returnDistance)
+        with self.lock:
+            self.stats["remote"] += 1
+        self._refresh_in_background(mirror)
+        kwargs = {"filter": filter} if filter else {}
+        return self.remote.query_vectors(vectorBucketName=vectorBucketName, indexName=indexName,
+                                         queryVector=queryVector, topK=topK, returnMetadata=returnMetadata,
+                                         returnDistance=returnDistance, **kwargs)
+
+    def put_vectors(self, vectorBucketName, indexName, vectors):
+        response = self.remote.put_vectors(vectorBucketName=vectorBucketName, indexName=indexName, vectors=vectors)
+        mirror = self.mirrors.get((vectorBucketName, indexName))
+        if mirror is not None:
+            mirror.apply_put(vectors)
+        return response
+
+    def delete_vectors(self, vectorBucketName, indexName, keys):
+        response = self.remote.delete_vectors(vectorBucketName=vectorBucketName, indexName=indexName, keys=keys)
+        mirror = self.mirrors.get((vectorBucketName, indexName))
+        if mirror is not None:
+            mirror.apply_delete(keys)
+        return response
+
+    def __getattr__(self, name):
+        # get_vectors, list_vectors, get_index, ... go straight to the remote
+        return getattr(self.remote, name)
+
+    def close(self):
+        for thread in list(self.threads):
+            thread.join()
+        if hasattr(self.remote, "close"):
+            self.remote.close()
+
+
+if __name__ == "__main__":
+    from s3vector_common import BUCKET, INDEX, MIRROR_PATH, create_client
+
+    parser = argparse.ArgumentParser(description="Copy an S3 vector index into a local mirror snapshot")
+    parser.add_argument("--bucket", default=BUCKET)
+    parser.add_argument("--index", default=INDEX)
+    parser.add_argument("--path", default=MIRROR_PATH or "./s3vector_mirror", help="Mirror directory")
+    args = parser.parse_args()
+
+    client = create_client()
+    started = time.perf_counter()
+    mirror = VectorMirror(args.bucket, args.index, args.path)
+    count = mirror.refresh(client)
+    print(f"Mirrored {count} vectors of {args.bucket}/{args.index} to {args.path} "
+          f"in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,199 @@
+"""
+Optional dimension reduction of the 1024-d embeddings.
+
+A Reduction maps model embeddings to fewer dimensions before they are
+uploaded or queried, which shrinks put_vectors payloads, index storage and
+query time. Two methods:
+
+- pca: normalize, subtract the mean and project onto the top principal
+  components, learned from a sample of the corpus
+- truncate: keep the first N dimensions (Matryoshka-style). Only models
+  trained for it keep their quality; for all-roberta-large-v1 use pca.
+
+The reduction is fitted once and saved as an .npz artifact. Set
+S3VECTOR_REDUCTION to its path so ingest_to_s3.py and query_from_s3.py apply
+the same stage; the vector index must be created with the reduced
+dimension.
+
+    python s3vector_reduction.py fit movies.jsonl --method pca --dims 256 --output reduction.npz
+    python s3vector_reduction.py report movies.jsonl --dims 256 384 --top-k 10
+
+report compares exact cosine top-k in the reduced space against the full
+1024-d vectors (recall@k) for each method and dimension.
+"""
+
+import argparse
+import json
+import time
+from itertools import islice
+
+import faiss
+import numpy as np
+
+from s3vector_common import MODEL_NAME, REDUCTION_PATH, load_model
+
+METHODS = ("pca", "truncate")
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype='float32')
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+class Reduction:
+    def __init__(self, method, dims, source_dims, mean=None, components=None, model=MODEL_NAME, fitted_on=0):
+        if method not in METHODS:
+            raise ValueError(f"Unknown reduction method {method!r}; expected one of {', '.join(METHODS)}")
+        if not 0 < dims <= source_dims:
+            raise ValueError(f"Cannot reduce {source_dims} dims to {dims}")
+        self.method = method
+        self.dims = dims
+        self.source_dims = source_dims
+        self.mean = mean
+        self.components = components  # (source_dims, dims) for pca
+        self.model = model
+        self.fitted_on = fitted_on
+
+    @classmethod
+    def fit(cls, embeddings, method, dims, model=MODEL_NAME):
+        embeddings = normalize(embeddings)
+        if method == "truncate":
+            return cls(method, dims, embeddings.shape[1], model=model, fitted_on=len(embeddings))
+        if len(embeddings) < dims:
+            raise ValueError(f"PCA to {dims} dims needs at least {dims} sample vectors, got {len(embeddings)}")
+        mean = embeddings.mean(axis=0)
+        centered = embeddings - mean
+        # Eigenvectors of the covariance, largest first; (d, d) is small for d = 1024
+        eigenvalues, eigenvectors = np.linalg.eigh(centered.T @ centered)
+        components = eigenvectors[:, np.argsort(eigenvalues)[::-1][:dims]].astype('float32')
+        return cls(method, dims, embeddings.shape[1], mean.astype('float32'), components, model, len(embeddings))
+
+    def apply(self, embeddings):
+        """Reduce (n, source_dims) embeddings to (n, dims) float32 vectors."""
+        embeddings = np.asarray(embeddings, dtype='float32')
+        if embeddings.shape[1] != self.source_dims:
+            raise ValueError(f"Reduction expects {self.source_dims}-dim embeddings, got {embeddings.shape[1]}")
+        embeddings = normalize(embeddings)
+        if self.method == "truncate":
+            return np.ascontiguousarray(embeddings[:, :self.dims])
+        return (embeddings - self.mean) @ self.components
+
+    def save(self, path):
+        arrays = {"mean": self.mean, "components": self.components} if self.method == "pca" else {}
+        info = {"method": self.method, "dims": self.dims, "source_dims": self.source_dims, "model": self.model,
+                "fitted_on": self.fitted_on}
+        np.savez(path, info=np.asarray(json.dumps(info)), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            info = json.loads(str(saved["info"]))
+            return cls(info["method"], info["dims"], info["source_dims"], saved.get("mean"), saved.get("components"),
+                       info["model"], info["fitted_on"])
+
+    def describe(self):
+        return f"{self.method} {self.source_dims} -> {self.dims} dims"
+
+
+def load_reduction(path=REDUCTION_PATH, model=MODEL_NAME):
+    """The saved Reduction at `path` (S3VECTOR_REDUCTION), or None to keep full vectors."""
+    if not path:
+        return None
+    reduction = Reduction.load(path)
+    if reduction.model != model:
+        # Another model's embeddings would be projected onto meaningless components
+        raise ValueError(f"{path} was fitted for {reduction.model}, not {model}")
+    return reduction
+
+
+def encode_texts(model, texts, batch_size=64):
+    return np.asarray(model.encode(texts, batch_size=batch_size, convert_to_numpy=True), dtype='float32')
+
+
+def recall_at_k(expected, found):
+    k = expected.shape[1]
+    return float(np.mean([len(set(e) & set(f)) / k for e, f in zip(expected, found)]))
+
+
+def exact_top_k(queries, corpus, k):
+    # On unit vectors the L2 order is the cosine order
+    return faiss.knn(normalize(queries), normalize(corpus), k)[1]
+
+
+def report(corpus, queries, dims_list, k, reductions=()):
+    """Recall@k of each reduction against exact full-dimensional cosine search."""
+    k = min(k, len(corpus))
+    expected = exact_top_k(queries, corpus, k)
+    candidates = [Reduction.fit(corpus, method, dims) for dims in dims_list for method in METHODS
+                  if dims <= corpus.shape[1]]
+    rows = []
+    for reduction in [*candidates, *reductions]:
+        started = time.perf_counter()
+        found = exact_top_k(reduction.apply(queries), reduction.apply(corpus), k)
+        rows.append({"reduction": reduction.describe(), "dims": reduction.dims,
+                     f"recall_at_{k}": round(recall_at_k(expected, found), 4),
+                     "bytes_per_vector": reduction.dims * 4,
+                     "search_ms": round((time.perf_counter() - started) * 1000, 1)})
+    return {"vectors": len(corpus), "queries": len(queries), "source_dims": int(corpus.shape[1]), "k": k,
+            "results": rows}
+
+
+if __name__ == "__main__":
+    from ingest_to_s3 import read_records
+
+    parser = argparse.ArgumentParser(description="Fit or evaluate a dimension reduction for the S3 vector embeddings")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fit_parser = sub.add_parser("fit", help="Fit a reduction on a sample of an ingest file and save it")
+    fit_parser.add_argument("path", help="JSONL or text file in ingest_to_s3.py's format")
+    fit_parser.add_argument("--method", choices=METHODS, default="pca")
+    fit_parser.add_argument("--dims", type=int, default=256)
+    fit_parser.add_argument("--sample", type=int, default=20000, help="Records to fit on (the first N)")
+    fit_parser.add_argument("--output", default=REDUCTION_PATH or "reduction.npz")
+    report_parser = sub.add_parser("report", help="Recall@k of reductions against the full-dimensional vectors")
+    report_parser.add_argument("path", help="JSONL or text file in ingest_to_s3.py's format")
+    report_parser.add_argument("--dims", type=int, nargs="+", default=[256, 384])
+    report_parser.add_argument("--top-k", type=int, default=10)
+    report_parser.add_argument("--sample", type=int, default=20000, help="Corpus records to evaluate (the first N)")
+    report_parser.add_argument("--queries", help="Query texts, one per line (default: --holdout records)")
+    report_parser.add_argument("--holdout", type=int, default=200, help="Records held out of the corpus as queries")
+    report_parser.add_argument("--reduction", help="Also evaluate this saved reduction")
+    report_parser.add_argument("--json", action="store_true")
+    for p in (fit_parser, report_parser):
+        p.add_argument("--encode-batch", type=int, default=64)
+    args = parser.parse_args()
+    if args.command == "report" and not args.queries and args.holdout < 1:
+        parser.error("report needs --holdout of at least 1, or --queries")
+
+    model = load_model()
+    if args.command == "fit":
+        texts = [r["text"] for r in islice(read_records(args.path), args.sample)]
+        reduction = Reduction.fit(encode_texts(model, texts, args.encode_batch), args.method, args.dims)
+        reduction.save(args.output)
+        print(f"Saved {reduction.describe()} fitted on {reduction.fitted_on} vectors to {args.output}")
+        print(f"Create the vector index with dimension {reduction.dims} and set S3VECTOR_REDUCTION={args.output}")
+    else:
+        if args.queries:
+            texts = [r["text"] for r in islice(read_records(args.path), args.sample)]
+            with open(args.queries, "r", encoding="utf-8") as f:
+                query_texts = [line.strip() for line in f if line.strip()]
+        else:
+            records = [r["text"] for r in islice(read_records(args.path), args.sample + args.holdout)]
+            split = max(0, len(records) - args.holdout)
+            texts, query_texts = records[:split], records[split:]
+            if not texts:
+                parser.error(f"{args.path} has {len(records)} records, none left for the corpus after "
+                             f"--holdout {args.holdout}")
+        corpus = encode_texts(model, texts, args.encode_batch)
+        queries = encode_texts(model, query_texts, args.encode_batch)
+        saved = [Reduction.load(args.reduction)] if args.reduction else []
+        result = report(corpus, queries, args.dims, args.top_k, saved)
+        if args.json:
+            print(json.dumps(result, indent=2))
+        else:
+            k = result["k"]
+            print(f"{result['vectors']} vectors, {result['queries']} queries, ground truth exact "
+                  f"{result['source_dims']}-dim cosine top-{k}")
+            print(f"{'reduction':<28} {f'recall@{k}':>9} {'bytes/vector':>13} {'search ms':>10}")
+            for row in result["results"]:
+                print(f"{row['reduction']:<28} {row[f'recall_at_{k}']:>9.4f} {row['bytes_per_vector']:>13} "
+                      f"{row['search_ms']:>10.1f}")
@@ -0,0 +1,218 @@
+"""
+Local stand-in for the boto3 "s3vectors" client.
+
+Implements the calls these scripts use (put_vectors, get_vectors,
+list_vectors, delete_vectors, query_vectors, get_index) with the same
+request and response shapes and the same request limits, so ingest and
+query can run offline and in tests. Enable it in any of the scripts with
+
+    S3VECTOR_STUB=./stub_data python ingest_to_s3.py movies.jsonl
+
+Vectors are kept in memory and saved to that directory on close(), so a
+later query run sees what an ingest run wrote. Distances are cosine
+distances, as the README's index uses, or euclidean distances for a client
+created with distance_metric="euclidean". Errors are raised as botocore
+ClientErrors with the service's error codes; the limits and filter
+semantics come from s3vector_api.py, which the local mirror shares.
+throttle_rate makes a share of calls fail with TooManyRequestsException to
+exercise retries.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+
+import numpy as np
+
+from s3vector_api import (MAX_DELETE_VECTORS, MAX_GET_VECTORS, MAX_LIST_RESULTS, MAX_PUT_VECTORS, MAX_TOP_K,
+                          client_error, matches)
+
+
+class StubIndex:
+    def __init__(self, dimension=None, distance_metric="cosine"):
+        self.dimension = dimension
+        self.distance_metric = distance_metric
+        self.keys = []
+        self.positions = {}
+        self.vectors = np.zeros((0, dimension or 0), dtype='float32')
+        self.metadata = []
+        self.lock = threading.Lock()
+
+    def put(self, vectors):
+        rows = np.asarray([v["data"]["float32"] for v in vectors], dtype='float32')
+        with self.lock:
+            if self.dimension is None:
+                self.dimension = rows.shape[1]
+                self.vectors = np.zeros((0, self.dimension), dtype='float32')
+            if rows.ndim != 2 or rows.shape[1] != self.dimension:
+                raise client_error("ValidationException",
+                                   f"Vector dimension must be {self.dimension}", "PutVectors")
+            new_rows = []
+            for vector, row in zip(vectors, rows):
+                position = self.positions.get(vector["key"])
+                if position is None:
+                    self.positions[vector["key"]] = len(self.keys) + len(new_rows)
+                    new_rows.append(row)
+                    self.metadata.append(vector.get("metadata") or {})
+                    self.keys.append(vector["key"])
+                else:
+                    self.vectors[position] = row
+                    self.metadata[position] = vector.get("metadata") or {}
+            if new_rows:
+                self.vectors = np.vstack([self.vectors, np.asarray(new_rows, dtype='float32')])
+
+    def delete(self, keys):
+        with self.lock:
+            drop = {self.positions[k] for k in keys if k in self.positions}
+            if not drop:
+                return
+            keep = [i for i in range(len(self.keys)) if i not in drop]
+            self.keys = [self.keys[i] for i in keep]
+            self.metadata = [self.metadata[i] for i in keep]
+            self.vectors = self.vectors[keep]
+            self.positions = {k: i for i, k in enumerate(self.keys)}
+
+    def entry(self, position, return_data, return_metadata):
+        item = {"key": self.keys[position]}
+        if return_data:
+            item["data"] = {"float32": self.vectors[position].tolist()}
+        if return_metadata:
+            item["metadata"] = self.metadata[position]
+        return item
+
+
+class StubS3VectorsClient:
+    def __init__(self, path=None, dimension=None, throttle_rate=0.0, latency_ms=0.0, seed=None,
+                 distance_metric="cosine"):
+        self.path = path
+        self.dimension = dimension
+        # Of indexes this client creates; loaded indexes keep their own
+        self.distance_metric = distance_metric
+        self.throttle_rate = throttle_rate
+        self.latency = latency_ms / 1000.0
+        self.rng = random.Random(seed)
+        self.indexes = {}
+        self.lock = threading.Lock()
+        self.calls = {}
+        if path and os.path.isdir(path):
+            self._load()
+
+    def _index(self, bucket, name, create=False):
+        with self.lock:
+            index = self.indexes.get((bucket, name))
+            if index is None:
+                if not create:
+                    raise client_error("NotFoundException", f"Index {bucket}/{name} does not exist", "GetIndex")
+                index = self.indexes[(bucket, name)] = StubIndex(self.dimension, self.distance_metric)
+            return index
+
+    def _call(self, operation):
+        with self.lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+            throttled = self.throttle_rate and self.rng.random() < self.throttle_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if throttled:
+            raise client_error("TooManyRequestsException", "Rate exceeded", operation)
+
+    def put_vectors(self, vectorBucketName, indexName, vectors):
+        self._call("PutVectors")
+        if not 1 <= len(vectors) <= MAX_PUT_VECTORS:
+            raise client_error("ValidationException", f"vectors must hold 1 to {MAX_PUT_VECTORS} items", "PutVectors")
+        self._index(vectorBucketName, indexName, create=True).put(vectors)
+        return {}
+
+    def delete_vectors(self, vectorBucketName, indexName, keys):
+        self._call("DeleteVectors")
+        if not 1 <= len(keys) <= MAX_DELETE_VECTORS:
+            raise client_error("ValidationException", f"keys must hold 1 to {MAX_DELETE_VECTORS} items",
+                               "DeleteVectors")
+        self._index(vectorBucketName, indexName).delete(keys)
+        return {}
+
+    def get_vectors(self, vectorBucketName, indexName, keys, returnData=False, returnMetadata=False):
+        self._call("GetVectors")
+        if not 1 <= len(keys) <= MAX_GET_VECTORS:
+            raise client_error("ValidationException", f"keys must hold 1 to {MAX_GET_VECTORS} items", "GetVectors")
+        index = self._index(vectorBucketName, indexName)
+        with index.lock:
+            return {"vectors": [index.entry(index.positions[k], returnData, returnMetadata)
+                                for k in keys if k in index.positions]}
+
+    def list_vectors(self, vectorBucketName, indexName, maxResults=500, nextToken=None,
+                     returnData=False, returnMetadata=False):
+        self._call("ListVectors")
+        index = self._index(vectorBucketName, indexName)
+        start = int(nextToken or 0)
+        maxResults = min(maxResults, MAX_LIST_RESULTS)
+        with index.lock:
+            end = min(start + maxResults, len(index.keys))
+            response = {"vectors": [index.entry(i, returnData, returnMetadata) for i in range(start, end)]}
+            if end < len(index.keys):
+                response["nextToken"] = str(end)
+        return response
+
+    def query_vectors(self, vectorBucketName, indexName, queryVector, topK, filter=None,
+                      returnMetadata=False, returnDistance=False):
+        self._call("QueryVectors")
+        if not 1 <= topK <= MAX_TOP_K:
+            raise client_error("ValidationException", f"topK must be between 1 and {MAX_TOP_K}", "QueryVectors")
+        index = self._index(vectorBucketName, indexName)
+        query = np.asarray(queryVector["float32"], dtype='float32')
+        with index.lock:
+            if query.shape != (index.dimension,):
+                raise client_error("ValidationException", f"Query dimension must be {index.dimension}",
+                                   "QueryVectors")
+            candidates = np.arange(len(index.keys))
+            if filter:
+                candidates = np.asarray([i for i in candidates if matches(index.metadata[i], filter)], dtype='int64')
+            vectors = index.vectors[candidates]
+            if index.distance_metric == "euclidean":
+                distances = np.linalg.norm(vectors - query, axis=1)
+            else:
+                norms = np.linalg.norm(vectors, axis=1) * max(np.linalg.norm(query), 1e-12)
+                distances = 1.0 - (vectors @ query) / np.maximum(norms, 1e-12)
+            order = np.argsort(distances, kind="stable")[:topK]
+            results = []
+            for i in order:
+                item = index.entry(int(candidates[i]), False, returnMetadata)
+                if returnDistance:
+                    item["distance"] = float(distances[i])
+                results.append(item)
+        return {"vectors": results, "distanceMetric": index.distance_metric}
+
+    def get_index(self, vectorBucketName, indexName):
+        self._call("GetIndex")
+        index = self._index(vectorBucketName, indexName)
+        return {"index": {"vectorBucketName": vectorBucketName, "indexName": indexName,
+                          "dataType": "float32", "dimension": index.dimension,
+                          "distanceMetric": index.distance_metric}}
+
+    def _load(self):
+        for name in os.listdir(self.path):
+            if not name.endswith(".json"):
+                continue
+            with open(os.path.join(self.path, name), "r") as f:
+                saved = json.load(f)
+            index = StubIndex(saved["dimension"], saved.get("distance_metric", "cosine"))
+            index.keys = saved["keys"]
+            index.metadata = saved["metadata"]
+            index.positions = {k: i for i, k in enumerate(index.keys)}
+            index.vectors = np.load(os.path.join(self.path, name[:-5] + ".npy")).reshape(-1, saved["dimension"] or 0)
+            self.indexes[(saved["bucket"], saved["index"])] = index
+
+    def close(self):
+        """Save every index to `path` (if set)."""
+        if not self.path:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        for (bucket, name), index in self.indexes.items():
+            base = os.path.join(self.path, f"{bucket}.{name}")
+            with index.lock:
+                np.save(base + ".npy", index.vectors)
+                with open(base + ".json", "w") as f:
+                    json.dump({"bucket": bucket, "index": name, "dimension": index.dimension,
+                               "distance_metric": index.distance_metric, "keys": index.keys,
+                               "metadata": index.metadata}, f)
@@ -1,40 +1,158 @@
-import pandas as pd
+import argparse
 
-# Load your dataset
-# Update the filename if needed
-filename = "job_descriptions.csv"  # or "large_job_dataset.csv" if that's the actual file
+import numpy as np
+import pandas as pd
 
-df = pd.read_csv(filename)
+# Clean job_descriptions.csv in one streaming pass:
+#
+#     python clean_job_data.py job_descriptions.csv --output job_descriptions_clean.parquet \
+#         --sample 300 --sample-output job_dataset_demo.csv
+#
+# The CSV is read --chunk-rows rows at a time, so memory is bounded by one
+# chunk plus 8 bytes per distinct Job Id and the sample, however large the
+# input is. Every cleaned row goes to --output (Parquet, which
+# load_job_dataset_to_weaviate.py reads back quickly, or CSV), and a uniform
+# random sample of --sample rows goes to --sample-output.
 
 # --- 1. Keep only useful columns for demo ---
 keep_cols = [
-    "Job Id", "Job Title", "Company", "location", "skills", 
+    "Job Id", "Job Title", "Company", "location", "skills",
     "Job Description", "Responsibilities"
 ]
-df = df[keep_cols]
+search_text_cols = ["Job Title", "Job Description", "skills", "Responsibilities"]
+output_cols = keep_cols + ["search_text"]
+
+
+class SeenIds:
+    """Job Ids seen so far, as a sorted array of 64-bit hashes instead of a set of strings."""
+
+    def __init__(self):
+        self.hashes = np.zeros(0, dtype='uint64')
+
+    def first_seen(self, ids):
+        """Mask of the ids not seen before (in earlier chunks or earlier in `ids`), and remember them."""
+        hashes = pd.util.hash_array(ids.to_numpy(dtype=object))
+        new = ~pd.Series(hashes).duplicated().to_numpy()
+        if len(self.hashes):
+            positions = np.minimum(np.searchsorted(self.hashes, hashes), len(self.hashes) - 1)
+            new &= self.hashes[positions] != hashes
+        self.hashes = np.union1d(self.hashes, hashes[new])
+        return new
+
+    def __len__(self):
+        return len(self.hashes)
 
-# --- 2. Drop duplicates & rows missing critical info ---
-df = df.drop_duplicates(subset=["Job Id"])
-df = df.dropna(subset=["Job Title", "Job Description"])
 
 # --- 3. Create search_text column for semantic search ---
-def make_search_text(row):
-    parts = [
-        row.get("Job Title", ""),
-        row.get("Job Description", ""),
-        row.get("skills", ""),
-        row.get("Responsibilities", "")
-    ]
-    return " ".join([str(p) for p in parts if pd.notnull(p)])
-
-df["search_text"] = df.apply(make_search_text, axis=1)
-
-# --- 4. Sample smaller dataset for demo ---
-demo_df = df.sample(n=300, random_state=42)  # adjust n for speed
-
-# --- 5. Save cleaned demo data ---
-demo_df.to_csv("job_dataset_demo.csv", index=False)
-
-print(f"Original size: {len(df)} rows")
-print(f"Sampled size: {len(demo_df)} rows")
-print("Saved to job_dataset_demo.csv")
+def make_search_text(df):
+    """Non-missing title, description, skills and responsibilities joined by spaces, with string ops per column."""
+    text = None
+    for column in search_text_cols:
+        part = df[column].astype("string")
+        text = part if text is None else (text + " " + part).fillna(text).fillna(part)
+    return text.fillna("").astype(object)
+
+
+class Reservoir:
+    """Uniform sample of `size` rows from a stream of DataFrames (Algorithm R)."""
+
+    def __init__(self, size, seed=42):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.rows = []
+        self.seen = 0
+
+    def add(self, df):
+        records = df.to_dict("records")
+        fill = max(0, min(self.size - len(self.rows), len(records)))
+        self.rows.extend(records[:fill])
+        # Row number t (0-based) replaces a random slot with probability size / (t + 1)
+        t = self.seen + np.arange(fill, len(records))
+        slots = (self.rng.random(len(t)) * (t + 1)).astype('int64')
+        for i in np.flatnonzero(slots < self.size):
+            self.rows[slots[i]] = records[fill + i]
+        self.seen += len(records)
+
+    def frame(self):
+        return pd.DataFrame(self.rows, columns=output_cols)
+
+
+class TableWriter:
+    """Appends DataFrames to one Parquet or CSV file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        self.writer = None
+        self.rows = 0
+
+    def write(self, df):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            schema = pa.schema([(column, pa.string()) for column in output_cols])
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.path, schema, compression="zstd")
+            self.writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+        else:
+            df.to_csv(self.path, mode="a" if self.rows else "w", header=not self.rows, index=False)
+        self.rows += len(df)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def write_table(path, df):
+    writer = TableWriter(path)
+    writer.write(df)
+    writer.close()
+
+
+def clean(path, output=None, sample=300, sample_output=None, chunk_rows=100000, seed=42):
+    seen = SeenIds()
+    reservoir = Reservoir(sample, seed) if sample_output and sample > 0 else None
+    writer = TableWriter(output) if output else None
+    total = cleaned = 0
+    # Ids as strings: no float round-off for 16-digit ids in chunks with missing values
+    for chunk in pd.read_csv(path, usecols=keep_cols, dtype=str, chunksize=chunk_rows):
+        total += len(chunk)
+        # --- 2. Drop duplicates & rows missing critical info ---
+        df = chunk[seen.first_seen(chunk["Job Id"])]
+        df = df.dropna(subset=["Job Title", "Job Description"])
+        df = df.assign(search_text=make_search_text(df))[output_cols]
+        cleaned += len(df)
+        if writer:
+            writer.write(df)
+        if reservoir:
+            reservoir.add(df)
+    if writer:
+        writer.close()
+    # --- 4. Sample smaller dataset for demo ---
+    if reservoir:
+        write_table(sample_output, reservoir.frame())
+    return {"input_rows": total, "distinct_ids": len(seen), "cleaned_rows": cleaned,
+            "sampled_rows": len(reservoir.rows) if reservoir else 0}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean a job CSV in chunks and sample a demo dataset")
+    parser.add_argument("path", nargs="?", default="job_descriptions.csv", help="Raw job CSV")
+    parser.add_argument("--output", default="job_descriptions_clean.parquet",
+                        help="All cleaned rows (.parquet or .csv); 'none' to skip")
+    parser.add_argument("--sample", type=int, default=300, help="Rows in the demo sample")  # adjust n for speed
+    parser.add_argument("--sample-output", default="job_dataset_demo.csv", help="Demo sample (.csv or .parquet)")
+    parser.add_argument("--chunk-rows", type=int, default=100000, help="CSV rows read at a time")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    output = None if args.output == "none" else args.output
+    # --- 5. Save cleaned data and the demo sample ---
+    counts = clean(args.path, output, args.sample, args.sample_output, args.chunk_rows, args.seed)
+    print(f"Read {counts['input_rows']} rows, {counts['distinct_ids']} distinct Job Ids")
+    print(f"Original size: {counts['cleaned_rows']} rows")
+    if output:
+        print(f"Saved to {output}")
+    if counts["sampled_rows"]:
+        print(f"Sampled size: {counts['sampled_rows']} rows")
+        print(f"Saved to {args.sample_output}")
@@ -1,16 +1,86 @@
 from fastapi import FastAPI, Query, HTTPException
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
+from contextlib import asynccontextmanager
+import base64
+import binascii
+import logging
+import os
+import uuid
 import weaviate
 import weaviate.classes.query as wq
+from weaviate.classes.init import AdditionalConfig, Timeout
+from weaviate.config import ConnectionConfig
+import asyncio
+import jobfinder_metrics
+from jobfinder_metrics import timed
+from request_metrics import RequestMetricsMiddleware
+from result_cache import ResultCache, normalize_query, version_path
+from sampling_profiler import SamplingProfiler, ProfilerBusy
 
 app = FastAPI()
-
-# Connect to local Weaviate instance
-client = weaviate.connect_to_local()
+logger = logging.getLogger(__name__)
 
 COLLECTION_NAME = "JobPosting"  # Change if using a different collection name
 
+# Weaviate queries in flight at once; requests beyond that wait for a slot
+WEAVIATE_CONCURRENCY = int(os.environ.get("JOBFINDER_WEAVIATE_CONCURRENCY", "64"))
+# Seconds a request may wait for a slot before it gets a 503
+QUEUE_TIMEOUT = float(os.environ.get("JOBFINDER_QUEUE_TIMEOUT", "5"))
+# Seconds before a Weaviate query times out
+QUERY_TIMEOUT = int(os.environ.get("JOBFINDER_QUERY_TIMEOUT", "30"))
+# Cached search responses (0 disables) and seconds before one expires
+CACHE_SIZE = int(os.environ.get("JOBFINDER_CACHE_SIZE", "1024"))
+CACHE_TTL = float(os.environ.get("JOBFINDER_CACHE_TTL", "300"))
+
+def connect():
+    # JOBFINDER_WEAVIATE_STANDIN=<csv> serves that CSV from memory instead of
+    # Weaviate, for offline load tests (see weaviate_standin.py)
+    standin_data = os.environ.get("JOBFINDER_WEAVIATE_STANDIN")
+    if standin_data:
+        from weaviate_standin import connect_to_standin_async
+        return connect_to_standin_async(standin_data)
+    # Async client for a local Weaviate instance, with a connection pool sized for the concurrency limit
+    config = AdditionalConfig(
+        connection=ConnectionConfig(session_pool_connections=WEAVIATE_CONCURRENCY,
+                                    session_pool_maxsize=WEAVIATE_CONCURRENCY),
+        timeout=Timeout(query=QUERY_TIMEOUT),
+    )
+    return weaviate.use_async_with_local(additional_config=config)
+
+# Created here, connected on startup and closed on shutdown
+client = connect()
+# Collection handle, fetched once on startup instead of per request
+collection = None
+weaviate_slots = None
+
+# Emptied when the loader writes a new version stamp for the collection (see result_cache.py)
+result_cache = ResultCache(CACHE_SIZE, CACHE_TTL, version_path(COLLECTION_NAME))
+
+# GET /debug/profile records a sampling profile; off unless JOBFINDER_PROFILER_ENABLED=1
+profiler = SamplingProfiler() if os.environ.get("JOBFINDER_PROFILER_ENABLED", "0") == "1" else None
+
+@app.on_event("startup")
+async def startup_event():
+    global collection, weaviate_slots
+    await client.connect()
+    collection = client.collections.get(COLLECTION_NAME)
+    weaviate_slots = asyncio.Semaphore(WEAVIATE_CONCURRENCY)
+
+@asynccontextmanager
+async def weaviate_slot():
+    """Hold one of the WEAVIATE_CONCURRENCY query slots, timed as the weaviate stage."""
+    try:
+        await asyncio.wait_for(weaviate_slots.acquire(), QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Too many concurrent searches, try again")
+    try:
+        with timed("weaviate"):
+            yield
+    finally:
+        weaviate_slots.release()
+
 class JobResult(BaseModel):
     job_id: str
     job_title: str
@@ -26,6 +96,10 @@ class JobResult(BaseModel):
 class SearchResponse(BaseModel):
     results: List[JobResult]
 
+class JobsPage(SearchResponse):
+    # Cursor for the next page, or None after the last page
+    next_after: Optional[str] = None
+
 class SemanticSearchRequest(BaseModel):
     query: str
     k: Optional[int] = 10
@@ -35,8 +109,34 @@ class HybridSearchRequest(BaseModel):
     k: Optional[int] = 10
     alpha: Optional[float] = 0.5
 
+def search_json(objects, score=False, distance=False) -> str:
+    """Build the JobResults and the response JSON.
+
+    Serialized here instead of by FastAPI so the time is recorded as its own stage.
+    """
+    with timed("serialize"):
+        results = [JobResult(**obj.properties,
+                             score=getattr(obj.metadata, 'score', None) if score else None,
+                             distance=getattr(obj.metadata, 'distance', None) if distance else None)
+                   for obj in objects]
+        return SearchResponse(results=results).model_dump_json()
+
+def search_response(objects, score=False, distance=False) -> Response:
+    return Response(content=search_json(objects, score, distance), media_type="application/json")
+
+async def cached_search(search, key, query, score=False, distance=False) -> Response:
+    """Response JSON for `key` from the result cache, or from running `query` (a coroutine function)."""
+    async def run():
+        async with weaviate_slot():
+            response = await query()
+        return search_json(response.objects, score, distance)
+
+    content, outcome = await result_cache.get_or_compute((search, *key), run)
+    jobfinder_metrics.cache_requests.labels(search, outcome).inc()
+    return Response(content=content, media_type="application/json")
+
 @app.get("/search/exact", response_model=SearchResponse)
-def exact_search(
+async def exact_search(
     job_id: Optional[str] = Query(None),
     job_title: Optional[str] = Query(None),
     company: Optional[str] = Query(None),
@@ -50,7 +150,6 @@ def exact_search(
     Exact/BM25 keyword search on JobPosting collection across all fields.
     """
     try:
-        collection = client.collections.get(COLLECTION_NAME)
         filters = []
         if job_id:
             filters.append(wq.Filter.by_property("job_id").equal(job_id))
@@ -79,64 +178,166 @@ def exact_search(
         }
         if where:
             bm25_kwargs["filters"] = where
-        response = collection.query.bm25(**bm25_kwargs)
-        results = [JobResult(**obj.properties, score=getattr(obj.metadata, 'score', None)) for obj in response.objects]
-        return SearchResponse(results=results)
+        # job_id is matched exactly; the other fields are tokenized, so case and spacing don't matter
+        key = ((job_id or "").strip(), *(normalize_query(v) for v in
+               [job_title, company, location, skills, job_description, responsibilities]), k)
+        return await cached_search("exact", key, lambda: collection.query.bm25(**bm25_kwargs), score=True)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/search/semantic", response_model=SearchResponse)
-def semantic_search(request: SemanticSearchRequest):
+async def semantic_search(request: SemanticSearchRequest):
     """
     Semantic/vector search on JobPosting collection (search_text field).
     """
     try:
-        collection = client.collections.get(COLLECTION_NAME)
-        response = collection.query.near_text(
-            query=request.query,
-            limit=request.k,
-            return_metadata=wq.MetadataQuery(distance=True)
-        )
-        results = [JobResult(**obj.properties, distance=getattr(obj.metadata, 'distance', None)) for obj in response.objects]
-        return SearchResponse(results=results)
+        return await cached_search(
+            "semantic", (normalize_query(request.query), request.k),
+            lambda: collection.query.near_text(
+                query=request.query,
+                limit=request.k,
+                return_metadata=wq.MetadataQuery(distance=True)
+            ),
+            distance=True)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/search/hybrid", response_model=SearchResponse)
-def hybrid_search(request: HybridSearchRequest):
+async def hybrid_search(request: HybridSearchRequest):
     """
     Hybrid search (BM25 + vector) on JobPosting collection (search_text field).
     """
     try:
-        collection = client.collections.get(COLLECTION_NAME)
-        response = collection.query.hybrid(
-            query=request.query,
-            limit=request.k,
-            alpha=request.alpha,
-            fusion_type=wq.HybridFusion.RELATIVE_SCORE,
-            return_metadata=wq.MetadataQuery(score=True, distance=True)
-        )
-        results = [JobResult(**obj.properties, score=getattr(obj.metadata, 'score', None), distance=getattr(obj.metadata, 'distance', None)) for obj in response.objects]
-        return SearchResponse(results=results)
+        return await cached_search(
+            "hybrid", (normalize_query(request.query), request.k, request.alpha),
+            lambda: collection.query.hybrid(
+                query=request.query,
+                limit=request.k,
+                alpha=request.alpha,
+                fusion_type=wq.HybridFusion.RELATIVE_SCORE,
+                return_metadata=wq.MetadataQuery(score=True, distance=True)
+            ),
+            score=True, distance=True)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
-@app.get("/jobs/all", response_model=SearchResponse)
-def get_all_jobs(offset: int = Query(0, ge=0), limit: int = Query(10, gt=0, le=100)):
+def encode_cursor(object_uuid) -> str:
+    """Opaque `after` token for the object with this UUID."""
+    return base64.urlsafe_b64encode(uuid.UUID(str(object_uuid)).bytes).rstrip(b"=").decode()
+
+def decode_cursor(token: str) -> uuid.UUID:
+    try:
+        return uuid.UUID(bytes=base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid after cursor")
+
+@app.get("/jobs/all", response_model=JobsPage)
+async def get_all_jobs(after: Optional[str] = Query(None), offset: int = Query(0, ge=0),
+                       limit: int = Query(10, gt=0, le=100)):
     """
     Get all jobs in the collection with pagination.
+
+    Pass the previous page's next_after as `after` to get the next page; each
+    page costs the same however deep it is. `offset` still works but Weaviate
+    reads and skips every object before it, so deep offsets get slower.
+    """
+    if after is not None and offset:
+        raise HTTPException(status_code=400, detail="Use either after or offset, not both")
+    try:
+        cursor = decode_cursor(after) if after is not None else None
+        async with weaviate_slot():
+            # One extra object tells whether there is a next page
+            if offset:
+                response = await collection.query.fetch_objects(offset=offset, limit=limit + 1)
+            else:
+                response = await collection.query.fetch_objects(after=cursor, limit=limit + 1)
+        objects = response.objects[:limit]
+        next_after = encode_cursor(objects[-1].uuid) if len(response.objects) > limit else None
+        with timed("serialize"):
+            results = [JobResult(**obj.properties) for obj in objects]
+            content = JobsPage(results=results, next_after=next_after).model_dump_json()
+        return Response(content=content, media_type="application/json")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def export_lines(page_size, after=None):
+    """NDJSON lines for every job, one page of the collection in memory at a time.
+
+    Walks the collection with the `after` cursor, like the client's
+    collection.iterator(), but takes a Weaviate slot per page only, so a slow
+    reader doesn't hold one for the whole export.
+    """
+    while True:
+        async with weaviate_slot():
+            response = await collection.query.fetch_objects(after=after, limit=page_size)
+        if not response.objects:
+            return
+        with timed("serialize"):
+            chunk = "".join(JobResult(**obj.properties).model_dump_json(exclude={"score", "distance"}) + "\n"
+                            for obj in response.objects)
+        yield chunk
+        if len(response.objects) < page_size:
+            return
+        after = response.objects[-1].uuid
+
+@app.get("/jobs/export")
+async def export_jobs(page_size: int = Query(500, gt=0, le=10000)):
+    """
+    Stream every job as newline-delimited JSON, one object per line.
     """
+    lines = export_lines(page_size)
     try:
-        collection = client.collections.get(COLLECTION_NAME)
-        response = collection.query.fetch_objects(
-            offset=offset,
-            limit=limit
-        )
-        results = [JobResult(**obj.properties) for obj in response.objects]
-        return SearchResponse(results=results)
+        # Fetched up front so an unavailable Weaviate is still an error status, not an empty 200
+        first = await anext(lines, "")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    async def body():
+        yield first
+        try:
+            async for chunk in lines:
+                yield chunk
+        except Exception:
+            # The 200 is already sent; aborting the response shows the client the export is incomplete
+            logger.exception("Job export failed")
+            raise
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+@app.get("/metrics")
+def metrics():
+    content, content_type = jobfinder_metrics.render()
+    return Response(content=content, media_type=content_type)
+
+@app.get("/stats/cache")
+def cache_stats():
+    return result_cache.stats()
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def debug_profile(seconds: float = Query(10.0, gt=0, le=60), interval_ms: float = Query(5.0, ge=1)):
+    """
+    Sample every thread's stack for `seconds`; returns collapsed stacks for a flame graph.
+    """
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiling is disabled. Set JOBFINDER_PROFILER_ENABLED=1 to enable it.")
+    try:
+        return await asyncio.to_thread(profiler.profile, seconds, interval_ms / 1000)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+app.add_middleware(RequestMetricsMiddleware, paths=[route.path for route in app.routes],
+                   metrics=jobfinder_metrics.http_metrics)
+
 @app.on_event("shutdown")
-def shutdown_event():
-    client.close()
+async def shutdown_event():
+    await client.close()
@@ -0,0 +1,40 @@
+"""
+Prometheus metrics for the JobFinder API, served on /metrics.
+
+- jobfinder_stage_seconds{stage}: time per stage of a search. weaviate is the
+  round trip of the query to Weaviate, serialize is building the JobResult
+  objects and the response JSON.
+- jobfinder_request_seconds{endpoint}, jobfinder_requests_total{endpoint,status}
+  and jobfinder_requests_in_flight{endpoint}, recorded by
+  RequestMetricsMiddleware.
+- jobfinder_cache_requests_total{search,outcome}: result cache lookups per
+  search type; outcome is hit, miss (ran the search) or coalesced (shared a
+  concurrent miss's search).
+
+The timer and the middleware come from request_metrics.py, shared with the
+FAQ API.
+"""
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+
+from request_metrics import RequestMetrics, stage_timer
+
+registry = CollectorRegistry()
+
+STAGES = ("weaviate", "serialize")
+
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+stage_seconds = Histogram("jobfinder_stage_seconds", "Time spent in each job search stage", ["stage"],
+                          buckets=STAGE_BUCKETS, registry=registry)
+# Recorded by RequestMetricsMiddleware
+http_metrics = RequestMetrics("jobfinder", registry)
+cache_requests = Counter("jobfinder_cache_requests", "Result cache lookups by search type and outcome",
+                         ["search", "outcome"], registry=registry)
+
+timed = stage_timer(stage_seconds, STAGES)
+
+
+def render():
+    """The metrics in Prometheus text format, and its content type."""
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,39 +1,206 @@
-import weaviate
+# Load a job CSV or Parquet file into the JobPosting collection.
+#
+#     python load_job_dataset_to_weaviate.py job_descriptions_clean.parquet --concurrent-requests 4
+#
+# - The file is read --read-chunk rows at a time, and each chunk is turned into
+#   objects column-wise (one rename and to_dict per chunk, no per-row pandas
+#   access), so memory stays flat for the full job_descriptions.csv.
+# - search_text is embedded here, --encode-batch texts per request to Ollama's
+#   /api/embed with the collection's model, and each object is sent with its
+#   vector, so Weaviate skips its per-object text2vec-ollama call.
+#   --embedder none leaves vectorizing to Weaviate as before.
+# - Objects go through Weaviate's dynamic batching (or --batch-size objects
+#   per request with --concurrent-requests in flight), while the next texts
+#   are being embedded.
+# - UUIDs are derived from job_id, so re-running the load or retrying an
+#   object overwrites it instead of duplicating it.
+# - Objects that fail are queued and retried in a new batch up to
+#   --max-retries times with backoff; those that still fail are written to
+#   --failed-jobs.
+# - When the import finishes, a new version stamp is written to
+#   --version-file, which tells job_search_api.py to drop its cached results.
+#
+# The collection is created by schema_create.md.
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
 import pandas as pd
+import requests
+import weaviate
+from weaviate.util import generate_uuid5
+
+from result_cache import version_path, write_version
+
+COLLECTION_NAME = "JobPosting"
+# Collection property -> CSV column
+CSV_COLUMNS = {
+    "job_id": "Job Id",
+    "job_title": "Job Title",
+    "company": "Company",
+    "location": "location",
+    "skills": "skills",
+    "job_description": "Job Description",
+    "responsibilities": "Responsibilities",
+    "search_text": "search_text",
+}
+# Must be the model of the collection's text2vec-ollama module (schema_create.md), so
+# near_text queries, which Weaviate vectorizes itself, land in the same space
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
+EMBED_MODEL = os.environ.get("JOBFINDER_EMBED_MODEL", "nomic-embed-text")
+# Seconds between progress lines
+PROGRESS_INTERVAL = 10.0
+
+
+def read_job_frames(path, chunk_rows=50000):
+    """Yield a CSV or Parquet file as DataFrames of up to chunk_rows rows with collection property columns."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(path)
+        columns = [c for c in CSV_COLUMNS.values() if c in parquet.schema_arrow.names]
+        reader = (batch.to_pandas().fillna("")
+                  for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns))
+    else:
+        reader = pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_rows,
+                             usecols=lambda column: column in CSV_COLUMNS.values())
+    for chunk in reader:
+        if "search_text" not in chunk.columns:
+            raise SystemExit(f"{path} has no search_text column; run clean_job_data.py first")
+        # Missing columns become empty strings rather than "nan"
+        yield chunk.reindex(columns=list(CSV_COLUMNS.values()), fill_value="").set_axis(list(CSV_COLUMNS), axis=1)
+
+
+def job_objects(frame):
+    """(properties, uuids) for a DataFrame of property columns."""
+    # Jobs without an id are keyed by their text so they still dedupe on re-runs
+    keys = frame["job_id"].where(frame["job_id"] != "", frame["search_text"])
+    return frame.to_dict("records"), [generate_uuid5(key, COLLECTION_NAME) for key in keys]
+
+
+class OllamaEmbedder:
+    def __init__(self, url=OLLAMA_URL, model=EMBED_MODEL, max_attempts=5, timeout=300):
+        self.url = url.rstrip("/") + "/api/embed"
+        self.model = model
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.seconds = 0.0
+
+    def __call__(self, texts):
+        started = time.perf_counter()
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                response = self.session.post(self.url, json={"model": self.model, "input": texts}, timeout=self.timeout)
+                response.raise_for_status()
+                break
+            except requests.RequestException:
+                if attempt == self.max_attempts:
+                    raise
+                time.sleep(min(30.0, 2 ** attempt))
+        self.seconds += time.perf_counter() - started
+        return np.asarray(response.json()["embeddings"], dtype='float32')
+
 
-# Connect to local Weaviate instance
-client = weaviate.connect_to_local()
-
-# Load job dataset from CSV
-csv_path = "job_dataset_demo.csv"
-df = pd.read_csv(csv_path)
-
-# Get the JobPosting collection
-job_collection = client.collections.get("JobPosting")
-
-# Prepare batch insert
-with job_collection.batch.fixed_size(batch_size=100) as batch:
-    for _, row in df.iterrows():
-        obj = {
-            "job_id": str(row.get("Job Id", "")),
-            "job_title": str(row.get("Job Title", "")),
-            "company": str(row.get("Company", "")),
-            "location": str(row.get("location", "")),
-            "skills": str(row.get("skills", "")),
-            "job_description": str(row.get("Job Description", "")),
-            "responsibilities": str(row.get("Responsibilities", "")),
-            "search_text": str(row.get("search_text", "")),
-        }
-        batch.add_object(obj)
-        if batch.number_errors > 10:
-            print("Batch import stopped due to excessive errors.")
+def batch_context(collection, batch_size, concurrent_requests):
+    if batch_size:
+        return collection.batch.fixed_size(batch_size=batch_size, concurrent_requests=concurrent_requests)
+    return collection.batch.dynamic()
+
+
+def add_objects(collection, objects, batch_size, concurrent_requests):
+    """Send (properties, uuid, vector) triples in one batch; returns its failed objects."""
+    with batch_context(collection, batch_size, concurrent_requests) as batch:
+        for properties, uid, vector in objects:
+            batch.add_object(properties=properties, uuid=uid, vector=vector)
+    return list(collection.batch.failed_objects)
+
+
+def load(collection, frames, embed=None, encode_batch=256, batch_size=0, concurrent_requests=2, max_retries=3,
+         retry_delay=2.0):
+    """Load DataFrames of jobs; returns (stats, objects that failed every attempt)."""
+    started = last_report = time.perf_counter()
+    stats = {"objects": 0, "retried": 0, "failed": 0}
+
+    def objects():
+        nonlocal last_report
+        for frame in frames:
+            properties, uuids = job_objects(frame)
+            for start in range(0, len(properties), encode_batch):
+                part = properties[start:start + encode_batch]
+                if embed is not None:
+                    # One tolist() per encode batch; the client needs Python floats
+                    vectors = embed([p["search_text"] for p in part]).tolist()
+                else:
+                    vectors = [None] * len(part)
+                yield from zip(part, uuids[start:start + encode_batch], vectors)
+                stats["objects"] += len(part)
+                now = time.perf_counter()
+                if now - last_report >= PROGRESS_INTERVAL:
+                    last_report = now
+                    print(f"  {stats['objects']} objects queued ({stats['objects'] / (now - started):.0f} objects/s)")
+
+    failed = add_objects(collection, objects(), batch_size, concurrent_requests)
+    # Retry queue: failed objects go around again in a fresh batch
+    for attempt in range(1, max_retries + 1):
+        if not failed:
             break
+        stats["retried"] += len(failed)
+        print(f"  retrying {len(failed)} failed objects (attempt {attempt} of {max_retries}); "
+              f"first error: {failed[0].message}")
+        time.sleep(retry_delay * 2 ** (attempt - 1))
+        failed = add_objects(collection, [(e.object_.properties, e.object_.uuid, e.object_.vector) for e in failed],
+                             batch_size, concurrent_requests)
+    stats["failed"] = len(failed)
+    stats["seconds"] = time.perf_counter() - started
+    stats["objects_per_second"] = (stats["objects"] - stats["failed"]) / stats["seconds"] if stats["seconds"] > 0 else 0
+    return stats, failed
+
+
+def write_failed(path, failed):
+    with open(path, "w", encoding="utf-8") as f:
+        for error in failed:
+            f.write(json.dumps({"uuid": str(error.object_.uuid), "properties": error.object_.properties,
+                                "error": error.message}) + "\n")
 
-failed_objects = job_collection.batch.failed_objects
-if failed_objects:
-    print(f"Number of failed imports: {len(failed_objects)}")
-    print(f"First failed object: {failed_objects[0]}")
-else:
-    print("✅ All objects imported successfully!")
 
-client.close()  # Free up resources
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load a job CSV or Parquet file into Weaviate")
+    parser.add_argument("path", nargs="?", default="job_dataset_demo.csv", help="Cleaned job CSV or Parquet file with search_text (clean_job_data.py)")
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--read-chunk", type=int, default=50000, help="Rows read at a time")
+    parser.add_argument("--embedder", choices=["ollama", "none"], default="ollama",
+                        help="Embed search_text here (ollama) or let Weaviate vectorize it (none)")
+    parser.add_argument("--encode-batch", type=int, default=256, help="Texts per /api/embed request")
+    parser.add_argument("--batch-size", type=int, default=0, help="Objects per batch request (0: dynamic batching)")
+    parser.add_argument("--concurrent-requests", type=int, default=2, help="Batch requests in flight (fixed size)")
+    parser.add_argument("--max-retries", type=int, default=3, help="Rounds of retrying failed objects")
+    parser.add_argument("--failed-jobs", default="failed_jobs.jsonl", help="Where to write objects that failed")
+    parser.add_argument("--version-file", help="Version stamp the API's result cache watches "
+                                               "(default: JOBFINDER_VERSION_FILE or <collection>.version.json in this directory)")
+    args = parser.parse_args()
+
+    # Connect to local Weaviate instance
+    client = weaviate.connect_to_local()
+    try:
+        collection = client.collections.get(args.collection)
+        embedder = OllamaEmbedder() if args.embedder == "ollama" else None
+        stats, failed = load(collection, read_job_frames(args.path, args.read_chunk), embedder, args.encode_batch,
+                             args.batch_size, args.concurrent_requests, args.max_retries)
+    finally:
+        client.close()  # Free up resources
+    # Even a partial import changed the collection, so cached results are stale either way
+    write_version(args.version_file or version_path(args.collection), args.collection,
+                  objects=stats["objects"] - stats["failed"])
+
+    embed_note = f", {embedder.seconds:.1f}s embedding" if embedder else ""
+    print(f"Imported {stats['objects'] - stats['failed']} of {stats['objects']} objects in {stats['seconds']:.1f}s "
+          f"({stats['objects_per_second']:.0f} objects/s{embed_note}, {stats['retried']} retried)")
+    if failed:
+        write_failed(args.failed_jobs, failed)
+        print(f"Number of failed imports: {len(failed)}; wrote them to {args.failed_jobs}")
+        print(f"First failed object: {failed[0].message}")
+        sys.exit(1)
+    print("✅ All objects imported successfully!")
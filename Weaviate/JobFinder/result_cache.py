@@ -0,0 +1,167 @@
+"""
+Cache of search responses for repeated JobFinder queries.
+
+Responses are cached as their serialized JSON, keyed by the search type and
+the normalized request (query text, k, alpha, field filters), so a hit skips
+both the Weaviate query (and its query embedding) and serialization.
+
+- Bounded: the least recently used entry is evicted beyond max_entries, and
+  entries expire ttl seconds after they were stored.
+- Versioned: load_job_dataset_to_weaviate.py writes a version stamp file
+  for the collection when an import finishes. The cache checks the stamp on
+  lookups and drops every entry when it changes, and a response computed
+  against an older version is not stored.
+- Single-flight: concurrent misses for the same key share one backend call.
+  Its result (or error) goes to every waiter; errors are not cached.
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+
+
+def normalize_query(query):
+    """Lowercase and collapse whitespace so trivially different queries share entries."""
+    return " ".join((query or "").lower().split())
+
+
+def version_path(collection):
+    """Stamp file of `collection`: JOBFINDER_VERSION_FILE, or <collection>.version.json next to this module.
+
+    Anchored here rather than to the working directory, so the loader and the
+    API find the same file wherever each of them is started from.
+    """
+    default = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{collection}.version.json")
+    return os.environ.get("JOBFINDER_VERSION_FILE") or default
+
+
+def write_version(path, collection, **info):
+    """Write a new version stamp; replaced atomically so readers never see a partial file."""
+    stamp = {"collection": collection, "version": uuid.uuid4().hex, "written_at": time.time(), **info}
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(stamp, f)
+    os.replace(tmp, path)
+    return stamp
+
+
+class ResultCache:
+    def __init__(self, max_entries, ttl, version_file=None, version_check_interval=1.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version_file = version_file
+        self.version_check_interval = version_check_interval
+        # key -> (expires_at, version, value)
+        self.entries = OrderedDict()
+        # (version, key) -> task computing the value
+        self.in_flight = {}
+        self.version = None
+        self._stamp_signature = None
+        self._next_version_check = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def current_version(self):
+        """The stamp's version, re-read at most every version_check_interval seconds and only if the file changed."""
+        now = time.monotonic()
+        if self.version_file is None or now < self._next_version_check:
+            return self.version
+        self._next_version_check = now + self.version_check_interval
+        try:
+            st = os.stat(self.version_file)
+            signature = (st.st_mtime_ns, st.st_size)
+            if signature != self._stamp_signature:
+                with open(self.version_file, "r", encoding="utf-8") as f:
+                    version = json.load(f).get("version")
+                self._stamp_signature = signature
+                self.set_version(version)
+        except FileNotFoundError:
+            self._stamp_signature = None
+        except (OSError, ValueError):
+            # A stamp being replaced or unreadable; keep the current version and try again later
+            pass
+        return self.version
+
+    def set_version(self, version):
+        if version != self.version:
+            if self.version is not None or self.entries:
+                self.invalidations += 1
+            self.version = version
+            self.entries.clear()
+
+    def get(self, key):
+        version = self.current_version()
+        entry = self.entries.get(key)
+        if entry is not None:
+            expires_at, entry_version, value = entry
+            if entry_version == version and time.monotonic() < expires_at:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self.entries[key]
+            self.expirations += 1
+        self.misses += 1
+        return None
+
+    def put(self, key, value, version):
+        if self.max_entries <= 0 or self.ttl <= 0 or version != self.version:
+            return
+        self.entries[key] = (time.monotonic() + self.ttl, version, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_compute(self, key, compute):
+        """(value, outcome): the cached value for `key`, or `await compute()`.
+
+        outcome is "hit", "miss" (this call ran compute) or "coalesced"
+        (joined a concurrent call for the same key).
+        """
+        value = self.get(key)
+        if value is not None:
+            return value, "hit"
+        version = self.version
+        flight_key = (version, key)
+        task = self.in_flight.get(flight_key)
+        if task is not None:
+            self.coalesced += 1
+            # Shielded so one waiter disconnecting doesn't cancel the call for the others
+            return await asyncio.shield(task), "coalesced"
+        task = asyncio.ensure_future(compute())
+        self.in_flight[flight_key] = task
+
+        def done(task):
+            self.in_flight.pop(flight_key, None)
+            if not task.cancelled() and task.exception() is None:
+                self.put(key, task.result(), version)
+
+        task.add_done_callback(done)
+        return await asyncio.shield(task), "miss"
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "coalesced": self.coalesced,
+            "in_flight": len(self.in_flight),
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
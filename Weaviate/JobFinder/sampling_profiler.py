@@ -0,0 +1,67 @@
+"""
+Sampling profiler for a running server.
+
+Every `interval` seconds it records the Python stack of every thread (the
+event loop as well as the search worker threads), and returns how often each
+stack was seen in the "collapsed" format understood by flamegraph.pl and
+speedscope:
+
+    thread;outer_function (file.py:12);inner_function (file.py:40) 17
+
+Nothing runs between profiles, so leaving the endpoint enabled costs
+nothing until someone asks for a profile.
+
+The same file is in FAISS/ and Weaviate/JobFinder/ (see request_metrics.py):
+the two APIs are separate projects without a shared package, so change both
+copies together.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+class SamplingProfiler:
+    def __init__(self, max_seconds=60.0):
+        self.max_seconds = max_seconds
+        # One profile at a time; two samplers would only slow each other down
+        self.lock = threading.Lock()
+
+    def profile(self, seconds, interval=0.005):
+        """Sample all threads for `seconds` and return the collapsed stacks as text."""
+        if not self.lock.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already being recorded")
+        try:
+            counts = self._sample(min(seconds, self.max_seconds), interval)
+        finally:
+            self.lock.release()
+        return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+    def _sample(self, seconds, interval):
+        counts = Counter()
+        me = threading.get_ident()
+        labels = {}
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                    stack.append(label)
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                counts[";".join(reversed(stack))] += 1
+            time.sleep(interval)
+        return counts
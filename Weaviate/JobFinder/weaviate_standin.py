@@ -0,0 +1,356 @@
+"""
+In-memory stand-in for the parts of the Weaviate v4 client that
+job_search_api.py uses, loaded from a job CSV.
+
+It lets the API run without a Weaviate server, so load tests
+(FAISS/load_test.py --target jobfinder) run offline and measure our own code
+path rather than the database. Enable it with
+
+    JOBFINDER_WEAVIATE_STANDIN=job_dataset_demo.csv uvicorn job_search_api:app
+
+The collections also take writes through collection.batch (dynamic() or
+fixed_size() contexts with add_object), so load_job_dataset_to_weaviate.py
+can be exercised offline; failure_rate makes a share of objects fail to test
+its retry queue. Supplied vectors are accepted but the stand-in keeps
+ranking with its own vectors.
+
+connect_to_standin_async() returns the same stand-in behind the v4 async
+client's interface (await connect(), collections.get(), awaited queries).
+JOBFINDER_STANDIN_LATENCY_MS adds a round-trip delay to every query (a
+blocking sleep for the sync client, an awaited one for the async client), so
+concurrency benchmarks see something like network latency.
+
+Scoring is deliberately simple:
+- bm25: BM25 over the word tokens of all properties
+- near_text: cosine distance between hashed bag-of-words vectors of
+  search_text (in place of the text2vec vectorizer)
+- hybrid: relative-score fusion of the two, weighted by alpha
+
+fetch_objects returns objects in UUID order and takes Weaviate's `after`
+cursor, so cursor pagination and exports walk the collection as they would
+against Weaviate.
+"""
+
+import asyncio
+import bisect
+import csv
+import math
+import os
+import random
+import re
+import time
+import uuid
+import zlib
+from collections import Counter, defaultdict
+from types import SimpleNamespace
+from uuid import uuid4
+
+import numpy as np
+
+# Same mapping as load_job_dataset_to_weaviate.py
+CSV_COLUMNS = {
+    "job_id": "Job Id",
+    "job_title": "Job Title",
+    "company": "Company",
+    "location": "location",
+    "skills": "skills",
+    "job_description": "Job Description",
+    "responsibilities": "Responsibilities",
+    "search_text": "search_text",
+}
+
+VECTOR_DIM = 256
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Simulated Weaviate round trip per query
+LATENCY = float(os.environ.get("JOBFINDER_STANDIN_LATENCY_MS", "0")) / 1000.0
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return TOKEN.findall(str(text).lower())
+
+
+def embed(text):
+    vector = np.zeros(VECTOR_DIM, dtype='float32')
+    for token in tokenize(text):
+        vector[zlib.crc32(token.encode()) % VECTOR_DIM] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def read_jobs(path):
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield {prop: str(row.get(column) or "") for prop, column in CSV_COLUMNS.items()}
+
+
+def matches(properties, where):
+    """Evaluate the Weaviate filter objects job_search_api builds (And/Or, Equal, ContainsAny)."""
+    if where is None:
+        return True
+    if hasattr(where, "filters"):
+        results = (matches(properties, f) for f in where.filters)
+        return any(results) if type(where).__name__ == "_FilterOr" else all(results)
+    value = properties.get(where.target, "")
+    operator = where.operator.value
+    if operator == "Equal":
+        return value == where.value
+    if operator in ("ContainsAny", "ContainsAll"):
+        tokens = set(tokenize(value))
+        wanted = [set(tokenize(v)) for v in where.value]
+        check = any if operator == "ContainsAny" else all
+        return check(w and w <= tokens for w in wanted)
+    raise NotImplementedError(f"Filter operator {operator} is not supported by the stand-in")
+
+
+class StandinQuery:
+    def __init__(self, collection, latency=LATENCY):
+        self.collection = collection
+        self.latency = latency
+
+    def _round_trip(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _response(self, ranked, limit, offset=0, score=None, distance=None):
+        objects = []
+        for i in ranked[offset:offset + limit]:
+            i = int(i)
+            metadata = SimpleNamespace(score=None, distance=None)
+            if score is not None:
+                metadata.score = float(score[i])
+            if distance is not None:
+                metadata.distance = float(distance[i])
+            objects.append(SimpleNamespace(uuid=self.collection.uuids[i],
+                                          properties=dict(self.collection.objects[i]), metadata=metadata))
+        return SimpleNamespace(objects=objects)
+
+    def _candidates(self, filters):
+        return [i for i, props in enumerate(self.collection.objects) if matches(props, filters)]
+
+    def bm25(self, query, limit=10, filters=None, return_metadata=None, **kwargs):
+        self._round_trip()
+        scores = self.collection.bm25_scores(query)
+        candidates = self._candidates(filters) if filters is not None else range(len(scores))
+        ranked = sorted((i for i in candidates if scores[i] > 0), key=lambda i: -scores[i])
+        return self._response(ranked, limit, score=scores)
+
+    def near_text(self, query, limit=10, filters=None, return_metadata=None, **kwargs):
+        self._round_trip()
+        distances = 1.0 - self.collection.vectors @ embed(query)
+        candidates = np.asarray(self._candidates(filters) if filters is not None else range(len(distances)), dtype='int64')
+        ranked = candidates[np.argsort(distances[candidates], kind="stable")]
+        return self._response(ranked, limit, distance=distances)
+
+    def hybrid(self, query, limit=10, alpha=0.5, filters=None, return_metadata=None, fusion_type=None, **kwargs):
+        self._round_trip()
+        keyword = self.collection.bm25_scores(query)
+        distances = 1.0 - self.collection.vectors @ embed(query)
+
+        def rescale(values):
+            low, high = values.min(), values.max()
+            return (values - low) / (high - low) if high > low else np.zeros_like(values)
+
+        fused = alpha * rescale(-distances) + (1 - alpha) * rescale(keyword)
+        candidates = np.asarray(self._candidates(filters) if filters is not None else range(len(fused)), dtype='int64')
+        ranked = candidates[np.argsort(-fused[candidates], kind="stable")]
+        return self._response(ranked, limit, score=fused, distance=distances)
+
+    def fetch_objects(self, offset=0, limit=10, filters=None, after=None, **kwargs):
+        self._round_trip()
+        order = self.collection.uuid_order
+        if after is not None:
+            if offset or filters is not None:
+                raise ValueError("after cannot be combined with offset or filters")
+            start = bisect.bisect_right(self.collection.sorted_uuids, str(after))
+            return self._response(order[start:], limit)
+        if filters is not None:
+            order = [i for i in order if matches(self.collection.objects[i], filters)]
+        return self._response(order, limit, offset=offset)
+
+
+class StandinBatch:
+    def __init__(self, collection, failure_rate, rng):
+        self.collection = collection
+        self.failure_rate = failure_rate
+        self.rng = rng
+        self.pending = []
+        self.failed_objects = []
+
+    def add_object(self, properties=None, references=None, uuid=None, vector=None):
+        obj = SimpleNamespace(properties=dict(properties or {}), uuid=uuid or uuid4(), vector=vector)
+        if self.failure_rate and self.rng.random() < self.failure_rate:
+            self.failed_objects.append(SimpleNamespace(message="stand-in failure", object_=obj))
+        else:
+            self.pending.append(obj)
+        return obj.uuid
+
+    @property
+    def number_errors(self):
+        return len(self.failed_objects)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.collection.upsert(self.pending)
+        self.collection.batch.failed_objects = self.failed_objects
+        return False
+
+
+class StandinBatchWrapper:
+    def __init__(self, collection, failure_rate=0.0, seed=None):
+        self.collection = collection
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.failed_objects = []
+
+    def dynamic(self):
+        return StandinBatch(self.collection, self.failure_rate, self.rng)
+
+    def fixed_size(self, batch_size=100, concurrent_requests=2):
+        return StandinBatch(self.collection, self.failure_rate, self.rng)
+
+
+class StandinCollection:
+    def __init__(self, name, objects):
+        self.name = name
+        self.objects = objects
+        self.uuids = [uuid.uuid5(uuid.NAMESPACE_URL, f"{name}/{obj['job_id']}/{i}") for i, obj in enumerate(objects)]
+        self._reindex()
+        self.query = StandinQuery(self)
+        self.batch = StandinBatchWrapper(self)
+
+    def _reindex(self):
+        objects = self.objects
+        # Weaviate's object store order, which the `after` cursor follows
+        self.uuid_order = sorted(range(len(objects)), key=lambda i: str(self.uuids[i]))
+        self.sorted_uuids = [str(self.uuids[i]) for i in self.uuid_order]
+        self.vectors = np.vstack([embed(obj.get("search_text", "")) for obj in objects]) if objects \
+            else np.zeros((0, VECTOR_DIM), dtype='float32')
+
+        # Inverted index for BM25 over all properties
+        self.postings = defaultdict(list)
+        self.lengths = np.zeros(len(objects), dtype='float32')
+        for i, obj in enumerate(objects):
+            tokens = tokenize(" ".join(obj.values()))
+            self.lengths[i] = len(tokens)
+            for token, tf in Counter(tokens).items():
+                self.postings[token].append((i, tf))
+        self.average_length = float(self.lengths.mean()) if objects else 0.0
+
+    def upsert(self, batch_objects):
+        """Insert or replace (by uuid) objects written through a batch."""
+        if not batch_objects:
+            return
+        positions = {str(u): i for i, u in enumerate(self.uuids)}
+        for obj in batch_objects:
+            i = positions.get(str(obj.uuid))
+            if i is None:
+                positions[str(obj.uuid)] = len(self.objects)
+                self.objects.append(obj.properties)
+                self.uuids.append(obj.uuid)
+            else:
+                self.objects[i] = obj.properties
+        self._reindex()
+
+    def bm25_scores(self, query):
+        scores = np.zeros(len(self.objects), dtype='float32')
+        n = len(self.objects)
+        for token in set(tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, tf in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[i] / self.average_length)
+                scores[i] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+
+class StandinCollections:
+    def __init__(self, collections):
+        self.collections = collections
+
+    def get(self, name):
+        return self.collections[name]
+
+    def exists(self, name):
+        return name in self.collections
+
+
+class StandinClient:
+    def __init__(self, path=None, collection_name="JobPosting"):
+        # Without a path the collection starts empty, e.g. as a loader target
+        objects = list(read_jobs(path)) if path else []
+        self.collections = StandinCollections({collection_name: StandinCollection(collection_name, objects)})
+
+    def is_ready(self):
+        return True
+
+    def close(self):
+        pass
+
+
+def connect_to_standin(path, collection_name="JobPosting"):
+    return StandinClient(path, collection_name)
+
+
+class AsyncStandinQuery:
+    def __init__(self, collection, latency=LATENCY):
+        # Scoring runs without the blocking delay; the round trip is awaited instead
+        self.query = StandinQuery(collection, latency=0)
+        self.latency = latency
+
+    async def _call(self, method, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return getattr(self.query, method)(**kwargs)
+
+    async def bm25(self, **kwargs):
+        return await self._call("bm25", **kwargs)
+
+    async def near_text(self, **kwargs):
+        return await self._call("near_text", **kwargs)
+
+    async def hybrid(self, **kwargs):
+        return await self._call("hybrid", **kwargs)
+
+    async def fetch_objects(self, **kwargs):
+        return await self._call("fetch_objects", **kwargs)
+
+
+class AsyncStandinCollections:
+    def __init__(self, collections):
+        self.collections = collections
+
+    def get(self, name):
+        return SimpleNamespace(name=name, query=AsyncStandinQuery(self.collections.get(name)))
+
+    async def exists(self, name):
+        return self.collections.exists(name)
+
+
+class AsyncStandinClient:
+    def __init__(self, path=None, collection_name="JobPosting"):
+        self.client = StandinClient(path, collection_name)
+        self.collections = AsyncStandinCollections(self.client.collections)
+        self.connected = False
+
+    async def connect(self):
+        self.connected = True
+
+    def is_connected(self):
+        return self.connected
+
+    async def is_ready(self):
+        return True
+
+    async def close(self):
+        self.connected = False
+
+
+def connect_to_standin_async(path, collection_name="JobPosting"):
+    return AsyncStandinClient(path, collection_name)